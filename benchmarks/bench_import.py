@@ -0,0 +1,65 @@
+# benchmarks/bench_import.py
+"""
+Import-time profile of the app (what a worker or test run pays before serving).
+
+    python -m benchmarks.bench_import --module main --runs 5 --top 20
+
+Runs ``python -X importtime -c "import <module>"`` in fresh interpreters and
+reports the median wall time plus the slowest modules and packages.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+def profile(module: str) -> tuple:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        rows.append((name.strip(), int(head.split(":")[1]), int(cumulative_us)))
+    return wall, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    walls = []
+    for _ in range(args.runs):
+        wall, rows = profile(args.module)
+        walls.append(wall)
+
+    print(f"import {args.module}: median {statistics.median(walls):.2f}s wall over {args.runs} runs "
+          f"(min {min(walls):.2f}s, includes interpreter start)")
+
+    print("\nslowest modules (cumulative, last run):")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {self_us / 1000:8.1f} ms self  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    print("\nself time by top-level package:")
+    for name, total in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {total / 1000:9.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# benchmarks/bench_quantization.py
+"""
+Recall/QPS/memory of the local index quantization modes against exact search.
+
+    python -m benchmarks.bench_quantization --vectors 50000 --queries 500
+
+Each mode is served from a fresh subprocess so the reported RSS is what a
+chat node would hold after loading that index and answering the queries.
+"RSS" is anonymous memory; "mmap" is the file-backed part of the rerank
+vectors the kernel mapped in, which it can drop under memory pressure.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+CONFIGS = [
+    ("none", 0),
+    ("sq8", 0),
+    ("sq8", 4),
+    ("pq", 0),
+    ("pq", 4),
+    ("pq", 10),
+]
+
+
+def make_vectors(count: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Unit-norm vectors around random topic centroids, roughly like text embeddings."""
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    out = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 10000):
+        end = min(start + 10000, count)
+        labels = rng.integers(0, clusters, end - start)
+        out[start:end] = centroids[labels] + 1.2 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    faiss.normalize_L2(out)
+    return out
+
+
+def rss_bytes() -> dict:
+    """Anonymous (heap) and file-backed (mmap, reclaimable) resident memory from /proc."""
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                key, value, _ = line.split()
+                out[key[:-1]] = int(value) * 1024
+    return out
+
+
+def prepare(work: Path, args) -> None:
+    from src.local_index import build_index, write_raw_vectors, index_size
+
+    rng = np.random.default_rng(0)
+    base = make_vectors(args.vectors + args.queries, args.dim, args.clusters, rng)
+    queries, base = base[:args.queries], base[args.queries:]
+    ids = [f"v{i}" for i in range(len(base))]
+    np.save(work / "queries.npy", queries)
+
+    flat = faiss.IndexFlatL2(args.dim)
+    flat.add(base)
+    _, truth = flat.search(queries, args.k)
+    np.save(work / "truth.npy", truth)
+    del flat
+
+    write_raw_vectors(str(work), ids, base)
+    sizes = {}
+    for quantization in sorted({q for q, _ in CONFIGS}):
+        start = time.perf_counter()
+        index = build_index(base, quantization, args.pq_m)
+        faiss.write_index(index, str(work / f"{quantization}.faiss"))
+        sizes[quantization] = {"index_bytes": index_size(index), "build_s": round(time.perf_counter() - start, 2)}
+        del index
+    (work / "sizes.json").write_text(json.dumps(sizes), encoding="utf-8")
+
+
+def serve(work: Path, quantization: str, rerank: int, k: int) -> dict:
+    """Load one index the way the server does and time k-NN queries through LocalFAISS."""
+    from langchain.schema import Document
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from src.local_index import LocalFAISS
+
+    queries = np.load(work / "queries.npy")
+    truth = np.load(work / "truth.npy")
+    before = rss_bytes()
+
+    index = faiss.read_index(str(work / f"{quantization}.faiss"))
+    ids = [f"v{i}" for i in range(index.ntotal)]
+    store = LocalFAISS(
+        embedding_function=None,
+        index=index,
+        docstore=InMemoryDocstore({i: Document.model_construct(page_content="", metadata={"row": n})
+                                   for n, i in enumerate(ids)}),
+        index_to_docstore_id=dict(enumerate(ids)),
+        rerank_factor=rerank
+    )
+    if rerank > 1:
+        store.attach_raw_vectors(str(work))
+
+    hits = 0
+    start = time.perf_counter()
+    for q, expected in zip(queries, truth):
+        found = store.similarity_search_with_score_by_vector(q.tolist(), k=k)
+        hits += len({doc.metadata["row"] for doc, _ in found} & set(expected.tolist()))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "recall": hits / (len(queries) * k),
+        "qps": len(queries) / elapsed,
+        "rss_bytes": {key: value - before[key] for key, value in rss_bytes().items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--workdir")
+    parser.add_argument("--serve", nargs=2, metavar=("QUANTIZATION", "RERANK"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        print(json.dumps(serve(Path(args.workdir), args.serve[0], int(args.serve[1]), args.k)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(args.workdir or tmp)
+        work.mkdir(parents=True, exist_ok=True)
+        prepare(work, args)
+        sizes = json.loads((work / "sizes.json").read_text(encoding="utf-8"))
+
+        print(f"{args.vectors} x {args.dim} vectors, {args.queries} queries, recall@{args.k} vs exact search")
+        print(f"{'mode':<10}{'rerank':>7}{'recall':>9}{'QPS':>9}{'index MiB':>11}{'RSS MiB':>9}{'mmap MiB':>10}{'build s':>9}")
+        for quantization, rerank in CONFIGS:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_quantization", "--workdir", str(work),
+                 "-k", str(args.k), "--serve", quantization, str(rerank)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            size = sizes[quantization]
+            print(f"{quantization:<10}{rerank or '-':>7}{result['recall']:>9.3f}{result['qps']:>9.0f}"
+                  f"{size['index_bytes'] / 2**20:>11.1f}{result['rss_bytes']['RssAnon'] / 2**20:>9.1f}"
+                  f"{result['rss_bytes']['RssFile'] / 2**20:>10.1f}{size['build_s']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
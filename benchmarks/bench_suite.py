@@ -0,0 +1,276 @@
+# benchmarks/bench_suite.py
+"""
+Offline benchmark suite: fake chat models and embeddings (src/fakes.py), a local
+FAISS index in a temporary directory, and the real app, splitter and ingestion code.
+
+    python -m benchmarks.bench_suite --out bench.json
+    python -m benchmarks.bench_suite --only query,sessions --llm-latency-ms 50
+    python -m benchmarks.bench_suite --baseline bench.json   # show changes vs. an earlier run
+
+Scenarios: splitter (pages/s of both splitters), ingest (split, dedup, summaries,
+embed + upsert), query (/query without and with enhancements, /query/enhanced
+through the FastAPI app), sessions (chat-history operations and /stats/usage as
+the session store grows). Results are printed as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("splitter", "ingest", "query", "sessions")
+
+
+def configure(args, workdir: str) -> None:
+    """Point the app at fakes and a throwaway local index; must run before any src import."""
+    os.environ.update({
+        "STUB_MODELS": "true",
+        "VECTOR_BACKEND": "faiss",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "index"),
+        "PARENT_STORE_DIR": os.path.join(workdir, "parents"),
+        "WARMUP_ON_STARTUP": "false",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.llm_output_tokens),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "EMBEDDING_DIMENSIONS": str(args.dimensions),
+        "INGEST_SUMMARIES": "true" if args.summaries else "false",
+    })
+
+
+def latency_stats(samples) -> dict:
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pct(50) * 1000, 3),
+        "p95_ms": round(pct(95) * 1000, 3),
+        "p99_ms": round(pct(99) * 1000, 3),
+    }
+
+
+def bench_splitter(args) -> dict:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from benchmarks.bench_splitter import make_corpus
+    from src.fast_splitter import FastTextSplitter
+
+    docs = make_corpus(args.pages)
+    kwargs = dict(chunk_size=1200, chunk_overlap=200, separators=["\n\n", "\n", " ", ""], add_start_index=True)
+    results = {"pages": len(docs)}
+    for name, splitter in (("langchain", RecursiveCharacterTextSplitter(**kwargs)),
+                           ("fast", FastTextSplitter(**kwargs))):
+        start = time.perf_counter()
+        chunks = splitter.split_documents(docs)
+        elapsed = time.perf_counter() - start
+        results[name] = {"seconds": round(elapsed, 3), "pages_per_s": round(len(docs) / elapsed, 1),
+                         "chunks": len(chunks)}
+    return results
+
+
+def bench_ingest(args) -> dict:
+    from benchmarks.bench_splitter import make_corpus
+    from src.config import INGEST_SUMMARIES
+    from src.dedup import ChunkDeduplicator
+    from src.helper import process_documents
+    from src.ingest import attach_summaries, deduplicate, stamp_chunks, upsert_batch
+
+    docs = make_corpus(args.pages, seed=11)
+    per_doc = max(1, args.pages_per_doc)
+    timings = {"split": 0.0, "dedup": 0.0, "summaries": 0.0, "upsert": 0.0}
+    dedup = ChunkDeduplicator()
+    chunks_total = 0
+    start = time.perf_counter()
+    for n, first in enumerate(range(0, len(docs), per_doc)):
+        pages = docs[first:first + per_doc]
+        filename = f"synthetic-{n}.pdf"
+        for page in pages:
+            page.metadata["source"] = filename
+
+        t = time.perf_counter()
+        chunks = process_documents(pages)
+        timings["split"] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        chunks, _ = deduplicate(chunks, dedup)
+        timings["dedup"] += time.perf_counter() - t
+
+        if INGEST_SUMMARIES:
+            t = time.perf_counter()
+            attach_summaries(chunks, filename)
+            timings["summaries"] += time.perf_counter() - t
+
+        t = time.perf_counter()
+        upsert_batch(chunks, stamp_chunks(chunks, f"doc{n:05d}", filename))
+        timings["upsert"] += time.perf_counter() - t
+        chunks_total += len(chunks)
+    elapsed = time.perf_counter() - start
+    return {
+        "pages": len(docs),
+        "chunks": chunks_total,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(len(docs) / elapsed, 1),
+        "chunks_per_s": round(chunks_total / elapsed, 1),
+        "stage_seconds": {k: round(v, 3) for k, v in timings.items()},
+    }
+
+
+QUESTIONS = [
+    "How long does a refund take?",
+    "What do I need to return a product?",
+    "How do I reset my device password?",
+    "Can I change the delivery address of my order?",
+    "When is my subscription billed?",
+    "How do I contact customer support by phone?",
+]
+
+
+def bench_query(args) -> dict:
+    from fastapi.testclient import TestClient
+    import main
+    from src.prompt_cache import get_prompt_cache_tracker
+
+    results = {}
+    tracker = get_prompt_cache_tracker()
+    cases = (
+        ("query_basic", "/query", {"use_enhancements": False}),
+        ("query", "/query", {}),
+        ("query_enhanced", "/query/enhanced", {"generate_followups": True}),
+    )
+    with TestClient(main.app) as client:
+        for name, path, extra in cases:
+            calls_before = sum(s["calls"] for s in tracker.snapshot()["prompts"].values())
+            samples, errors = [], 0
+            start = time.perf_counter()
+            for i in range(args.requests):
+                body = {"session_id": f"{name}-{i % args.sessions}",
+                        "input": QUESTIONS[i % len(QUESTIONS)], **extra}
+                t = time.perf_counter()
+                response = client.post(path, json=body)
+                samples.append(time.perf_counter() - t)
+                errors += response.status_code != 200
+            elapsed = time.perf_counter() - start
+            calls = sum(s["calls"] for s in tracker.snapshot()["prompts"].values()) - calls_before
+            results[name] = {
+                **latency_stats(samples),
+                "requests_per_s": round(args.requests / elapsed, 2),
+                "errors": errors,
+                "llm_calls_per_request": round(calls / args.requests, 2),
+            }
+    return results
+
+
+def bench_sessions(args) -> dict:
+    from fastapi.testclient import TestClient
+    import main
+
+    results = {}
+    with TestClient(main.app) as client:
+        for size in args.session_sizes:
+            main.store.clear()
+            for i in range(size):
+                for turn in range(10):
+                    main.update_chat_history(f"s{i}", f"question {turn}", f"answer {turn}")
+                main.get_session_history(f"s{i}")
+
+            ops = []
+            for i in range(args.session_ops):
+                session = f"s{(i * 7919) % size}"
+                t = time.perf_counter()
+                main.get_chat_history_for_session(session)
+                main.update_chat_history(session, "question", "answer")
+                ops.append(time.perf_counter() - t)
+
+            stats = []
+            for _ in range(5):
+                t = time.perf_counter()
+                client.get("/stats/usage")
+                stats.append(time.perf_counter() - t)
+            results[str(size)] = {"history_op": latency_stats(ops), "stats_usage": latency_stats(stats)}
+        main.store.clear()
+    return results
+
+
+def compare(current: dict, baseline: dict, path: str = "") -> list:
+    """Relative change of every numeric leaf present in both result trees."""
+    rows = []
+    for key, value in current.items():
+        other = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict) and isinstance(other, dict):
+            rows.extend(compare(value, other, name))
+        elif isinstance(value, (int, float)) and isinstance(other, (int, float)) and other:
+            rows.append((name, other, value, (value - other) / other * 100))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(SCENARIOS), help="comma-separated scenarios")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--pages-per-doc", type=int, default=20)
+    parser.add_argument("--summaries", action="store_true", help="include ingestion-time summaries")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--session-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[100, 1000, 10000])
+    parser.add_argument("--session-ops", type=int, default=2000)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-output-tokens", type=int, default=60)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--out", help="write results JSON here as well as to stdout")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    selected = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    # Queries need an index to search
+    if "query" in selected and "ingest" not in selected:
+        selected.insert(0, "ingest")
+
+    with tempfile.TemporaryDirectory(prefix="bench-suite-") as workdir:
+        configure(args, workdir)
+        results = {}
+        for name in SCENARIOS:
+            if name in selected:
+                print(f"[bench] {name} ...", file=sys.stderr)
+                results[name] = globals()[f"bench_{name}"](args)
+
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    report = {
+        "meta": {
+            "revision": revision,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nchanges vs. {args.baseline} (revision {baseline['meta'].get('revision')}):", file=sys.stderr)
+        for name, before, after, change in compare(results, baseline["results"]):
+            print(f"  {name:<55} {before:>12} -> {after:<12} {change:+7.1f}%", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
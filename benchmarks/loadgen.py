@@ -0,0 +1,220 @@
+# benchmarks/loadgen.py
+"""
+Load generator for the FastAPI service: replays multi-turn conversations
+(one session id per conversation, so chat history grows turn by turn) and
+reports throughput, p50/p95/p99 latency and error rates per endpoint.
+
+    # offline: start main.py on fake models and a temporary local index, then load it
+    python -m benchmarks.loadgen --spawn --conversations 200 --rate 5 --concurrency 32
+
+    # against a running deployment
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --duration 120 --rate 2
+
+Conversations arrive as a Poisson process at --rate per second (0 = all at once);
+at most --concurrency requests are in flight. Use --enhanced-ratio to mix
+/query and /query/enhanced. --json writes the report as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+# Opening questions and follow-ups; follow-ups lean on history ("it", "that")
+OPENERS = [
+    "How long does a refund take?",
+    "What do I need to return a product?",
+    "How do I reset my device password?",
+    "Can I change the delivery address of my order?",
+    "When is my subscription billed?",
+    "My invoice shows the wrong amount, what should I do?",
+]
+FOLLOW_UPS = [
+    "What if I lost the receipt?",
+    "How long does that usually take?",
+    "Can I do it by phone instead?",
+    "Is there a fee for that?",
+    "What happens after that?",
+    "Who do I contact if it does not work?",
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+
+    def add(self, endpoint: str, seconds: float, error: str = None):
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[endpoint][error] += 1
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            errors = sum(self.errors[endpoint].values())
+
+            def pct(p):
+                return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000, 1)
+
+            endpoints[endpoint] = {
+                "requests": len(ordered),
+                "throughput_rps": round(len(ordered) / elapsed, 2),
+                "error_rate": round(errors / len(ordered), 4),
+                "errors": dict(self.errors[endpoint]),
+                "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+                "p50_ms": pct(50),
+                "p95_ms": pct(95),
+                "p99_ms": pct(99),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        return {"elapsed_s": round(elapsed, 2), "requests": total,
+                "throughput_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+
+async def conversation(client, args, rng, index, limiter, recorder):
+    session_id = f"load-{os.getpid()}-{index}"
+    enhanced = rng.random() < args.enhanced_ratio
+    endpoint = "/query/enhanced" if enhanced else "/query"
+    turns = rng.randint(args.min_turns, args.max_turns)
+    for turn in range(turns):
+        question = rng.choice(OPENERS) if turn == 0 else rng.choice(FOLLOW_UPS)
+        body = {"session_id": session_id, "input": question}
+        if not enhanced:
+            body["use_enhancements"] = rng.random() < args.query_enhancements_ratio
+        async with limiter:
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await client.post(endpoint, json=body, timeout=args.timeout)
+                if response.status_code != 200:
+                    error = f"http_{response.status_code}"
+            except httpx.TimeoutException:
+                error = "timeout"
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            recorder.add(endpoint, time.perf_counter() - start, error)
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    limiter = asyncio.Semaphore(args.concurrency)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        tasks = []
+        deadline = time.perf_counter() + args.duration if args.duration else None
+        index = 0
+        while index < args.conversations or deadline:
+            if deadline and time.perf_counter() >= deadline:
+                break
+            tasks.append(asyncio.create_task(conversation(
+                client, args, random.Random(rng.random()), index, limiter, recorder)))
+            index += 1
+            if args.rate > 0:
+                await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*tasks)
+    report = recorder.report()
+    report["conversations"] = index
+    return report
+
+
+def spawn_server(args, workdir: str) -> subprocess.Popen:
+    """Start main.py on fake models (STUB_MODELS) with a small synthetic local index."""
+    env = {
+        **os.environ,
+        "STUB_MODELS": "true",
+        "VECTOR_BACKEND": "faiss",
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "index"),
+        "PARENT_STORE_DIR": os.path.join(workdir, "parents"),
+        "EMBEDDING_DIMENSIONS": "256",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "INGEST_SUMMARIES": "false",
+    }
+    seed = (
+        "from benchmarks.bench_splitter import make_corpus\n"
+        "from src.helper import process_documents\n"
+        "from src.ingest import stamp_chunks, upsert_batch\n"
+        f"chunks = process_documents(make_corpus({args.seed_pages}))\n"
+        "upsert_batch(chunks, stamp_chunks(chunks, 'loadgen', 'synthetic.pdf'))\n"
+    )
+    subprocess.run([sys.executable, "-c", seed], env=env, check=True)
+    port = args.url.rsplit(":", 1)[-1].strip("/")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", port, "--log-level", "warning"], env=env
+    )
+    for _ in range(300):
+        try:
+            if httpx.get(f"{args.url}/", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("server did not come up")
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['conversations']} conversations, {report['requests']} requests in "
+          f"{report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+    print(f"{'endpoint':<18} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)")
+    for endpoint, s in report["endpoints"].items():
+        print(f"{endpoint:<18} {s['requests']:>6} {s['throughput_rps']:>7} {s['error_rate'] * 100:>6.2f} "
+              f"{s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} {s['max_ms']:>8}")
+        if s["errors"]:
+            print(f"{'':<18} errors: {s['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start main.py on fake models (no network)")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="fake model latency with --spawn")
+    parser.add_argument("--seed-pages", type=int, default=300, help="synthetic pages indexed with --spawn")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=0, help="seconds; overrides --conversations")
+    parser.add_argument("--rate", type=float, default=2.0, help="new conversations per second (0 = all at once)")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--min-turns", type=int, default=2)
+    parser.add_argument("--max-turns", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds between turns")
+    parser.add_argument("--enhanced-ratio", type=float, default=0.5, help="share of conversations on /query/enhanced")
+    parser.add_argument("--query-enhancements-ratio", type=float, default=0.5,
+                        help="share of /query turns with use_enhancements")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="loadgen-") as workdir:
+        if args.spawn:
+            server = spawn_server(args, workdir)
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
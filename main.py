@@ -1,25 +1,60 @@
 # main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Query, Request, Depends
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from functools import partial
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+import asyncio
+import logging
 import time
 from datetime import datetime
 import json
 
-from src.llm import rag_chain  
+from src.config import (
+    NAMESPACE, WARMUP_ON_STARTUP, DISCONNECT_POLL_SECONDS, DEFER_EXTRAS, BATCH_CONCURRENCY, BATCH_MAX_QUESTIONS,
+    LOG_LEVEL, validate_config
+)
+from src.filters import build_filter, search_configurable
 from src.ingest import ingest_pdf_bytes, ingest_folder
+from src.pinecone_vectorstore import resolve_namespace, corpus_version
+from src.coalesce import get_single_flight, request_key
+from src.extras import get_extras_store
+from src.batch import answer_batch
+from src.tenants import get_tenant_pool
+from src.prompt_registry import get_prompt_registry
+from src.prompt_cache import get_prompt_cache_tracker
+from src.admission import admission, priority_var, Overloaded, CHAT, BATCH, INGEST
+from src.retry import LatencyBudget, StageFailed, DeadlineExceeded, RequestCancelled, is_retryable
+from src import metrics
 
 from src.enhanced_llm import get_enhanced_rag_chain
 
+class SearchFilters(BaseModel):
+    """Restrict retrieval to matching chunks; all given fields must match."""
+    source: Optional[Union[str, List[str]]] = None
+    doc_id: Optional[Union[str, List[str]]] = None
+    ingested_after: Optional[datetime] = None
+    ingested_before: Optional[datetime] = None
+
+    def to_filter(self) -> Optional[Dict[str, Any]]:
+        return build_filter(**self.model_dump())
+
 class QueryModel(BaseModel):
     session_id: str
     input: str
     use_enhancements: bool = True
     generate_followups: bool = False
+    namespace: Optional[str] = None
+    filters: Optional[SearchFilters] = None
+    timeout_seconds: Optional[float] = None  # or the X-Request-Timeout header
+    defer_extras: Optional[bool] = None  # summary/follow-ups via /responses/{id}/extras; None = DEFER_EXTRAS
 
 class EnhancedQueryModel(BaseModel):
     session_id: str
@@ -27,11 +62,46 @@ class EnhancedQueryModel(BaseModel):
     use_summarization: bool = True
     generate_followups: bool = True
     response_style: str = "professional"  
+    context_token_budget: Optional[int] = None
+    namespace: Optional[str] = None
+    filters: Optional[SearchFilters] = None
+    timeout_seconds: Optional[float] = None  # or the X-Request-Timeout header
+    defer_extras: Optional[bool] = None  # summary/follow-ups via /responses/{id}/extras; None = DEFER_EXTRAS
+
+class BatchQuestion(BaseModel):
+    input: str
+    id: Optional[Union[str, int]] = None  # echoed back; defaults to the question's position
+    filters: Optional[SearchFilters] = None
+
+class BatchQueryModel(BaseModel):
+    questions: List[BatchQuestion]
+    namespace: Optional[str] = None
+    use_enhancements: bool = False
+    concurrency: Optional[int] = None  # answers generated at once; capped at BATCH_CONCURRENCY
 
 class FAQRequest(BaseModel):
     num_faqs: int = 10
 
-app = FastAPI(title="Enhanced Customer Support AI", version="2.0")
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("main")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Fail on missing config and build chains before serving, rather than at import or first request."""
+    # .env is read here (and by the CLIs), not when src.config is imported
+    from src.startup import load_env, warm_up
+    if WARMUP_ON_STARTUP:
+        logger.info("warm-up: %s", warm_up())
+    else:
+        load_env()
+        validate_config()
+    yield
+    from src.pdf_extract import shutdown_pool
+    from src.ingest import shutdown_summaries
+    shutdown_pool()
+    shutdown_summaries()
+
+app = FastAPI(title="Enhanced Customer Support AI", version="2.0", lifespan=lifespan)
 
 ALLOWED_ORIGINS = [
     "http://localhost:8501",
@@ -48,7 +118,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-enhanced_chain = get_enhanced_rag_chain()
+class TraceRequests:
+    """
+    Give every request an id (or keep the caller's X-Request-ID) that tags its spans and metrics.
+    Plain ASGI rather than @app.middleware("http"), which hides client disconnects from endpoints.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        request_id = Headers(scope=scope).get("X-Request-ID") or metrics.new_request_id()
+        metrics.request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            route = scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                method=scope["method"], path=getattr(route, "path", "unmatched"), status=status
+            )
+
+app.add_middleware(TraceRequests)
 
 store = {}
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
@@ -56,13 +159,112 @@ def get_session_history(session_id: str) -> BaseChatMessageHistory:
         store[session_id] = ChatMessageHistory()
     return store[session_id]
 
-conversational_rag_chain = RunnableWithMessageHistory(
-    rag_chain,
-    get_session_history,
-    input_messages_key="input",
-    history_messages_key="chat_history",
-    output_messages_key="answer",
-)
+tenant_pool = get_tenant_pool()
+single_flight = get_single_flight()
+
+def get_namespace(namespace: Optional[str]) -> str:
+    """Validate a request's namespace; invalid or unknown tenants are a client error."""
+    try:
+        return resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def scoped_session_id(session_id: str, namespace: Optional[str] = None) -> str:
+    """Keep chat histories of different tenants apart even if their session ids collide."""
+    namespace = get_namespace(namespace)
+    scoped = session_id if namespace == NAMESPACE else f"{namespace}/{session_id}"
+    metrics.bind_session(scoped)
+    return scoped
+
+def admit(priority: int):
+    """
+    Endpoint dependency: refuse the request with 429 + Retry-After when the
+    service is saturated for this priority, else tag the request's outbound
+    model/embedding calls with it (chat < batch < ingest).
+    """
+    async def dependency():
+        retry_after = admission.try_admit(priority)
+        if retry_after is not None:
+            raise HTTPException(status_code=429, detail="Server busy, retry later",
+                                headers={"Retry-After": str(retry_after)})
+        priority_var.set(priority)
+        try:
+            yield
+        finally:
+            admission.leave()
+    return Depends(dependency)
+
+def http_error(e: Exception) -> HTTPException:
+    """
+    Overloaded (no outbound capacity in time) is a 429, a required pipeline stage
+    that failed on transient provider errors a 503, a spent deadline a 504 and a
+    disconnected client 499 (nobody reads it); anything else a 500.
+    """
+    if isinstance(e, Overloaded):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, StageFailed) and is_retryable(e.error):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, RequestCancelled):
+        return HTTPException(status_code=499, detail=str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+def request_budget(request: Request, timeout_seconds: Optional[float]) -> LatencyBudget:
+    """Deadline from the body's timeout_seconds or the X-Request-Timeout header (seconds)."""
+    if timeout_seconds is None and request.headers.get("X-Request-Timeout"):
+        try:
+            timeout_seconds = float(request.headers["X-Request-Timeout"])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a number of seconds")
+    return LatencyBudget.for_request(timeout_seconds)
+
+async def until_disconnected(request: Request, awaitable, on_disconnect=None):
+    """Await ``awaitable``, abandoning it (RequestCancelled) if the client disconnects first."""
+    task = asyncio.ensure_future(awaitable)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            if on_disconnect is not None:
+                on_disconnect()
+            raise RequestCancelled("Client disconnected")
+
+async def run_enhanced_invoke(request: Request, query: str, session_id: str, chat_history: List[Dict[str, Any]],
+                              namespace: str, budget: LatencyBudget, **options) -> Dict[str, Any]:
+    """
+    Run enhanced_invoke in the threadpool so the event loop keeps serving. Requests
+    without chat history (nothing personal in the prompt) that match an in-flight
+    one on query, corpus version, namespace, filters and options share its result;
+    the shared run's budget is extended to the latest of their deadlines and each
+    request still times out (504) at its own. When the client, or every client
+    sharing a run, disconnects, the budget is cancelled and the pipeline stops at
+    the next stage.
+    """
+    call = partial(get_enhanced_rag_chain().enhanced_invoke, query=query, session_id=session_id,
+                   chat_history=list(chat_history), namespace=namespace, budget=budget, **options)
+    if chat_history:
+        task = asyncio.ensure_future(run_in_threadpool(call))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await until_disconnected(request, asyncio.shield(task), on_disconnect=budget.cancel)
+
+    filters = options.pop("filters", None)
+    key = request_key(query, namespace, corpus_version(namespace), filters, **options)
+    result, shared = await until_disconnected(request, single_flight.run(key, call, on_abandon=budget.cancel, budget=budget))
+    if shared:
+        result = {**result, "metadata": {**result.get("metadata", {}), "session_id": session_id, "coalesced": True}}
+    return result
+
+def get_conversational_chain(namespace: Optional[str] = None) -> RunnableWithMessageHistory:
+    return RunnableWithMessageHistory(
+        tenant_pool.get(namespace).rag_chain,
+        get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+        output_messages_key="answer",
+    )
 
 @app.get("/")
 def health():
@@ -80,22 +282,31 @@ def health():
         ]
     }
 
-@app.post("/query")
-async def query(query: QueryModel):
+@app.post("/query", dependencies=[admit(CHAT)])
+async def query(query: QueryModel, request: Request):
     """Original query endpoint (maintained for backward compatibility)"""
+    namespace = get_namespace(query.namespace)
+    session_id = scoped_session_id(query.session_id, namespace)
+    filters = query.filters.to_filter() if query.filters else None
+    budget = request_budget(request, query.timeout_seconds)
     try:
         if query.use_enhancements:
-            chat_history = get_chat_history_for_session(query.session_id)
+            chat_history = get_chat_history_for_session(session_id)
             
-            result = enhanced_chain.enhanced_invoke(
+            result = await run_enhanced_invoke(
+                request,
                 query=query.input,
                 session_id=query.session_id,
                 chat_history=chat_history,
+                namespace=namespace,
+                budget=budget,
                 use_summarization=True,
-                generate_followups=query.generate_followups
+                generate_followups=query.generate_followups,
+                defer_extras=DEFER_EXTRAS if query.defer_extras is None else query.defer_extras,
+                filters=filters
             )
             
-            update_chat_history(query.session_id, query.input, result["answer"])
+            update_chat_history(session_id, query.input, result["answer"])
             
             response = {
                 "answer": result["answer"],
@@ -105,40 +316,54 @@ async def query(query: QueryModel):
             
             return response
         else:
-            response = conversational_rag_chain.invoke(
+            response = await run_in_threadpool(
+                get_conversational_chain(namespace).invoke,
                 {"input": query.input},
-                config={"configurable": {"session_id": query.session_id}},
+                config={"configurable": {"session_id": session_id, **search_configurable(filters)}},
             )
             return {"answer": response["answer"]}
             
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
-@app.post("/query/enhanced")
-async def enhanced_query(query: EnhancedQueryModel):
+@app.post("/query/enhanced", dependencies=[admit(CHAT)])
+async def enhanced_query(query: EnhancedQueryModel, request: Request):
     """New enhanced query endpoint with full generative AI features"""
+    namespace = get_namespace(query.namespace)
+    session_id = scoped_session_id(query.session_id, namespace)
+    filters = query.filters.to_filter() if query.filters else None
+    budget = request_budget(request, query.timeout_seconds)
     try:
         start_time = time.time()
 
-        chat_history = get_chat_history_for_session(query.session_id)
+        chat_history = get_chat_history_for_session(session_id)
 
-        result = enhanced_chain.enhanced_invoke(
+        result = await run_enhanced_invoke(
+            request,
             query=query.input,
             session_id=query.session_id,
             chat_history=chat_history,
+            namespace=namespace,
+            budget=budget,
             use_summarization=query.use_summarization,
-            generate_followups=query.generate_followups
+            generate_followups=query.generate_followups,
+            context_token_budget=query.context_token_budget,
+            defer_extras=DEFER_EXTRAS if query.defer_extras is None else query.defer_extras,
+            filters=filters,
+            response_style=query.response_style
         )
         
-        update_chat_history(query.session_id, query.input, result["answer"])
+        update_chat_history(session_id, query.input, result["answer"])
         
         response = {
             "answer": result["answer"],
+            "response_id": result.get("metadata", {}).get("response_id"),
             "enhanced_features": result.get("enhanced_features", {}),
             "metadata": {
                 **result.get("metadata", {}),
                 "total_processing_time": time.time() - start_time,
-                "enhancement_used": True
+                "enhancement_used": True,
+                "request_id": metrics.request_id_var.get()
             },
             "suggestions": result.get("enhanced_features", {}).get("follow_up_suggestions", []),
             "document_summary": result.get("enhanced_features", {}).get("document_summary"),
@@ -148,80 +373,132 @@ async def enhanced_query(query: EnhancedQueryModel):
         return response
         
     except Exception as e:
-        try:
-            fallback_response = conversational_rag_chain.invoke(
-                {"input": query.input},
-                config={"configurable": {"session_id": query.session_id}},
-            )
-            return {
-                "answer": fallback_response["answer"],
-                "metadata": {"fallback_used": True, "error": str(e)}
-            }
-        except Exception as fallback_error:
-            raise HTTPException(status_code=500, detail=str(fallback_error))
+        raise http_error(e)
 
-@app.post("/generate-faqs")
-async def generate_faqs(request: FAQRequest):
+@app.get("/responses/{response_id}/extras")
+async def get_response_extras(
+    response_id: str,
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for pending extras")
+):
+    """Document summary and follow-up suggestions of an answer given with defer_extras"""
+    store = get_extras_store()
+    deadline = time.monotonic() + wait
+    entry = store.get(response_id)
+    while entry is not None and entry["status"] == "pending" and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        entry = store.get(response_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired response id")
+    return {"response_id": response_id, **entry}
+
+@app.post("/query/batch", dependencies=[admit(BATCH)])
+async def query_batch(batch: BatchQueryModel):
+    """
+    Answer many independent questions (no chat history) and stream one JSON line
+    per question as it finishes, in completion order; match results by "id" or "index".
+    """
+    namespace = get_namespace(batch.namespace)
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="No questions given")
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    items = [
+        {
+            "id": question.id if question.id is not None else index,
+            "input": question.input,
+            "filters": question.filters.to_filter() if question.filters else None,
+        }
+        for index, question in enumerate(batch.questions)
+    ]
+    concurrency = min(max(1, batch.concurrency or BATCH_CONCURRENCY), BATCH_CONCURRENCY)
+
+    async def lines():
+        results = answer_batch(items, namespace, batch.use_enhancements, concurrency)
+        sent = set()
+        try:
+            async for result in iterate_in_threadpool(results):
+                sent.add(result["index"])
+                yield json.dumps(result, default=str) + "\n"
+        except Exception as e:
+            # The 200 is already out: every question still owed a line gets its error instead
+            logger.exception("Batch of %d questions failed", len(items))
+            for index, item in enumerate(items):
+                if index not in sent:
+                    yield json.dumps({"index": index, "id": item["id"], "input": item["input"], "error": str(e)},
+                                     default=str) + "\n"
+        finally:
+            try:
+                results.close()  # client went away: drop questions not yet started
+            except ValueError:
+                pass  # still inside next() on a worker thread; closed once collected
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/generate-faqs", dependencies=[admit(BATCH)])
+async def generate_faqs(request: FAQRequest, namespace: Optional[str] = Query(None, description="Tenant namespace")):
     """Generate FAQs from indexed documents"""
+    namespace = get_namespace(namespace)
     try:
-        faqs = enhanced_chain.generate_faqs(request.num_faqs)
+        faqs = get_enhanced_rag_chain().generate_faqs(request.num_faqs, namespace=namespace)
         return {
             "faqs": faqs,
             "total_generated": len(faqs),
             "generated_at": datetime.utcnow().isoformat()
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
-@app.get("/analyze/documents")
-async def analyze_documents():
+@app.get("/analyze/documents", dependencies=[admit(BATCH)])
+async def analyze_documents(namespace: Optional[str] = Query(None, description="Tenant namespace")):
     """Analyze indexed documents and provide insights"""
+    namespace = get_namespace(namespace)
     try:
-        analysis = enhanced_chain.analyze_document_content()
+        analysis = get_enhanced_rag_chain().analyze_document_content(namespace=namespace)
         return {
             "analysis": analysis,
             "analyzed_at": datetime.utcnow().isoformat()
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.get("/session/{session_id}/history")
-async def get_session_chat_history(session_id: str):
+async def get_session_chat_history(session_id: str, namespace: Optional[str] = Query(None)):
     """Get chat history for a session"""
+    scoped_id = scoped_session_id(session_id, namespace)
     try:
-        history = get_chat_history_for_session(session_id)
+        history = get_chat_history_for_session(scoped_id)
         return {
             "session_id": session_id,
             "history": history,
             "message_count": len(history)
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.delete("/session/{session_id}/history")
-async def clear_session_history(session_id: str):
+async def clear_session_history(session_id: str, namespace: Optional[str] = Query(None)):
     """Clear chat history for a session"""
+    scoped_id = scoped_session_id(session_id, namespace)
     try:
-        if session_id in store:
-            store[session_id].clear()
+        if scoped_id in store:
+            store[scoped_id].clear()
 
-        session_key = f"chat_history_{session_id}"
+        session_key = f"chat_history_{scoped_id}"
         if session_key in store:
             del store[session_key]
         
         return {"status": "cleared", "session_id": session_id}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
-@app.post("/generate/response-variations")
+@app.post("/generate/response-variations", dependencies=[admit(BATCH)])
 async def generate_response_variations(
     response_text: str = Query(..., description="Original response text"),
     num_variations: int = Query(3, description="Number of variations to generate")
 ):
     """Generate multiple variations of a response for A/B testing"""
     try:
-        from src.generative_ai import GenerativeAIEnhancer
-        enhancer = GenerativeAIEnhancer()
+        enhancer = get_enhanced_rag_chain().ai_enhancer
         
         variations = enhancer.generate_response_variations(response_text, num_variations)
         
@@ -231,37 +508,44 @@ async def generate_response_variations(
             "total_variations": len(variations)
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
-@app.post("/summarize/documents")
+@app.post("/summarize/documents", dependencies=[admit(BATCH)])
 async def summarize_documents(
     query: str = Query("", description="Optional query to focus summarization"),
-    max_docs: int = Query(10, description="Maximum number of documents to summarize")
+    max_docs: int = Query(10, description="Maximum number of documents to summarize"),
+    namespace: Optional[str] = Query(None, description="Tenant namespace"),
+    source: Optional[List[str]] = Query(None, description="Only documents with these source filenames"),
+    doc_id: Optional[List[str]] = Query(None, description="Only these document ids"),
+    ingested_after: Optional[datetime] = Query(None, description="Only chunks ingested at or after this time"),
+    ingested_before: Optional[datetime] = Query(None, description="Only chunks ingested at or before this time")
 ):
     """Summarize documents from the vector store"""
+    namespace = get_namespace(namespace)
+    filters = build_filter(source, doc_id, ingested_after, ingested_before)
     try:
-        from src.generative_ai import GenerativeAIEnhancer
-        enhancer = GenerativeAIEnhancer()
+        enhancer = get_enhanced_rag_chain().ai_enhancer
         
-        vectorstore = enhanced_chain.vectorstore
+        vectorstore = tenant_pool.get(namespace).vectorstore
         
         if query:
-            docs = vectorstore.similarity_search(query, k=max_docs)
+            docs = vectorstore.similarity_search(query, k=max_docs, filter=filters)
         else:
             sample_queries = ["policies", "procedures", "guidelines", "support"]
             docs = []
             for q in sample_queries:
-                docs.extend(vectorstore.similarity_search(q, k=max_docs//4))
+                docs.extend(vectorstore.similarity_search(q, k=max_docs//4, filter=filters))
         
         summary = enhancer.summarize_documents(docs, query)
         
         return {
             "summary": summary,
             "documents_summarized": len(docs),
-            "focus_query": query or "general overview"
+            "focus_query": query or "general overview",
+            "filters": filters
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 @app.get("/stats/usage")
 async def get_usage_stats():
@@ -287,43 +571,87 @@ async def get_usage_stats():
             "total_messages": total_messages,
             "chat_history_sessions": chat_history_sessions,
             "average_messages_per_session": total_messages / max(active_sessions, 1),
+            "tenants": tenant_pool.snapshot(),
+            "coalescing": single_flight.snapshot(),
+            "extras": get_extras_store().snapshot(),
+            "admission": admission.snapshot(),
             "timestamp": datetime.utcnow().isoformat()
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
+
+@app.get("/stats/prompts")
+async def get_prompt_stats():
+    """Static token count of every prompt template, plus cached vs. uncached prompt tokens of real calls"""
+    try:
+        registry = get_prompt_registry()
+        return {
+            "tokens": registry.token_report(),
+            "registry": registry.stats(),
+            "cache": get_prompt_cache_tracker().snapshot()
+        }
+    except Exception as e:
+        raise http_error(e)
 
-@app.post("/ingest/file")
+@app.get("/stats/models")
+async def get_model_stats():
+    """Model routed to each pipeline stage, with per-stage calls, errors, tokens and latency"""
+    try:
+        from src.models import routes
+        return {"routes": routes(), "stages": get_prompt_cache_tracker().snapshot()["stages"]}
+    except Exception as e:
+        raise http_error(e)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Latency histograms, token counts, cache hits and errors in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    """Stage spans (LLM calls, retrieval, packing, ingestion) recorded for one request"""
+    spans = metrics.spans_for(request_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="No spans recorded for this request id")
+    return {"request_id": request_id, "session_id": spans[0]["session_id"], "spans": spans}
+
+@app.post("/ingest/file", dependencies=[admit(INGEST)])
 async def ingest_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    sync: bool = Query(False, description="If true, block until ingest finishes.")
+    sync: bool = Query(False, description="If true, block until ingest finishes."),
+    namespace: Optional[str] = Query(None, description="Tenant namespace to index into")
 ):
+    namespace = get_namespace(namespace)
     try:
         data = await file.read()
         if sync:
-            result = ingest_pdf_bytes(data, file.filename)
-            return {"status": "done", **result}
+            # Extraction and embedding block (summaries are queued in the background); keep them off the event loop
+            result = await run_in_threadpool(ingest_pdf_bytes, data, file.filename, namespace=namespace)
+            return {"status": "done", "namespace": namespace, **result}
         else:
-            background_tasks.add_task(ingest_pdf_bytes, data, file.filename)
-            return {"status": "accepted", "filename": file.filename}
+            background_tasks.add_task(ingest_pdf_bytes, data, file.filename, namespace=namespace)
+            return {"status": "accepted", "filename": file.filename, "namespace": namespace}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
-@app.post("/ingest/folder")
+@app.post("/ingest/folder", dependencies=[admit(INGEST)])
 def ingest_docs_folder(
     background_tasks: BackgroundTasks,
     path: str = Query("Docs/", description="Folder path"),
-    sync: bool = Query(False)
+    sync: bool = Query(False),
+    namespace: Optional[str] = Query(None, description="Tenant namespace to index into")
 ):
+    namespace = get_namespace(namespace)
     try:
         if sync:
-            result = ingest_folder(path)
-            return {"status": "done", **result}
+            result = ingest_folder(path, namespace)
+            return {"status": "done", "namespace": namespace, **result}
         else:
-            background_tasks.add_task(ingest_folder, path)
-            return {"status": "accepted", "folder": path}
+            background_tasks.add_task(ingest_folder, path, namespace)
+            return {"status": "accepted", "folder": path, "namespace": namespace}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 
 def get_chat_history_for_session(session_id: str) -> List[Dict[str, Any]]:
@@ -360,67 +688,102 @@ def update_chat_history(session_id: str, user_message: str, bot_response: str):
         store[session_key] = store[session_key][-20:]
 
 
-@app.post("/test/ai-approaches")
+def run_variant(label: str, func, *args, **kwargs):
+    """
+    Run one /test/ai-approaches variant (in the threadpool) under its own trace id,
+    so its latency and chat model usage can be reported separately.
+    """
+    trace_id = f"{metrics.request_id_var.get()}.{label}"
+    metrics.request_id_var.set(trace_id)  # the threadpool runs in a copied context
+    start = time.perf_counter()
+    try:
+        result, error = func(*args, **kwargs), None
+    except Exception as e:
+        result, error = None, e
+    return result, error, {"seconds": round(time.perf_counter() - start, 3), **metrics.llm_usage(trace_id)}
+
+@app.post("/test/ai-approaches", dependencies=[admit(BATCH)])
 async def test_ai_approaches(
     query: str = Query(..., description="Test query"),
-    session_id: str = Query("test_session", description="Session ID")
+    session_id: str = Query("test_session", description="Session ID"),
+    namespace: Optional[str] = Query(None, description="Tenant namespace"),
+    source: Optional[List[str]] = Query(None, description="Only documents with these source filenames"),
+    doc_id: Optional[List[str]] = Query(None, description="Only these document ids"),
+    ingested_after: Optional[datetime] = Query(None, description="Only chunks ingested at or after this time"),
+    ingested_before: Optional[datetime] = Query(None, description="Only chunks ingested at or before this time")
 ):
-    """Test different AI approaches side by side"""
+    """
+    Test different AI approaches side by side. All approaches share one retrieval
+    (with an empty history, so nothing is written to the session store) from the
+    tenant's index and filters; the two enhanced generations then run concurrently.
+    """
+    namespace = get_namespace(namespace)
+    filters = build_filter(source, doc_id, ingested_after, ingested_before)
     try:
         results = {}
+        comparison = []
+        chain = get_enhanced_rag_chain()
         
-        try:
-            original_result = conversational_rag_chain.invoke(
-                {"input": query},
-                config={"configurable": {"session_id": f"{session_id}_original"}},
-            )
-            results["original_rag"] = {
-                "answer": original_result["answer"],
-                "approach": "Traditional RAG"
-            }
-        except Exception as e:
-            results["original_rag"] = {"error": str(e)}
+        retrieval, error, shared = await run_in_threadpool(
+            run_variant, "retrieval", tenant_pool.get(namespace).rag_chain.invoke,
+            {"input": query, "chat_history": [], "context_token_budget": None},
+            config={"configurable": search_configurable(filters)}
+        )
+        if error is not None:
+            raise error
+        results["original_rag"] = {
+            "answer": retrieval["answer"],
+            "approach": "Traditional RAG"
+        }
+        comparison.append({"approach": "original_rag", **shared})
         
-        try:
-            enhanced_result = enhanced_chain.enhanced_invoke(
-                query=query,
-                session_id=f"{session_id}_enhanced",
-                use_summarization=True,
-                generate_followups=False
+        variants = {
+            "enhanced_with_summarization": dict(use_summarization=True, generate_followups=False),
+            "full_enhanced": dict(use_summarization=True, generate_followups=True),
+        }
+        runs = await asyncio.gather(*[
+            run_in_threadpool(
+                run_variant, name, chain.enhanced_invoke, query=query, session_id=f"{session_id}_{name}",
+                retrieval_result=retrieval, namespace=namespace, filters=filters, defer_extras=False, **options
             )
-            results["enhanced_with_summarization"] = {
-                "answer": enhanced_result["answer"],
-                "approach": "Enhanced RAG with Summarization",
-                "summary": enhanced_result.get("enhanced_features", {}).get("document_summary")
-            }
-        except Exception as e:
-            results["enhanced_with_summarization"] = {"error": str(e)}
+            for name, options in variants.items()
+        ])
         
-        try:
-            full_enhanced = enhanced_chain.enhanced_invoke(
-                query=query,
-                session_id=f"{session_id}_full",
-                use_summarization=True,
-                generate_followups=True
-            )
-            results["full_enhanced"] = {
-                "answer": full_enhanced["answer"],
-                "approach": "Full Enhanced RAG",
-                "features": full_enhanced.get("enhanced_features", {}),
-                "metadata": full_enhanced.get("metadata", {})
-            }
-        except Exception as e:
-            results["full_enhanced"] = {"error": str(e)}
+        for name, (result, error, usage) in zip(variants, runs):
+            # Every enhanced variant also paid for the shared retrieval
+            comparison.append({
+                "approach": name,
+                **{k: round(v + shared[k], 3) if k == "seconds" else v + shared[k] for k, v in usage.items()}
+            })
+            if error is not None:
+                results[name] = {"error": str(error)}
+            elif name == "enhanced_with_summarization":
+                results[name] = {
+                    "answer": result["answer"],
+                    "approach": "Enhanced RAG with Summarization",
+                    "summary": result.get("enhanced_features", {}).get("document_summary")
+                }
+            else:
+                results[name] = {
+                    "answer": result["answer"],
+                    "approach": "Full Enhanced RAG",
+                    "features": result.get("enhanced_features", {}),
+                    "metadata": result.get("metadata", {})
+                }
         
         return {
             "query": query,
+            "namespace": namespace,
+            "filters": filters,
             "approaches_tested": list(results.keys()),
             "results": results,
+            "comparison": comparison,
+            "shared_retrieval": shared,
             "timestamp": datetime.utcnow().isoformat()
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise http_error(e)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,227 @@
+# src/admission.py
+import heapq
+import itertools
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Condition, Lock
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from src.config import (
+    LLM_MAX_CONCURRENCY, LLM_RATE_PER_SECOND, LLM_BURST,
+    ADMISSION_MAX_INFLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_WAIT_SECONDS
+)
+from src.metrics import ADMISSION_REJECTED
+
+# Lower value = served first. Chat traffic beats batch generation, which beats ingestion.
+CHAT, BATCH, INGEST = 0, 1, 2
+PRIORITY_NAMES = {CHAT: "chat", BATCH: "batch", INGEST: "ingest"}
+# Share of ADMISSION_MAX_INFLIGHT / ADMISSION_MAX_QUEUE at which a priority starts being shed
+PRIORITY_SHARES = {CHAT: 1.0, BATCH: 0.5, INGEST: 0.25}
+
+priority_var: ContextVar[int] = ContextVar("priority", default=BATCH)
+
+
+class Overloaded(Exception):
+    """Raised when a request or outbound call cannot be admitted; maps to HTTP 429."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OutboundScheduler:
+    """
+    Gate for outbound model and embedding calls: at most ``max_concurrency`` in
+    flight, started at no more than ``rate`` per second (token bucket with
+    ``burst``; rate 0 disables it). Waiting calls are served by priority, then
+    arrival; a call that waits longer than ``max_wait`` raises Overloaded.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_PER_SECOND,
+                 burst: int = LLM_BURST, max_wait: float = ADMISSION_WAIT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._cond = Condition()
+        self._waiting: List[tuple] = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self.stats = {"calls": 0, "timeouts": 0, "wait_seconds": 0.0}
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _ready(self, entry) -> bool:
+        return (self._waiting[0] is entry and self._active < self.max_concurrency
+                and (self.rate <= 0 or self._tokens >= 1))
+
+    def acquire(self, priority: Optional[int] = None) -> None:
+        priority = priority_var.get() if priority is None else priority
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._ready(entry):
+                        heapq.heappop(self._waiting)
+                        self._active += 1
+                        if self.rate > 0:
+                            self._tokens -= 1
+                        self.stats["calls"] += 1
+                        self.stats["wait_seconds"] += now - start
+                        self._cond.notify_all()
+                        return
+                    if now >= deadline:
+                        self.stats["timeouts"] += 1
+                        ADMISSION_REJECTED.inc(priority=PRIORITY_NAMES.get(priority, priority), reason="outbound_wait")
+                        raise Overloaded("Model capacity exhausted, retry later", self.retry_after())
+                    timeout = deadline - now
+                    if self.rate > 0 and self._tokens < 1:
+                        timeout = min(timeout, (1 - self._tokens) / self.rate)
+                    self._cond.wait(timeout)
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                raise
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has probably drained."""
+        throughput = self.rate if self.rate > 0 else self.max_concurrency
+        return max(1, min(30, math.ceil((self.queue_depth() + 1) / max(throughput, 1))))
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"active": self._active, "waiting": len(self._waiting),
+                    "max_concurrency": self.max_concurrency, "rate_per_second": self.rate,
+                    "tokens": round(self._tokens, 2), **self.stats,
+                    "wait_seconds": round(self.stats["wait_seconds"], 3)}
+
+
+class AdmissionController:
+    """
+    Request-level load shedding: a request of a given priority is admitted while
+    in-flight requests and the outbound queue are below that priority's share of
+    the limits, so batch and ingestion traffic is refused before chat is.
+    """
+
+    def __init__(self, scheduler: OutboundScheduler, max_inflight: int = ADMISSION_MAX_INFLIGHT,
+                 max_queue: int = ADMISSION_MAX_QUEUE):
+        self.scheduler = scheduler
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self._inflight = 0
+        self._lock = Lock()
+        self.stats: Dict[str, Dict[str, int]] = {
+            name: {"admitted": 0, "rejected": 0} for name in PRIORITY_NAMES.values()
+        }
+
+    def try_admit(self, priority: int) -> Optional[int]:
+        """Admit (returns None) or reject with a Retry-After in seconds."""
+        share = PRIORITY_SHARES[priority]
+        name = PRIORITY_NAMES[priority]
+        with self._lock:
+            reason = None
+            if self._inflight >= max(1, int(self.max_inflight * share)):
+                reason = "inflight"
+            elif self.scheduler.queue_depth() >= max(1, int(self.max_queue * share)):
+                reason = "queue"
+            if reason:
+                self.stats[name]["rejected"] += 1
+                ADMISSION_REJECTED.inc(priority=name, reason=reason)
+                return self.scheduler.retry_after()
+            self._inflight += 1
+            self.stats[name]["admitted"] += 1
+            return None
+
+    def leave(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"inflight": self._inflight, "max_inflight": self.max_inflight,
+                    "max_queue": self.max_queue, "priorities": {k: dict(v) for k, v in self.stats.items()},
+                    "outbound": self.scheduler.snapshot()}
+
+
+class AdmissionCallbackHandler(BaseCallbackHandler):
+    """Holds a scheduler slot for the duration of each chat model call."""
+    run_inline = True
+    raise_error = True  # let Overloaded abort the call instead of being logged
+
+    def __init__(self, scheduler: OutboundScheduler):
+        self.scheduler = scheduler
+        self._held = set()
+        self._lock = Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self.scheduler.acquire()
+        with self._lock:
+            self._held.add(run_id)
+
+    def _release(self, run_id: UUID) -> None:
+        with self._lock:
+            held = run_id in self._held
+            self._held.discard(run_id)
+        if held:
+            self.scheduler.release()
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._release(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._release(run_id)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings whose provider calls go through the outbound scheduler."""
+
+    def __init__(self, inner: Embeddings, scheduler: OutboundScheduler):
+        self.inner = inner
+        self.scheduler = scheduler
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self.scheduler.slot():
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self.scheduler.slot():
+            return self.inner.embed_query(text)
+
+
+scheduler = OutboundScheduler()
+admission = AdmissionController(scheduler)
+admission_callback = AdmissionCallbackHandler(scheduler)
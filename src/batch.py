@@ -0,0 +1,281 @@
+# src/batch.py
+"""
+Bulk answering for offline evaluation: questions are embedded in chunks,
+each chunk is retrieved in parallel while the next is embedded, answers are
+generated with bounded concurrency, and results come back as soon as each
+finishes. Answers match /query without enhancements (compressed MMR
+retrieval, context packing, answer prompt; no chat history).
+
+    python -m src.batch questions.jsonl --out answers.jsonl
+    python -m src.batch questions.jsonl --url http://127.0.0.1:8000 --out answers.jsonl
+
+Each input line is {"input": "..."} with optional "id" and "filters"
+(source, doc_id, ingested_after, ingested_before); output lines carry the same id.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextvars import Context, copy_context
+from functools import partial
+from threading import RLock
+from typing import Any, Dict, Iterator, List, Optional
+
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
+from src.config import (
+    NAMESPACE, BATCH_CONCURRENCY, BATCH_RETRIEVAL_WORKERS, BATCH_EMBED_SIZE, validate_config
+)
+from src.context import pack_context
+from src.filters import SEARCH_KWARGS, build_filter
+from src.metrics import timed
+
+
+def _submit(executor: ThreadPoolExecutor, context: Context, func, *args) -> Future:
+    # Worker threads keep the caller's request id and priority; tasks are also
+    # submitted from done callbacks, so the caller's context is passed in
+    return executor.submit(context.copy().run, func, *args)
+
+
+def _sources(docs) -> List[Dict[str, Any]]:
+    return [{"source": doc.metadata.get("source"), "page": doc.metadata.get("page")} for doc in docs]
+
+
+def embed_questions(questions: List[str], batch_size: int = BATCH_EMBED_SIZE) -> List[List[float]]:
+    """Query vectors in one embedding call per ``batch_size`` questions."""
+    from src.pinecone_vectorstore import get_embedding
+
+    embedding = get_embedding()
+    vectors: List[List[float]] = []
+    for start in range(0, len(questions), batch_size):
+        with timed("batch.embed", questions=len(questions[start:start + batch_size])):
+            vectors.extend(embedding.embed_documents(questions[start:start + batch_size]))
+    return vectors
+
+
+def answer_batch(
+    items: List[Dict[str, Any]],
+    namespace: Optional[str] = None,
+    use_enhancements: bool = False,
+    concurrency: int = BATCH_CONCURRENCY,
+    retrieval_workers: int = BATCH_RETRIEVAL_WORKERS,
+    embed_size: int = BATCH_EMBED_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Answer ``items`` ({"id", "input", "filters"}), yielding one result per item in
+    completion order. Questions are embedded ``embed_size`` at a time; up to
+    ``retrieval_workers`` vector searches start as soon as a chunk's embeddings
+    are back, while the next chunk is embedded, and each finished retrieval is
+    handed straight to compression and generation, up to ``concurrency`` at once,
+    on the same executor (outbound calls are still limited by src.admission).
+    With ``use_enhancements`` the answer is rewritten by the enhanced response stage.
+    Every failure, including one that affects all items, is reported on the items'
+    own results under "error". Closing the iterator early cancels work not yet started.
+    """
+    from src.enhanced_llm import get_enhanced_rag_chain
+    from src.llm import _shared_chains
+    from src.tenants import get_tenant_pool
+
+    questions = [item["input"] for item in items]
+    started = {i: time.perf_counter() for i in range(len(items))}
+
+    def record(index: int) -> Dict[str, Any]:
+        return {"index": index, "id": items[index].get("id"), "input": questions[index]}
+
+    try:
+        tenant = get_tenant_pool().get(namespace)
+        compressor, qa_chain = _shared_chains()
+    except Exception as e:
+        for index in range(len(items)):
+            yield {**record(index), "error": str(e), "seconds": round(time.perf_counter() - started[index], 3)}
+        return
+
+    vectors: Dict[int, List[float]] = {}
+
+    def embed(start: int) -> List[List[float]]:
+        return embed_questions(questions[start:start + embed_size], embed_size)
+
+    def retrieve(index: int):
+        search_kwargs = dict(SEARCH_KWARGS)
+        if items[index].get("filters"):
+            search_kwargs["filter"] = items[index]["filters"]
+        with timed("batch.retrieve"):
+            return tenant.vectorstore.max_marginal_relevance_search_by_vector(vectors.pop(index), **search_kwargs)
+
+    def generate(index: int, docs) -> Dict[str, Any]:
+        query = questions[index]
+        with timed("batch.compress"):
+            docs = compressor.compress_documents(docs, query)
+        context = pack_context(docs, namespace=tenant.namespace)
+        with timed("batch.answer"):
+            answer = qa_chain.invoke({"input": query, "chat_history": [], "context": context})
+        if use_enhancements:
+            result = get_enhanced_rag_chain().enhanced_invoke(
+                query=query, session_id=f"batch-{index}", namespace=tenant.namespace,
+                use_summarization=False, generate_followups=False, defer_extras=False,
+                retrieval_result={"input": query, "context": context, "answer": answer}
+            )
+            answer = result["answer"]
+        return {"answer": answer, "sources": _sources(context)}
+
+    context = copy_context()
+    # One result future per item, completed when its generation (or an earlier stage) ends
+    results = [Future() for _ in items]
+    positions = {future: index for index, future in enumerate(results)}
+    # One embedding call at a time, overlapping the retrievals and generations of earlier chunks
+    executor = ThreadPoolExecutor(max_workers=1 + retrieval_workers + concurrency, thread_name_prefix="batch")
+    lock = RLock()  # done callbacks of already-finished futures run inline, under the lock
+    to_embed = iter(range(0, len(items), embed_size))
+    embedded: deque = deque()  # indexes with a vector, waiting for a retrieval worker
+    retrieved: deque = deque()  # (index, docs) waiting for a generation slot
+    state = {"retrieving": 0, "generating": 0, "closed": False}
+
+    def start_embedding() -> None:
+        start = next(to_embed, None)
+        if start is not None:
+            _submit(executor, context, embed, start).add_done_callback(partial(on_embedded, start))
+
+    def start_retrievals() -> None:
+        while embedded and state["retrieving"] < retrieval_workers:
+            index = embedded.popleft()
+            state["retrieving"] += 1
+            _submit(executor, context, retrieve, index).add_done_callback(partial(on_retrieved, index))
+
+    def start_generations() -> None:
+        while retrieved and state["generating"] < concurrency:
+            index, docs = retrieved.popleft()
+            state["generating"] += 1
+            _submit(executor, context, generate, index, docs).add_done_callback(partial(on_generated, index))
+
+    def on_embedded(start: int, future: Future) -> None:
+        if future.cancelled():
+            return
+        chunk = range(start, min(start + embed_size, len(items)))
+        with lock:
+            if state["closed"]:
+                return
+            start_embedding()
+            if future.exception() is None:
+                for index, vector in zip(chunk, future.result()):
+                    vectors[index] = vector
+                    embedded.append(index)
+                start_retrievals()
+        if future.exception() is not None:
+            for index in chunk:
+                results[index].set_exception(future.exception())
+
+    def on_retrieved(index: int, future: Future) -> None:
+        if future.cancelled():
+            return
+        with lock:
+            state["retrieving"] -= 1
+            if state["closed"]:
+                return
+            start_retrievals()
+            if future.exception() is None:
+                retrieved.append((index, future.result()))
+                start_generations()
+        if future.exception() is not None:
+            results[index].set_exception(future.exception())
+
+    def on_generated(index: int, future: Future) -> None:
+        if future.cancelled():
+            return
+        with lock:
+            state["generating"] -= 1
+            if not state["closed"]:
+                start_generations()
+        if future.exception() is not None:
+            results[index].set_exception(future.exception())
+        else:
+            results[index].set_result(future.result())
+
+    try:
+        with lock:
+            start_embedding()
+        for future in as_completed(results):
+            index = positions[future]
+            result = record(index)
+            try:
+                result.update(future.result())
+            except Exception as e:
+                result["error"] = str(e)
+            result["seconds"] = round(time.perf_counter() - started[index], 3)
+            yield result
+    finally:
+        with lock:
+            state["closed"] = True
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def read_questions(lines) -> List[Dict[str, Any]]:
+    """Parse JSONL question lines; filters use the same fields as the API's SearchFilters."""
+    items = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "input" not in record:
+            raise ValueError(f"line {number}: missing \"input\"")
+        items.append({"id": record.get("id", number), "input": record["input"], "filters": record.get("filters")})
+    return items
+
+
+def _post_batch(url: str, items: List[Dict[str, Any]], args) -> Iterator[Dict[str, Any]]:
+    import requests
+
+    body = {"questions": items, "namespace": args.namespace, "use_enhancements": args.enhanced,
+            "concurrency": args.concurrency}
+    with requests.post(f"{url.rstrip('/')}/query/batch", json=body, stream=True, timeout=args.timeout) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("questions", help="JSONL file of questions ('-' for stdin)")
+    parser.add_argument("--out", help="JSONL results file (default: stdout)")
+    parser.add_argument("--url", help="POST to a running API's /query/batch instead of answering in-process")
+    parser.add_argument("--namespace", default=None, help=f"Tenant namespace (default: {NAMESPACE})")
+    parser.add_argument("--enhanced", action="store_true", help="rewrite answers with the enhanced response stage")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="answers generated at once")
+    parser.add_argument("--timeout", type=float, default=3600, help="HTTP timeout with --url")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.questions == "-" else open(args.questions)
+    with source:
+        items = read_questions(source)
+
+    if args.url:
+        results = _post_batch(args.url, items, args)
+    else:
+        validate_config()
+        for item in items:
+            if item["filters"]:
+                item["filters"] = build_filter(**item["filters"])
+        results = answer_batch(items, args.namespace, args.enhanced, args.concurrency)
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    start, done, errors = time.perf_counter(), 0, 0
+    try:
+        for result in results:
+            out.write(json.dumps(result, default=str) + "\n")
+            done += 1
+            errors += "error" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{done} answered ({errors} errors) in {elapsed:.1f}s, {done / max(elapsed, 1e-9):.2f} questions/s",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
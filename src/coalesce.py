@@ -0,0 +1,113 @@
+# src/coalesce.py
+import asyncio
+import json
+import re
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from src.metrics import CACHE_EVENTS
+from src.retry import DeadlineExceeded, LatencyBudget
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation do not change what is being asked."""
+    return _SPACE_RE.sub(" ", query).strip().strip("?!.").strip().lower()
+
+
+def request_key(query: str, namespace: str, corpus_version: int, filters: Optional[Dict[str, Any]] = None,
+                **flags) -> Hashable:
+    """Coalescing key: normalized query, corpus version, namespace, filters and pipeline flags."""
+    return (
+        normalize_query(query), namespace, corpus_version,
+        json.dumps(filters, sort_keys=True, default=str) if filters else None,
+        tuple(sorted(flags.items())),
+    )
+
+
+class SingleFlight:
+    """
+    Identical concurrent calls share one computation: the first caller for a key
+    starts ``func`` in the threadpool and later callers await the same task.
+    The task is shielded, so a caller that disconnects does not cancel it for the
+    others; ``on_abandon`` (the first caller's) runs once every caller has been
+    cancelled. Results are shared objects; callers must copy before mutating.
+
+    With a ``budget``, the run uses the first caller's budget, extended to the
+    latest deadline of everyone waiting on it, and each caller stops waiting
+    (DeadlineExceeded) at its own deadline.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._on_abandon: Dict[Hashable, Callable[[], None]] = {}
+        self._budgets: Dict[Hashable, LatencyBudget] = {}
+        self.stats = {"requests": 0, "coalesced": 0, "executions": 0, "abandoned": 0}
+
+    async def run(self, key: Hashable, func: Callable, *args, on_abandon: Optional[Callable[[], None]] = None,
+                  budget: Optional[LatencyBudget] = None, **kwargs):
+        self.stats["requests"] += 1
+        deadline = budget.deadline if budget is not None else None
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["coalesced"] += 1
+            CACHE_EVENTS.inc(cache="single_flight", result="hit")
+            if deadline is not None and key in self._budgets:
+                self._budgets[key].extend_to(deadline)
+        else:
+            CACHE_EVENTS.inc(cache="single_flight", result="miss")
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(run_in_threadpool(func, *args, **kwargs))
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            if on_abandon is not None:
+                self._on_abandon[key] = on_abandon
+            if budget is not None:
+                self._budgets[key] = budget
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[key] += 1
+        try:
+            if deadline is None:
+                return await asyncio.shield(task), shared
+            return await asyncio.wait_for(asyncio.shield(task), max(deadline - time.monotonic(), 0)), shared
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and key in self._on_abandon:
+                    # Nobody is waiting: stop the run and let a new caller start afresh
+                    self.stats["abandoned"] += 1
+                    self._on_abandon.pop(key)()
+                    self._forget(key, task)
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded("Request deadline passed while waiting for a coalesced run") from None
+            raise
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if task.done() and not task.cancelled():
+            task.exception()  # mark retrieved: an abandoned run may end in RequestCancelled
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key)
+            self._waiters.pop(key, None)
+            self._on_abandon.pop(key, None)
+            self._budgets.pop(key, None)
+
+    def snapshot(self) -> dict:
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "in_flight": len(self._inflight),
+            "coalescing_ratio": round(self.stats["coalesced"] / requests, 4) if requests else 0.0,
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _single_flight
@@ -1,14 +1,139 @@
 # src/config.py
+import importlib
 import os
-from dotenv import load_dotenv
-load_dotenv()
+import sys
+from typing import List
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or ""
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY") or ""
 PINECONE_INDEX = os.getenv("PINECONE_INDEX") or "ai-chatbot"
 NAMESPACE = os.getenv("PINECONE_NAMESPACE", "test")
+# Comma-separated allowlist of per-request namespaces; empty allows only the default, "*" any valid name
+TENANT_NAMESPACES = [ns.strip() for ns in os.getenv("TENANT_NAMESPACES", "").split(",") if ns.strip()]
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "32"))  # namespaces with a live retrieval chain
+TENANT_IDLE_SECONDS = int(os.getenv("TENANT_IDLE_SECONDS", "1800"))
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o")
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set")
-if not PINECONE_API_KEY:
-    raise ValueError("PINECONE_API_KEY is not set")
+# Per-stage model routing (see src/models.py): the final answer uses CHAT_MODEL,
+# auxiliary stages (query rewriting, compression, summaries, follow-ups, ...) AUX_CHAT_MODEL.
+# MODEL_ROUTES overrides single stages, e.g. "compress=gpt-4o-mini,followups=local:llama3.1".
+AUX_CHAT_MODEL = os.getenv("AUX_CHAT_MODEL", "gpt-4o-mini")
+MODEL_ROUTES = {
+    stage.strip(): model.strip() for stage, model in
+    (route.split("=", 1) for route in os.getenv("MODEL_ROUTES", "").split(",") if "=" in route)
+}
+FALLBACK_CHAT_MODEL = os.getenv("FALLBACK_CHAT_MODEL", CHAT_MODEL)  # used when a stage's model errors or times out
+STAGE_TIMEOUT_SECONDS = float(os.getenv("STAGE_TIMEOUT_SECONDS", "20"))
+STAGE_MAX_RETRIES = int(os.getenv("STAGE_MAX_RETRIES", "1"))  # OpenAI client retries within one call, every model
+# Offline stand-ins from src/fakes.py for every chat stage and the embeddings (benchmarks, load tests).
+# A single stage can also be routed to "fake" or "fake:<latency_ms>" through MODEL_ROUTES.
+STUB_MODELS = os.getenv("STUB_MODELS", "false").lower() == "true"
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "0"))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "60"))
+FAKE_EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "0"))
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://localhost:11434/v1")  # OpenAI-compatible server for "local:<model>"
+
+# Outbound model/embedding call scheduling and request admission (src/admission.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # calls in flight per process
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "20"))  # call starts per second; 0 disables
+LLM_BURST = int(os.getenv("LLM_BURST", "40"))
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "64"))  # chat requests; batch/ingest get less
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))  # waiting outbound calls before shedding
+ADMISSION_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", "10"))  # max wait for an outbound slot
+
+# Stage retries in enhanced_invoke (src/retry.py), bounded by a per-request latency budget.
+# A client's timeout_seconds / X-Request-Timeout is capped at REQUEST_LATENCY_BUDGET_SECONDS.
+REQUEST_LATENCY_BUDGET_SECONDS = float(os.getenv("REQUEST_LATENCY_BUDGET_SECONDS", "40"))
+STAGE_RETRY_ATTEMPTS = int(os.getenv("STAGE_RETRY_ATTEMPTS", "2"))  # attempts per stage, including the first
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5"))  # full-jitter exponential backoff
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))  # client disconnect checks while a query runs
+
+# Document summary and follow-ups computed after the answer is returned (src/extras.py)
+DEFER_EXTRAS = os.getenv("DEFER_EXTRAS", "false").lower() == "true"  # default for requests without defer_extras
+EXTRAS_WORKERS = int(os.getenv("EXTRAS_WORKERS", "4"))
+EXTRAS_TTL_SECONDS = float(os.getenv("EXTRAS_TTL_SECONDS", "600"))
+EXTRAS_MAX_ENTRIES = int(os.getenv("EXTRAS_MAX_ENTRIES", "10000"))
+
+# Bulk answering (POST /query/batch, python -m src.batch)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # questions compressed/answered at once
+BATCH_RETRIEVAL_WORKERS = int(os.getenv("BATCH_RETRIEVAL_WORKERS", "16"))
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "256"))  # questions per embedding call
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "10000"))  # per /query/batch request
+
+# Vector store backend: "pinecone" or "faiss" (local index in LOCAL_INDEX_DIR)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".local_index")
+# Local index compression: "none" (float32), "sq8" (int8 scalar) or "pq" (product quantization)
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")
+PQ_SUBQUANTIZERS = int(os.getenv("PQ_SUBQUANTIZERS", "64"))  # bytes per vector with "pq"
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))  # exact rerank of k * factor candidates; <= 1 disables
+RAW_VECTORS_DTYPE = os.getenv("RAW_VECTORS_DTYPE", "float16")  # on-disk vectors used for reranking
+# Filtered local searches matching at most this many chunks are answered by exact scan of just those chunks
+FILTER_BRUTE_FORCE_LIMIT = int(os.getenv("FILTER_BRUTE_FORCE_LIMIT", "50000"))
+
+# Ingestion-time summaries (stored as chunk metadata, reused at query time). They are built by
+# background jobs after a document is indexed, so ingestion itself does not wait for them.
+INGEST_SUMMARIES = os.getenv("INGEST_SUMMARIES", "true").lower() == "true"
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))  # documents summarized at a time
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "16"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+SUMMARY_FUSION = os.getenv("SUMMARY_FUSION", "false").lower() == "true"
+
+# PDF text extraction
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")  # "auto", "pymupdf" or "pypdf"
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+# Near-duplicate chunk elimination at ingest
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # estimated Jaccard similarity
+
+# Chunking and context packing
+CHUNKING_MODE = os.getenv("CHUNKING_MODE", "flat")  # "flat" or "hierarchical"
+SPLITTER_BACKEND = os.getenv("SPLITTER_BACKEND", "langchain")  # "langchain" or "fast"
+CHUNK_LENGTH_UNIT = os.getenv("CHUNK_LENGTH_UNIT", "chars")  # "chars" or "tokens"
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "300"))
+CHUNK_TOKEN_OVERLAP = int(os.getenv("CHUNK_TOKEN_OVERLAP", "50"))
+PARENT_CHUNK_SIZE = int(os.getenv("PARENT_CHUNK_SIZE", "3000"))
+CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", "400"))
+CHILD_CHUNK_OVERLAP = int(os.getenv("CHILD_CHUNK_OVERLAP", "50"))
+PARENT_STORE_DIR = os.getenv("PARENT_STORE_DIR", ".parent_store")
+PARENT_EXPAND_MIN_HITS = int(os.getenv("PARENT_EXPAND_MIN_HITS", "2"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Without a loadable tiktoken encoding (offline, cold cache) count ~4 characters per token instead
+# of failing; chunk sizes and context budgets are then approximate
+TOKENIZER_FALLBACK = os.getenv("TOKENIZER_FALLBACK", "true").lower() == "true"
+
+# Level of the app's diagnostics (ingest failures, tokenizer fallback, warm-up) on the standard logging module
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Build the default chain and load indexes at app startup instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+
+def validate_config() -> None:
+    """Fail fast on missing credentials; called by the app startup hook and CLIs, not at import."""
+    if not OPENAI_API_KEY and not STUB_MODELS:
+        raise ValueError("OPENAI_API_KEY is not set")
+    if not PINECONE_API_KEY and VECTOR_BACKEND != "faiss":
+        raise ValueError("PINECONE_API_KEY is not set")
+
+
+def load_env() -> List[str]:
+    """
+    Read ``.env`` into the environment (variables already set win) and re-read
+    the settings above; returns the names of the settings it changed. Entry
+    points call this before importing the rest of src, since modules copy
+    settings when imported. Importing src.config alone never reads ``.env``.
+    """
+    from dotenv import dotenv_values, find_dotenv
+    path = find_dotenv()
+    new = {k: v for k, v in dotenv_values(path).items() if v is not None and k not in os.environ} if path else {}
+    if not new:
+        return []
+    before = {name: value for name, value in globals().items() if name.isupper()}
+    os.environ.update(new)
+    importlib.reload(sys.modules[__name__])
+    return sorted(name for name, value in globals().items() if name.isupper() and before.get(name) != value)
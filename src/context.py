@@ -0,0 +1,167 @@
+# src/context.py
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from src.config import CONTEXT_TOKEN_BUDGET, PARENT_EXPAND_MIN_HITS, CHAT_MODEL
+from src.parent_store import get_parent_store
+from src.tokens import count_prompt_tokens, encoding_name, truncate_to_tokens
+
+# Smallest leftover budget worth filling with a truncated document
+_MIN_PARTIAL_TOKENS = 100
+
+
+def _doc_tokens(doc: Document) -> int:
+    """The count stored at ingestion when it was made with the chat model's encoding, else a fresh count."""
+    stored = doc.metadata.get("token_count")
+    if stored is not None and doc.metadata.get("token_encoding") == encoding_name(CHAT_MODEL):
+        return int(stored)
+    return count_prompt_tokens(doc.page_content)
+
+
+def _set_text(doc: Document, text: str) -> None:
+    doc.page_content = text
+    doc.metadata.pop("token_count", None)  # no longer describes the text
+
+
+def _absorb(run: list, rank: int, doc: Document) -> None:
+    """Fold ``doc`` into ``run`` ([rank, merged doc]); the best-ranked chunk's metadata is kept."""
+    if rank < run[0]:
+        merged = run[1]
+        metadata = dict(doc.metadata)
+        if "start_index" in merged.metadata:
+            metadata["start_index"] = merged.metadata["start_index"]
+        else:
+            metadata.pop("start_index", None)
+        if merged.page_content != doc.page_content:
+            metadata.pop("token_count", None)
+        merged.metadata = metadata
+        run[0] = rank
+
+
+def _merge_overlaps(docs: List[Document]) -> List[Document]:
+    """
+    Merge chunks from the same page whose text overlaps; drop contained duplicates.
+    Chunks are grouped by (source, page) and each page is merged in one pass in
+    start_index order. Merged chunks keep the rank of their best-ranked part.
+    """
+    pages: Dict[tuple, List[Tuple[int, Document]]] = {}
+    for rank, doc in enumerate(docs):
+        pages.setdefault((doc.metadata.get("source"), doc.metadata.get("page")), []).append((rank, doc))
+
+    merged: List[list] = []
+    for chunks in pages.values():
+        positioned = sorted(
+            ((rank, doc) for rank, doc in chunks if doc.metadata.get("start_index") is not None),
+            key=lambda item: (item[1].metadata["start_index"], -len(item[1].page_content))
+        )
+        runs: List[list] = []
+        for rank, doc in positioned:
+            text, start = doc.page_content, doc.metadata["start_index"]
+            if runs:
+                last = runs[-1][1]
+                last_end = last.metadata["start_index"] + len(last.page_content)
+                if start + len(text) <= last_end and text in last.page_content:
+                    _absorb(runs[-1], rank, doc)
+                    continue
+                # Only stitch when the offsets really describe the stored text
+                if start <= last_end < start + len(text) and last.page_content.endswith(text[:last_end - start]):
+                    _set_text(last, last.page_content + text[last_end - start:])
+                    _absorb(runs[-1], rank, doc)
+                    continue
+            runs.append([rank, Document(page_content=text, metadata=dict(doc.metadata))])
+
+        # Chunks without offsets (indexed before start_index was stored) can only match by containment
+        for rank, doc in chunks:
+            if doc.metadata.get("start_index") is not None:
+                continue
+            for run in runs:
+                if doc.page_content in run[1].page_content:
+                    _absorb(run, rank, doc)
+                    break
+                if run[1].page_content in doc.page_content:
+                    _set_text(run[1], doc.page_content)
+                    run[1].metadata.pop("start_index", None)
+                    _absorb(run, rank, doc)
+                    break
+            else:
+                runs.append([rank, Document(page_content=doc.page_content, metadata=dict(doc.metadata))])
+        merged.extend(runs)
+
+    merged.sort(key=lambda run: run[0])
+    return [doc for _, doc in merged]
+
+
+def _expandable_parents(docs: List[Document], namespace: Optional[str] = None) -> Dict[str, Document]:
+    """Parent sections hit by at least PARENT_EXPAND_MIN_HITS retrieved children."""
+    hits: Dict[str, int] = {}
+    for doc in docs:
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id:
+            hits[parent_id] = hits.get(parent_id, 0) + 1
+
+    wanted = [pid for pid, n in hits.items() if n >= PARENT_EXPAND_MIN_HITS]
+    if not wanted:
+        return {}
+    return get_parent_store().get_parents(wanted, namespace)
+
+
+def pack_context(
+    docs: List[Document],
+    token_budget: Optional[int] = None,
+    expand_parents: bool = True,
+    namespace: Optional[str] = None
+) -> List[Document]:
+    """
+    Deduplicate overlapping chunks, expand to parent sections where the budget
+    allows, and keep documents in rank order within the token budget.
+    """
+    budget = token_budget or CONTEXT_TOKEN_BUDGET
+    candidates = _merge_overlaps(docs)
+    parents = _expandable_parents(candidates, namespace) if expand_parents else {}
+
+    packed: List[Document] = []
+    emitted = set()
+    used = 0
+    for doc in candidates:
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id in emitted:
+            continue
+        if parent_id in parents:
+            tokens = _doc_tokens(parents[parent_id])
+            if used + tokens <= budget:
+                packed.append(parents[parent_id])
+                emitted.add(parent_id)
+                used += tokens
+                continue
+
+        tokens = _doc_tokens(doc)
+        if used + tokens <= budget:
+            packed.append(doc)
+            used += tokens
+        elif budget - used >= _MIN_PARTIAL_TOKENS or not packed:
+            packed.append(Document(
+                page_content=truncate_to_tokens(doc.page_content, budget - used),
+                metadata={**{k: v for k, v in doc.metadata.items() if k != "token_count"}, "truncated": True}
+            ))
+            used = budget
+    return packed
+
+
+def _pack_from_input(inputs: dict, namespace: Optional[str] = None) -> List[Document]:
+    return pack_context(inputs.get("context", []), inputs.get("context_token_budget"), namespace=namespace)
+
+
+def build_rag_chain(retriever, qa_chain, namespace: Optional[str] = None):
+    """Retrieval chain like ``create_retrieval_chain`` with a context-packing step before QA."""
+    return (
+        RunnablePassthrough.assign(
+            context=retriever.with_config(run_name="retrieve_documents")
+        )
+        | RunnablePassthrough.assign(
+            context=RunnableLambda(partial(_pack_from_input, namespace=namespace)).with_config(run_name="pack_context")
+        )
+        | RunnablePassthrough.assign(answer=qa_chain)
+    ).with_config(run_name="retrieval_chain")
@@ -0,0 +1,220 @@
+# src/dedup.py
+import re
+import zlib
+from hashlib import sha1
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+from src.config import DEDUP_THRESHOLD
+
+_WORD = re.compile(r"\w+")
+_NUM_PERM = 128
+_BANDS = 16
+_ROWS = _NUM_PERM // _BANDS
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+
+_rng = np.random.RandomState(1)
+# a < 2**31 keeps a * h + b (h < 2**32) inside uint64
+_PERM_A = _rng.randint(1, 2 ** 31, size=_NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31, size=_NUM_PERM).astype(np.uint64)
+
+
+def _minhash(words: List[str], shingle_size: int) -> np.ndarray:
+    """MinHash signature over word shingles, all permutations computed at once with numpy."""
+    if len(words) <= shingle_size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode()) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1)
+
+
+def alt_source(doc: Document) -> str:
+    """Where a chunk came from, as recorded in its canonical's alt_sources."""
+    return f"{doc.metadata.get('source', 'unknown')}#page={doc.metadata.get('page', 0)}"
+
+
+class ChunkDeduplicator:
+    """
+    Near-duplicate chunk filter for ingestion.
+
+    Exact duplicates are caught by a hash of the normalized text; near
+    duplicates (boilerplate with small edits) by MinHash signatures. LSH
+    banding (16 bands x 8 rows) finds candidates, which are kept as
+    duplicates when their estimated Jaccard similarity reaches the threshold.
+    The first occurrence stays canonical and collects ``alt_sources``.
+    Keep one instance across files (src.ingest.get_deduplicator keeps one per
+    namespace, seeded with the chunks already indexed); call ``commit()`` once
+    a file's chunks are stored, or ``rollback()`` to undo what ``forget_doc``
+    and ``filter`` changed for a file that could not be indexed. Callers
+    sharing an instance between threads hold ``lock`` from ``forget_doc`` to
+    ``commit``/``rollback``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        shingle_size: int = 3,
+        min_words: int = 8
+    ):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self._exact: Dict[str, Document] = {}
+        self._signatures: List[Tuple[np.ndarray, Document]] = []
+        self._bands: Dict[Tuple[int, bytes], List[int]] = {}
+        self.chunks_in = 0
+        self.duplicates = 0
+        # Canonical chunks that gained alt_sources after they were already upserted
+        self.late_updates: Dict[int, Document] = {}
+        # Signatures of chunks whose document is being re-indexed; never matched again
+        self._forgotten: Set[int] = set()
+        # Undo log of registrations since the last commit()
+        self._staged: Optional[dict] = None
+        self.lock = RLock()
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray):
+        for band in range(_BANDS):
+            yield band, signature[band * _ROWS:(band + 1) * _ROWS].tobytes()
+
+    def _near_match(self, signature: np.ndarray) -> Optional[Document]:
+        checked = set()
+        for key in self._band_keys(signature):
+            for idx in self._bands.get(key, ()):
+                if idx in checked or idx in self._forgotten:
+                    continue
+                checked.add(idx)
+                other, doc = self._signatures[idx]
+                if np.count_nonzero(signature == other) >= self.threshold * _NUM_PERM:
+                    return doc
+        return None
+
+    def _register(self, signature: np.ndarray, doc: Document) -> None:
+        idx = len(self._signatures)
+        self._signatures.append((signature, doc))
+        for key in self._band_keys(signature):
+            self._bands.setdefault(key, []).append(idx)
+
+    def find_canonical(self, doc: Document) -> Optional[Document]:
+        """Return the canonical chunk this one duplicates, or register it as canonical."""
+        words = _WORD.findall(doc.page_content.lower())
+        exact_key = sha1(" ".join(words).encode()).hexdigest()
+        if exact_key in self._exact:
+            return self._exact[exact_key]
+        self._exact[exact_key] = doc
+        if self._staged is not None:
+            self._staged["exact"].append(exact_key)
+            # The same text in a re-indexed document keeps the sources its old copy had collected
+            inherited = self._staged["inherit"].get(exact_key)
+            if inherited:
+                doc.metadata["alt_sources"] = list(inherited)
+
+        if len(words) < self.min_words or self.threshold > 1:
+            return None
+        signature = _minhash(words, self.shingle_size)
+        canonical = self._near_match(signature)
+        if canonical is None:
+            self._register(signature, doc)
+        else:
+            self._exact[exact_key] = canonical
+        return canonical
+
+    def _stage(self) -> dict:
+        if self._staged is None:
+            self._staged = {"exact": [], "signatures": len(self._signatures), "alts": [],
+                            "forgotten_exact": [], "forgotten": [], "inherit": {},
+                            "chunks_in": self.chunks_in, "duplicates": self.duplicates}
+        return self._staged
+
+    def seed(self, chunks: Iterable[Document]) -> None:
+        """Register already indexed chunks (with their doc_id) as canonical, outside any transaction."""
+        for ch in chunks:
+            metadata = dict(ch.metadata)
+            if "alt_sources" in metadata:
+                metadata["alt_sources"] = list(metadata["alt_sources"])
+            self.find_canonical(Document(page_content=ch.page_content, metadata=metadata))
+
+    def forget_doc(self, doc_id: str) -> None:
+        """Stop matching a document's chunks, before that document is indexed again."""
+        staged = self._stage()
+        for key, doc in list(self._exact.items()):
+            if doc.metadata.get("doc_id") == doc_id:
+                staged["forgotten_exact"].append((key, doc))
+                if doc.metadata.get("alt_sources"):
+                    staged["inherit"][key] = doc.metadata["alt_sources"]
+                del self._exact[key]
+        for idx, (_, doc) in enumerate(self._signatures):
+            if idx not in self._forgotten and doc.metadata.get("doc_id") == doc_id:
+                staged["forgotten"].append(idx)
+                self._forgotten.add(idx)
+
+    def filter(self, chunks: List[Document], matches: Optional[list] = None) -> List[Document]:
+        """
+        Drop duplicates, recording their sources on the canonical chunk's metadata.
+        ``matches`` collects (duplicate, canonical) pairs when given.
+        """
+        self._stage()
+        unique = []
+        for ch in chunks:
+            self.chunks_in += 1
+            canonical = self.find_canonical(ch)
+            if canonical is None:
+                unique.append(ch)
+                continue
+            self.duplicates += 1
+            if matches is not None:
+                matches.append((ch, canonical))
+            alt = alt_source(ch)
+            alts = canonical.metadata.setdefault("alt_sources", [])
+            if alt != alt_source(canonical) and alt not in alts:
+                alts.append(alt)
+                self._staged["alts"].append((canonical, alt, id(canonical) in self.late_updates))
+                if "doc_id" in canonical.metadata:
+                    self.late_updates[id(canonical)] = canonical
+        return unique
+
+    def commit(self) -> None:
+        """Keep everything registered since the last commit (the file was indexed)."""
+        self._staged = None
+
+    def rollback(self) -> None:
+        """Undo registrations, alt_sources and forget_doc calls since the last commit."""
+        staged, self._staged = self._staged, None
+        if staged is None:
+            return
+        for key in staged["exact"]:
+            self._exact.pop(key, None)
+        while len(self._signatures) > staged["signatures"]:
+            signature, _ = self._signatures.pop()
+            for key in self._band_keys(signature):
+                self._bands[key].pop()
+                if not self._bands[key]:
+                    del self._bands[key]
+        for key, doc in staged["forgotten_exact"]:
+            self._exact[key] = doc
+        self._forgotten.difference_update(staged["forgotten"])
+        for canonical, alt, was_late in reversed(staged["alts"]):
+            canonical.metadata["alt_sources"].remove(alt)
+            if not canonical.metadata["alt_sources"]:
+                del canonical.metadata["alt_sources"]
+            if not was_late:
+                self.late_updates.pop(id(canonical), None)
+        self.chunks_in = staged["chunks_in"]
+        self.duplicates = staged["duplicates"]
+
+    def stats(self) -> dict:
+        return {
+            "chunks_in": self.chunks_in,
+            "duplicates_removed": self.duplicates,
+            "dedup_ratio": round(self.duplicates / self.chunks_in, 4) if self.chunks_in else 0.0
+        }
@@ -1,151 +1,185 @@
 # src/enhanced_llm.py
-from src.config import OPENAI_API_KEY
-from src.pinecone_vectorstore import get_vectorstore
-from src.prompt import contextualize_prompt, answer_prompt
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
 from src.generative_ai import GenerativeAIEnhancer
-from langchain_openai import ChatOpenAI
-from langchain.chains import create_retrieval_chain, create_history_aware_retriever
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain.prompts import ChatPromptTemplate
+from src.llm import get_llm, _shared_chains
+from src.context import pack_context
+from src.metrics import chain_metrics, timed
+from src.tenants import get_tenant_pool
+from src.filters import search_configurable
+from src.admission import Overloaded
+from src.retry import LatencyBudget, StageRunner
+from src.extras import get_extras_store
+from src.config import DEFER_EXTRAS
 from typing import Dict, List, Any, Optional
+from functools import partial
+from threading import Lock
 import time
+import uuid
 
 class EnhancedRAGChain:
     """Enhanced RAG Chain with Generative AI features"""
     
     def __init__(self):
-        self.llm = ChatOpenAI(api_key=OPENAI_API_KEY, model="gpt-4o", temperature=0)
-        self.vectorstore = get_vectorstore()
-        
-        base_retriever = self.vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 8, "fetch_k": 24, "lambda_mult": 0.6}
-        )
-        
-        compressor = LLMChainExtractor.from_llm(self.llm)
-        self.compression_retriever = ContextualCompressionRetriever(
-            base_compressor=compressor,
-            base_retriever=base_retriever
-        )
-        
-        self.history_aware_retriever = create_history_aware_retriever(
-            self.llm, self.compression_retriever, contextualize_prompt
-        )
-        
-        self.qa_chain = create_stuff_documents_chain(self.llm, answer_prompt)
-        
-        self.rag_chain = create_retrieval_chain(self.history_aware_retriever, self.qa_chain)
+        self.llm = get_llm()
+        # Retrieval chains are per namespace and built lazily by the shared pool
+        self.tenants = get_tenant_pool()
         
         self.ai_enhancer = GenerativeAIEnhancer()
-        
-        self.enhanced_answer_prompt = ChatPromptTemplate.from_template("""
-You are a highly advanced customer support assistant with sophisticated AI capabilities.
-
-CONTEXT FROM COMPANY DOCUMENTS:
-{context}
-
-CONVERSATION HISTORY:
-{chat_history}
-
-CURRENT USER QUESTION: {input}
-
-Generate a comprehensive, helpful response that:
-
-1. **DIRECTLY ANSWERS** the user's question using the provided context
-2. **INCORPORATES RELEVANT DETAILS** from company documentation
-3. **MAINTAINS CONVERSATIONAL FLOW** with previous interactions
-4. **PROVIDES ACTIONABLE GUIDANCE** when possible
-5. **ACKNOWLEDGES LIMITATIONS** if information is incomplete
-6. **USES PROFESSIONAL YET FRIENDLY TONE**
+    
+    @property
+    def vectorstore(self):
+        return self.tenants.get().vectorstore
 
-Key Guidelines:
-- Start with a direct answer
-- Support with specific details from documents
-- Provide step-by-step instructions when relevant
-- Suggest follow-up actions if appropriate
-- Be concise but comprehensive
-- Use bullet points for complex procedures
+    @property
+    def rag_chain(self):
+        return self.tenants.get().rag_chain
 
-Response:
-""")
-    
     def enhanced_invoke(
         self, 
         query: str, 
         session_id: str,
         chat_history: List[Dict] = None,
         use_summarization: bool = True,
-        generate_followups: bool = False
+        generate_followups: bool = False,
+        context_token_budget: Optional[int] = None,
+        namespace: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        response_style: str = "professional",
+        budget: Optional[LatencyBudget] = None,
+        defer_extras: bool = DEFER_EXTRAS,
+        retrieval_result: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
-        Enhanced invoke method with generative AI features
+        Enhanced invoke method with generative AI features.
+        ``filters`` is a metadata filter (see src.filters.build_filter) applied in the vector search.
+        Each stage is retried on transient errors within ``budget`` (REQUEST_LATENCY_BUDGET_SECONDS
+        by default). Retrieval and the answer are separate stages, so retrying a failed answer
+        does not repeat retrieval and compression. Only those two are required: if an optional stage still fails, or
+        would not fit in the remaining budget, the result omits it (the rewrite falls back to the
+        raw query, the enhanced response to the base answer) and metadata lists it under
+        ``failed_stages`` or ``stages_skipped``. A cancelled budget stops before the next stage.
+        With ``defer_extras`` the document summary and follow-ups are computed after returning
+        and fetched by ``metadata.response_id`` from src.extras (GET /responses/{id}/extras).
+        A ``retrieval_result`` from an earlier ``rag_chain`` call on the same query skips query
+        rewriting and retrieval, so several generation settings can share one retrieval.
         """
         start_time = time.time()
         chat_history = chat_history or []
+        tenant = self.tenants.get(namespace)
+        search_config = {"configurable": search_configurable(filters)}
+        stages = StageRunner(budget)
         
-        try:
-            enhanced_query = self.ai_enhancer.enhance_query_with_context(query, chat_history)
-            
-            retrieval_result = self.rag_chain.invoke({
-                "input": enhanced_query,
-                "chat_history": self._format_chat_history(chat_history)
-            })
-            
-            retrieved_docs = retrieval_result.get("context", [])
-            base_answer = retrieval_result.get("answer", "")
-            
-            enhanced_features = {}
-            
-            if use_summarization and retrieved_docs:
-                enhanced_features["document_summary"] = self.ai_enhancer.summarize_documents(
-                    retrieved_docs, query
-                )
-            
-            enhanced_response = self.ai_enhancer.generate_contextual_response(
-                query=query,
-                retrieved_context=base_answer,
-                chat_history=chat_history,
-                user_intent=self._detect_intent(query)
+        if retrieval_result is None:
+            enhanced_query = stages.run(
+                "query_rewrite", self.ai_enhancer.enhance_query_with_context, query, chat_history,
+                raise_errors=True, optional=True, default=query
             )
             
-            if generate_followups:
-                enhanced_features["follow_up_suggestions"] = self.ai_enhancer.generate_follow_up_suggestions(
-                    query, enhanced_response, base_answer
-                )
+            formatted_history = self._format_chat_history(chat_history)
+            context = stages.run(
+                "retrieve", self._retrieve, tenant, enhanced_query, formatted_history,
+                context_token_budget, search_config
+            )
+            answer = stages.run("answer", self._answer, enhanced_query, formatted_history, context)
+            retrieval_result = {"input": enhanced_query, "context": context, "answer": answer}
+        else:
+            enhanced_query = retrieval_result.get("input", query)
+        
+        retrieved_docs = retrieval_result.get("context", [])
+        base_answer = retrieval_result.get("answer", "")
+        
+        enhanced_response = stages.run(
+            "response", self.ai_enhancer.generate_contextual_response,
+            query=query,
+            retrieved_context=base_answer,
+            chat_history=chat_history,
+            user_intent=self._detect_intent(query),
+            response_style=response_style,
+            raise_errors=True, optional=True, default=base_answer
+        )
+        
+        response_id = uuid.uuid4().hex
+        extras = partial(
+            self._extras, query=query, documents=retrieved_docs if use_summarization else [],
+            response=enhanced_response, base_answer=base_answer, generate_followups=generate_followups
+        )
+        extras_pending = defer_extras and bool(use_summarization and retrieved_docs or generate_followups)
+        if extras_pending:
+            get_extras_store().submit(response_id, extras)
+            enhanced_features = {}
+        else:
+            enhanced_features = extras(stages)
 
-            processing_time = time.time() - start_time
-            
-            return {
-                "answer": enhanced_response,
-                "original_answer": base_answer,
-                "context": retrieved_docs,
-                "enhanced_features": enhanced_features,
-                "metadata": {
-                    "processing_time": processing_time,
-                    "enhanced_query": enhanced_query,
-                    "documents_retrieved": len(retrieved_docs),
-                    "session_id": session_id
-                }
-            }
-            
-        except Exception as e:
-            fallback_result = self.rag_chain.invoke({
-                "input": query,
-                "chat_history": self._format_chat_history(chat_history)
-            })
-            
-            return {
-                "answer": fallback_result.get("answer", f"I encountered an error: {str(e)}"),
-                "context": fallback_result.get("context", []),
-                "enhanced_features": {"error": str(e)},
-                "metadata": {"fallback_used": True, "session_id": session_id}
+        processing_time = time.time() - start_time
+        
+        return {
+            "answer": enhanced_response,
+            "original_answer": base_answer,
+            "context": retrieved_docs,
+            "enhanced_features": enhanced_features,
+            "metadata": {
+                "processing_time": processing_time,
+                "enhanced_query": enhanced_query,
+                "documents_retrieved": len(retrieved_docs),
+                "session_id": session_id,
+                "namespace": tenant.namespace,
+                "filters": filters,
+                "response_style": response_style,
+                "response_id": response_id,
+                "extras_pending": extras_pending,
+                **stages.report()
             }
+        }
+    
+    @staticmethod
+    def _retrieve(tenant, query: str, chat_history: List, context_token_budget: Optional[int],
+                  config: Dict[str, Any]) -> List:
+        """Contextualize, search and compress (tenant.retriever), then pack the context: rag_chain minus the answer."""
+        docs = tenant.retriever.invoke(
+            {"input": query, "chat_history": chat_history},
+            config={**config, "run_name": "retrieve_documents", "callbacks": [chain_metrics]}
+        )
+        with timed("pack_context"):
+            return pack_context(docs, context_token_budget, namespace=tenant.namespace)
+
+    @staticmethod
+    def _answer(query: str, chat_history: List, context: List) -> str:
+        """The rag_chain's answer step over already retrieved documents."""
+        _, qa_chain = _shared_chains()
+        return qa_chain.invoke({"input": query, "chat_history": chat_history, "context": context})
+
+    def _extras(self, stages: Optional[StageRunner] = None, *, query: str, documents: List,
+                response: str, base_answer: str, generate_followups: bool) -> Dict[str, Any]:
+        """Document summary and follow-up suggestions; optional stages of ``stages`` (a fresh runner if None)."""
+        deferred = stages is None
+        stages = stages or StageRunner()
+        extras = {}
+        if documents:
+            summary = stages.run(
+                "summary", self.ai_enhancer.summarize_documents, documents, query,
+                raise_errors=True, optional=True
+            )
+            if summary is not None:
+                extras["document_summary"] = summary
+        if generate_followups:
+            suggestions = stages.run(
+                "followups", self.ai_enhancer.generate_follow_up_suggestions, query, response, base_answer,
+                raise_errors=True, optional=True
+            )
+            if suggestions is not None:
+                extras["follow_up_suggestions"] = suggestions
+        if deferred and stages.failures:
+            extras["failed_stages"] = stages.failures
+        return extras
     
-    def generate_faqs(self, num_faqs: int = 10) -> List[Dict[str, str]]:
+    def generate_faqs(self, num_faqs: int = 10, namespace: Optional[str] = None) -> List[Dict[str, str]]:
         """Generate FAQs from all documents in the vector store"""
         try:
+            vectorstore = self.tenants.get(namespace).vectorstore
             sample_queries = [
                 "company policies", "customer service", "products", 
                 "procedures", "guidelines", "support"
@@ -153,7 +187,7 @@ Response:
             
             all_docs = []
             for query in sample_queries:
-                docs = self.vectorstore.similarity_search(query, k=3)
+                docs = vectorstore.similarity_search(query, k=3)
                 all_docs.extend(docs)
             
             unique_docs = []
@@ -165,13 +199,15 @@ Response:
             
             return self.ai_enhancer.generate_faq_from_documents(unique_docs, num_faqs)
             
+        except Overloaded:
+            raise
         except Exception as e:
             return [{"question": "Error generating FAQs", "answer": str(e)}]
     
-    def analyze_document_content(self, limit: int = 20) -> Dict[str, Any]:
+    def analyze_document_content(self, limit: int = 20, namespace: Optional[str] = None) -> Dict[str, Any]:
         """Analyze the content of indexed documents"""
         try:
-            sample_docs = self.vectorstore.similarity_search("", k=limit)
+            sample_docs = self.tenants.get(namespace).vectorstore.similarity_search("", k=limit)
             
             if not sample_docs:
                 return {"error": "No documents found in vector store"}
@@ -193,6 +229,8 @@ Response:
                 ]))
             }
             
+        except Overloaded:
+            raise
         except Exception as e:
             return {"error": str(e)}
     
@@ -223,11 +261,21 @@ Response:
         else:
             return "general"
 
-enhanced_rag_chain = EnhancedRAGChain()
+_enhanced_rag_chain = None
+_enhanced_lock = Lock()
 
 def get_enhanced_rag_chain():
-    """Get the enhanced RAG chain instance"""
-    return enhanced_rag_chain
+    """Get the shared enhanced RAG chain instance, creating it on first use"""
+    global _enhanced_rag_chain
+    with _enhanced_lock:
+        if _enhanced_rag_chain is None:
+            _enhanced_rag_chain = EnhancedRAGChain()
+        return _enhanced_rag_chain
+
+def __getattr__(name: str):
+    if name == "enhanced_rag_chain":
+        return get_enhanced_rag_chain()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def test_enhanced_features():
     """Test the enhanced features"""
@@ -0,0 +1,78 @@
+# src/extras.py
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from src.admission import BATCH, priority_var
+from src.config import EXTRAS_WORKERS, EXTRAS_TTL_SECONDS, EXTRAS_MAX_ENTRIES
+
+
+class ExtrasStore:
+    """
+    Results of work done after an answer was returned (follow-up suggestions,
+    document summary), keyed by response id. Jobs run on a small thread pool at
+    batch priority, so they never delay answers; entries expire after
+    EXTRAS_TTL_SECONDS and the oldest are evicted beyond EXTRAS_MAX_ENTRIES.
+    """
+
+    def __init__(self, workers: int = EXTRAS_WORKERS, ttl: float = EXTRAS_TTL_SECONDS,
+                 max_entries: int = EXTRAS_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extras")
+        self.stats = {"submitted": 0, "ready": 0, "failed": 0, "evicted": 0}
+
+    def submit(self, response_id: str, func: Callable[..., Dict[str, Any]], *args, **kwargs) -> None:
+        """Run ``func`` in the background; its dict result becomes the entry's content."""
+        with self._lock:
+            self._entries[response_id] = {"status": "pending", "created_at": time.time()}
+            self.stats["submitted"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+        # Keep the request id for traces; the priority is lowered inside the job
+        self._executor.submit(copy_context().run, self._run, response_id, func, args, kwargs)
+
+    def _run(self, response_id: str, func: Callable, args: tuple, kwargs: dict) -> None:
+        priority_var.set(BATCH)
+        try:
+            update = {"status": "ready", **func(*args, **kwargs)}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+        with self._lock:
+            entry = self._entries.get(response_id)
+            if entry is not None:
+                entry.update(update, completed_at=time.time())
+            self.stats[update["status"]] += 1
+
+    def get(self, response_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(response_id)
+            if entry is None:
+                return None
+            if time.time() - entry["created_at"] > self.ttl:
+                del self._entries[response_id]
+                return None
+            return dict(entry)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            pending = sum(1 for e in self._entries.values() if e["status"] == "pending")
+            return {**self.stats, "entries": len(self._entries), "pending": pending}
+
+
+_store: Optional[ExtrasStore] = None
+_store_lock = Lock()
+
+
+def get_extras_store() -> ExtrasStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ExtrasStore()
+        return _store
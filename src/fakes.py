@@ -0,0 +1,124 @@
+# src/fakes.py
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.config import EMBEDDING_DIMENSIONS
+
+# Offline stand-ins for the OpenAI chat and embedding models, used by benchmarks,
+# the load generator and STUB_MODELS=true. Outputs depend only on the input, so
+# runs are repeatable; latency and output length are configurable.
+
+_WORDS = (
+    "refund policy order shipping warranty return invoice account payment support "
+    "ticket product manual device reset password delivery subscription billing exchange "
+    "customer service days business request receipt team contact email phone"
+).split()
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model: answers with ``output_tokens`` pseudo-words derived
+    from the prompt after ``latency_ms + ms_per_token * output_tokens``, and reports
+    usage_metadata like the OpenAI client does. Every third line ends in "?" so
+    follow-up parsing has something to find.
+    """
+    model_name: str = "fake"
+    latency_ms: float = 0.0
+    ms_per_token: float = 0.0
+    output_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model_name": self.model_name, "latency_ms": self.latency_ms, "output_tokens": self.output_tokens}
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = random.Random(_seed(prompt))
+        words = [rng.choice(_WORDS) for _ in range(self.output_tokens)]
+        lines = []
+        for i, start in enumerate(range(0, len(words), 12)):
+            line = " ".join(words[start:start + 12]).capitalize()
+            lines.append(line + ("?" if i % 3 == 2 else "."))
+        text = "\n".join(lines)
+        usage = {
+            "input_tokens": _estimate_tokens(prompt),
+            "output_tokens": len(words),
+            "total_tokens": _estimate_tokens(prompt) + len(words),
+        }
+        message = AIMessage(content=text, usage_metadata=usage,
+                            response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _delay(self) -> float:
+        return (self.latency_ms + self.ms_per_token * self.output_tokens) / 1000
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self._delay():
+            time.sleep(self._delay())
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self._delay():
+            await asyncio.sleep(self._delay())
+        return self._respond(messages)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words embeddings: texts sharing words get similar vectors, so
+    retrieval over a fake index still returns plausible neighbours.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS, latency_ms: float = 0.0):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+        self._word_cache = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._word_cache.get(word)
+        if vector is None:
+            rng = np.random.default_rng(_seed(word))
+            vector = rng.standard_normal(self.dimensions).astype(np.float32)
+            if len(self._word_cache) < 100_000:
+                self._word_cache[word] = vector
+        return vector
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in _TOKEN_RE.findall(text.lower()):
+            vector += self._word_vector(word)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,105 @@
+# src/fast_splitter.py
+import re
+from typing import Iterable, List, Sequence, Tuple
+
+from langchain.schema import Document
+
+# Joins pages in the shared buffer; never matches a separator so chunks cannot span pages
+_PAGE_SEP = "\x00"
+_NON_WS = re.compile(r"\S")
+_WS_RUN = re.compile(r"\s+")
+
+
+class FastTextSplitter:
+    """
+    Recursive-style character splitter that works on offsets.
+
+    All pages of a batch are joined into one contiguous buffer and chunk
+    boundaries are found with ``str.rfind`` / precompiled regex scans bounded
+    by ``pos``/``endpos``, so text is only sliced once per emitted chunk.
+    Chunks end at the last highest-priority separator that fits, like
+    ``RecursiveCharacterTextSplitter``, and ``start_index`` is the
+    page-relative offset of the chunk, as with ``add_start_index=True``.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1200,
+        chunk_overlap: int = 200,
+        separators: Sequence[str] = ("\n\n", "\n", " ", ""),
+        add_start_index: bool = True
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = [s for s in separators if s]
+        self.add_start_index = add_start_index
+
+    def _find_end(self, buffer: str, cursor: int, prev_end: int, page_end: int) -> int:
+        limit = cursor + self.chunk_size
+        if limit >= page_end:
+            return page_end
+        # A chunk must add text past the previous one, not just repeat its overlap
+        fresh = _NON_WS.search(buffer, prev_end, page_end)
+        lowest = max(cursor, fresh.start() if fresh else prev_end) + 1
+        for sep in self.separators:
+            pos = buffer.rfind(sep, lowest, limit + len(sep))
+            if pos >= lowest:
+                return pos
+        return limit
+
+    def _next_start(self, buffer: str, cursor: int, end: int) -> int:
+        start = end - self.chunk_overlap
+        if start <= cursor:
+            return end
+        # Begin the overlap on a word boundary rather than mid-word
+        match = _WS_RUN.search(buffer, start, end)
+        return match.end() if match else end
+
+    def _page_spans(self, buffer: str, page_start: int, page_end: int) -> List[Tuple[int, int]]:
+        spans = []
+        match = _NON_WS.search(buffer, page_start, page_end)
+        cursor = match.start() if match else page_end
+        end = page_start
+        while cursor < page_end:
+            end = self._find_end(buffer, cursor, end, page_end)
+            stripped_end = end
+            while stripped_end > cursor and buffer[stripped_end - 1].isspace():
+                stripped_end -= 1
+            if stripped_end > cursor:
+                spans.append((cursor - page_start, stripped_end - page_start))
+            if end >= page_end or _NON_WS.search(buffer, end, page_end) is None:
+                break
+            cursor = self._next_start(buffer, cursor, end)
+            match = _NON_WS.search(buffer, cursor, page_end)
+            cursor = match.start() if match else page_end
+        return spans
+
+    def split_spans(self, texts: Sequence[str]) -> List[List[Tuple[int, int]]]:
+        """Return page-relative ``(start, end)`` chunk offsets for every text in the batch."""
+        buffer = _PAGE_SEP.join(texts)
+        spans = []
+        page_start = 0
+        for text in texts:
+            page_end = page_start + len(text)
+            spans.append(self._page_spans(buffer, page_start, page_end))
+            page_start = page_end + len(_PAGE_SEP)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans([text])[0]]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        documents = list(documents)
+        all_spans = self.split_spans([doc.page_content for doc in documents])
+        chunks = []
+        for doc, spans in zip(documents, all_spans):
+            text = doc.page_content
+            for start, end in spans:
+                metadata = dict(doc.metadata)
+                if self.add_start_index:
+                    metadata["start_index"] = start
+                # Fields are already valid; skip pydantic validation on the hot path
+                chunks.append(Document.model_construct(page_content=text[start:end], metadata=metadata))
+        return chunks
@@ -0,0 +1,57 @@
+# src/filters.py
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Union
+
+# Default retriever settings; a request filter is added on top of these
+SEARCH_KWARGS = {"k": 8, "fetch_k": 24, "lambda_mult": 0.6}
+
+# Metadata fields a request may filter on (stamped by src/ingest.stamp_chunks)
+FILTER_FIELDS = ("source", "doc_id")
+TIMESTAMP_FIELD = "ingested_ts"
+
+
+def to_timestamp(value: Union[datetime, str, int, float]) -> int:
+    """Epoch seconds for a datetime/ISO string; naive values are taken as UTC."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _values(value: Union[str, List[str]]) -> List[str]:
+    return [value] if isinstance(value, str) else list(value)
+
+
+def build_filter(
+    source: Optional[Union[str, List[str]]] = None,
+    doc_id: Optional[Union[str, List[str]]] = None,
+    ingested_after: Optional[Union[datetime, str]] = None,
+    ingested_before: Optional[Union[datetime, str]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Metadata filter in the Pinecone query language, which LangChain's FAISS
+    store also understands. Returns None when nothing is filtered.
+    """
+    conditions: Dict[str, Any] = {}
+    for field, value in (("source", source), ("doc_id", doc_id)):
+        if value:
+            conditions[field] = {"$in": _values(value)}
+
+    time_range = {}
+    if ingested_after is not None:
+        time_range["$gte"] = to_timestamp(ingested_after)
+    if ingested_before is not None:
+        time_range["$lte"] = to_timestamp(ingested_before)
+    if time_range:
+        conditions[TIMESTAMP_FIELD] = time_range
+    return conditions or None
+
+
+def search_configurable(filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """``configurable`` entries that push ``filter`` down to the retriever's vector search."""
+    if not filter:
+        return {}
+    return {"search_kwargs": {**SEARCH_KWARGS, "filter": filter}}
@@ -1,9 +1,16 @@
-# src/generative_ai_enhancements.py
+# src/generative_ai.py
 from typing import List, Dict, Any, Optional
-from langchain_openai import ChatOpenAI
 from langchain.schema import Document
-from langchain.prompts import ChatPromptTemplate
-from src.config import OPENAI_API_KEY
+
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
+from src.config import (
+    SUMMARY_BATCH_SIZE, SUMMARY_MAX_CONCURRENCY, SUMMARY_FUSION
+)
+from src.prompt_registry import get_prompt_registry
 import json
 import re
 
@@ -11,48 +18,34 @@ class GenerativeAIEnhancer:
     """Advanced Generative AI features for the customer support chatbot"""
     
     def __init__(self):
-        self.llm = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
-            model="gpt-4o",
-            temperature=0.3
-        )
-        self.creative_llm = ChatOpenAI(
-            api_key=OPENAI_API_KEY,
-            model="gpt-4o",
-            temperature=0.7
-        )
+        from src.models import get_stage_llm
+        # Each stage uses the model routed to it in src.models (AUX_CHAT_MODEL unless configured)
+        self.stage_llm = get_stage_llm
+        self.llm = get_stage_llm("response")
+        self.creative_llm = get_stage_llm("faq")
+        # Templates and prompt|llm chains are built once and shared by all enhancer instances
+        self.prompts = get_prompt_registry()
     
-    def summarize_documents(self, documents: List[Document], query: str = "") -> str:
+    def summarize_documents(self, documents: List[Document], query: str = "", raise_errors: bool = False) -> str:
         """
-        Advanced document summarization with query-focused approach
+        Advanced document summarization with query-focused approach.
+        With ``raise_errors`` model errors propagate instead of becoming the result text,
+        so the caller can retry them (as enhanced_invoke does for all of its stages).
         """
         if not documents:
             return "No relevant documents found."
         
+        # Chunks and parent sections summarized at ingestion carry chunk_summary/doc_summary;
+        # legacy chunks without them are left out rather than sending everything to the model
+        if any(doc.metadata.get("chunk_summary") or doc.metadata.get("doc_summary") for doc in documents[:5]):
+            return self.assemble_precomputed_summary(documents[:5], query)
+        
         combined_content = "\n\n".join([doc.page_content for doc in documents[:5]])
         
         if len(combined_content) > 8000:
             combined_content = combined_content[:8000] + "..."
         
-        summarization_prompt = ChatPromptTemplate.from_template("""
-You are an expert document summarizer for a customer support system.
-
-USER QUERY: {query}
-
-DOCUMENTS TO SUMMARIZE:
-{documents}
-
-Create a comprehensive yet concise summary that:
-1. Directly addresses the user's query if provided
-2. Highlights the most important information from the documents
-3. Maintains key details like procedures, policies, and specific instructions
-4. Uses clear, customer-friendly language
-5. Organizes information logically
-
-SUMMARY:
-""")
-        
-        chain = summarization_prompt | self.llm
+        chain = self.prompts.chain("QUERY_SUMMARY_PROMPT", self.stage_llm("summary"))
         
         try:
             response = chain.invoke({
@@ -61,17 +54,109 @@ SUMMARY:
             })
             return response.content
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Summary generation failed: {str(e)}"
     
+    def summarize_chunks(self, chunks: List[Document]) -> List[str]:
+        """
+        Summarize chunks at ingestion time in batches (one short summary per chunk)
+        """
+        chain = self.prompts.chain("CHUNK_SUMMARY_PROMPT", self.stage_llm("ingest_summary"))
+        summaries = []
+        
+        for start in range(0, len(chunks), SUMMARY_BATCH_SIZE):
+            batch = chunks[start:start + SUMMARY_BATCH_SIZE]
+            responses = chain.batch(
+                [
+                    {
+                        "source": ch.metadata.get("source", "unknown"),
+                        "content": ch.page_content
+                    }
+                    for ch in batch
+                ],
+                config={"max_concurrency": SUMMARY_MAX_CONCURRENCY},
+                return_exceptions=True
+            )
+            for response in responses:
+                summaries.append("" if isinstance(response, Exception) else response.content.strip())
+        
+        return summaries
+    
+    def summarize_document(self, chunk_summaries: List[str], source: str = "") -> str:
+        """
+        Build a per-document overview from its chunk summaries
+        """
+        summaries = [s for s in chunk_summaries if s]
+        if not summaries:
+            return ""
+        
+        combined = "\n".join(f"- {s}" for s in summaries)
+        if len(combined) > 8000:
+            combined = combined[:8000] + "..."
+        
+        chain = self.prompts.chain("DOCUMENT_SUMMARY_PROMPT", self.stage_llm("ingest_summary"))
+        
+        try:
+            response = chain.invoke({
+                "source": source or "unknown",
+                "summaries": combined
+            })
+            return response.content.strip()
+        except Exception:
+            return ""
+    
+    def assemble_precomputed_summary(
+        self, 
+        documents: List[Document], 
+        query: str = "", 
+        fuse: Optional[bool] = None
+    ) -> str:
+        """
+        Assemble a summary from the chunk/document summaries stored at ingestion time.
+        Only the optional fusion step calls the LLM.
+        """
+        fuse = SUMMARY_FUSION if fuse is None else fuse
+        
+        sections = []
+        seen_docs = set()
+        for doc in documents:
+            doc_key = doc.metadata.get("doc_id") or doc.metadata.get("source", "unknown")
+            doc_summary = doc.metadata.get("doc_summary")
+            if doc_summary and doc_key not in seen_docs:
+                seen_docs.add(doc_key)
+                sections.append(f"**{doc.metadata.get('source', 'Document')}**: {doc_summary}")
+            chunk_line = f"- {doc.metadata.get('chunk_summary', '')}"
+            if doc.metadata.get("chunk_summary") and chunk_line not in sections:
+                sections.append(chunk_line)
+        
+        assembled = "\n".join(sections)
+        if not fuse or not assembled:
+            return assembled or "No relevant documents found."
+        
+        chain = self.prompts.chain("SUMMARY_FUSION_PROMPT", self.stage_llm("summary"))
+        
+        try:
+            response = chain.invoke({
+                "query": query or "general information",
+                "summaries": assembled
+            })
+            return response.content
+        except Exception:
+            return assembled
+    
     def generate_contextual_response(
         self, 
         query: str, 
         retrieved_context: str, 
         chat_history: List[Dict] = None,
-        user_intent: str = "inquiry"
+        user_intent: str = "inquiry",
+        response_style: str = "professional",
+        raise_errors: bool = False
     ) -> str:
         """
-        Enhanced response generation with context awareness and intent consideration
+        Enhanced response generation with context awareness and intent consideration.
+        ``response_style`` is one of prompt.RESPONSE_STYLES (professional, friendly, concise).
         """
         chat_history = chat_history or []
         
@@ -84,43 +169,7 @@ SUMMARY:
                 for msg in recent_history
             ])
         
-        response_prompt = ChatPromptTemplate.from_template("""
-You are an expert customer support assistant with advanced AI capabilities.
-
-CONVERSATION CONTEXT:
-{history_context}
-
-CURRENT USER QUERY: {query}
-DETECTED INTENT: {intent}
-
-RETRIEVED COMPANY INFORMATION:
-{context}
-
-Generate a response that:
-
-1. **DIRECTLY ADDRESSES** the user's specific question
-2. **LEVERAGES CONTEXT** from retrieved company documents
-3. **MAINTAINS CONVERSATION FLOW** considering previous exchanges
-4. **ADAPTS TONE** based on user intent:
-   - Complaint: Empathetic and solution-focused
-   - Inquiry: Informative and helpful
-   - Request: Action-oriented and clear
-   - Compliment: Appreciative and encouraging
-
-5. **PROVIDES ACTIONABLE INFORMATION** when possible
-6. **ACKNOWLEDGES LIMITATIONS** if information is incomplete
-7. **SUGGESTS NEXT STEPS** when appropriate
-
-RESPONSE STRUCTURE:
-- Start with direct answer to the query
-- Provide relevant details from company documents
-- Include any necessary procedures or steps
-- End with helpful follow-up suggestions if needed
-
-Generate a natural, helpful response:
-""")
-        
-        chain = response_prompt | self.llm
+        chain = self.prompts.response_chain(self.llm, user_intent, response_style)
         
         try:
             response = chain.invoke({
@@ -131,6 +180,8 @@ Generate a natural, helpful response:
             })
             return response.content
         except Exception as e:
+            if raise_errors:
+                raise
             return f"I apologize, but I encountered an error generating a response: {str(e)}"
     
     def generate_faq_from_documents(self, documents: List[Document], num_faqs: int = 10) -> List[Dict[str, str]]:
@@ -145,27 +196,7 @@ Generate a natural, helpful response:
         if len(combined_content) > 10000:
             combined_content = combined_content[:10000] + "..."
         
-        faq_prompt = ChatPromptTemplate.from_template("""
-You are an expert at creating customer support FAQs from company documentation.
-
-COMPANY DOCUMENTATION:
-{documents}
-
-Generate {num_faqs} high-quality FAQ pairs that:
-1. Address common customer questions likely to arise from this documentation
-2. Provide clear, actionable answers
-3. Cover different aspects of the company's services/products
-4. Use customer-friendly language
-5. Are specific and helpful
-
-Format each FAQ as:
-Q: [Question]
-A: [Answer]
-
-Generate diverse FAQs covering different topics from the documentation:
-""")
-        
-        chain = faq_prompt | self.creative_llm
+        chain = self.prompts.chain("FAQ_EXTRACTION_PROMPT", self.creative_llm)
         
         try:
             response = chain.invoke({
@@ -183,23 +214,7 @@ Generate diverse FAQs covering different topics from the documentation:
         """
         Generate multiple variations of a response for A/B testing
         """
-        variation_prompt = ChatPromptTemplate.from_template("""
-You are tasked with creating variations of a customer support response for A/B testing.
-
-ORIGINAL RESPONSE:
-{base_response}
-
-Generate {num_variations} different variations that:
-1. Maintain the same core information and accuracy
-2. Use different phrasing and structure
-3. Vary in tone (professional, friendly, concise)
-4. Keep the same level of helpfulness
-5. Are suitable for customer support context
-
-Variations:
-""")
-        
-        chain = variation_prompt | self.creative_llm
+        chain = self.prompts.chain("RESPONSE_VARIATIONS_PROMPT", self.stage_llm("variations"))
         
         try:
             response = chain.invoke({
@@ -213,27 +228,12 @@ Variations:
         except Exception as e:
             return [base_response] 
     
-    def generate_follow_up_suggestions(self, query: str, response: str, context: str) -> List[str]:
+    def generate_follow_up_suggestions(self, query: str, response: str, context: str,
+                                       raise_errors: bool = False) -> List[str]:
         """
         Generate intelligent follow-up question suggestions
         """
-        followup_prompt = ChatPromptTemplate.from_template("""
-Based on this customer support interaction, suggest relevant follow-up questions.
-
-USER QUERY: {query}
-ASSISTANT RESPONSE: {response}
-CONTEXT: {context}
-
-Generate 3-5 intelligent follow-up questions that:
-1. Build naturally on the current conversation
-2. Address related topics the customer might want to know
-3. Are specific and actionable
-4. Help the customer get more value from the support system
-
-Follow-up questions:
-""")
-        
-        chain = followup_prompt | self.creative_llm
+        chain = self.prompts.chain("FOLLOWUP_SUGGESTIONS_PROMPT", self.stage_llm("followups"))
         
         try:
             response_obj = chain.invoke({
@@ -246,9 +246,12 @@ Follow-up questions:
             return suggestions
             
         except Exception as e:
+            if raise_errors:
+                raise
             return ["Is there anything else I can help you with?"]
     
-    def enhance_query_with_context(self, original_query: str, chat_history: List[Dict]) -> str:
+    def enhance_query_with_context(self, original_query: str, chat_history: List[Dict],
+                                   raise_errors: bool = False) -> str:
         """
         Enhance user query with conversational context for better retrieval
         """
@@ -261,24 +264,7 @@ Follow-up questions:
             for msg in recent_context
         ])
         
-        enhancement_prompt = ChatPromptTemplate.from_template("""
-Enhance this user query by adding relevant context from the conversation history.
-
-CONVERSATION HISTORY:
-{context}
-
-CURRENT QUERY: {query}
-
-Create an enhanced query that:
-1. Maintains the original intent
-2. Adds relevant context for better document retrieval
-3. Clarifies any ambiguous references
-4. Stays concise and focused
-
-Enhanced query:
-""")
-        
-        chain = enhancement_prompt | self.llm
+        chain = self.prompts.chain("QUERY_CONTEXT_PROMPT", self.stage_llm("query_rewrite"))
         
         try:
             response = chain.invoke({
@@ -292,6 +278,8 @@ Enhanced query:
             return enhanced
             
         except Exception as e:
+            if raise_errors:
+                raise
             return original_query
     
     def _parse_faq_response(self, response: str) -> List[Dict[str, str]]:
@@ -1,18 +1,75 @@
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
+from pathlib import Path
+from typing import List, Tuple
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.config import (
+    PARENT_CHUNK_SIZE, CHILD_CHUNK_SIZE, CHILD_CHUNK_OVERLAP, SPLITTER_BACKEND,
+    CHUNK_LENGTH_UNIT, CHUNK_TOKENS, CHUNK_TOKEN_OVERLAP, CHAT_MODEL
+)
+from src.fast_splitter import FastTextSplitter
+from src.pdf_extract import iter_pdf_pages
+from src.tokens import count_tokens, count_prompt_tokens_batch, encoding_name
+
 def load_pdf_files(folder: str):
-    loader = DirectoryLoader(
-        folder, glob="*.pdf",
-        loader_cls=PyPDFLoader, show_progress=True
+    docs = []
+    for pdf in sorted(Path(folder).glob("*.pdf")):
+        docs.extend(iter_pdf_pages(str(pdf)))
+    return docs
+
+def _make_splitter(chunk_size: int, chunk_overlap: int):
+    splitter_cls = FastTextSplitter if SPLITTER_BACKEND == "fast" else RecursiveCharacterTextSplitter
+    return splitter_cls(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", " ", ""],
+        add_start_index=True
     )
-    return loader.load()
 
-def process_documents(documents):
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1200,
-        chunk_overlap=200,
+def _make_token_splitter(chunk_size: int, chunk_overlap: int):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", " ", ""],
+        length_function=count_tokens,
         add_start_index=True
     )
-    return splitter.split_documents(documents)
+
+def _stamp_token_counts(chunks):
+    # Counted with the chat model's tokenizer: context packing budgets these counts without recounting
+    counts = count_prompt_tokens_batch([ch.page_content for ch in chunks])
+    encoding = encoding_name(CHAT_MODEL)
+    for ch, n in zip(chunks, counts):
+        ch.metadata["token_count"] = n
+        ch.metadata["token_encoding"] = encoding
+    return chunks
+
+def process_documents(documents):
+    if CHUNK_LENGTH_UNIT == "tokens":
+        splitter = _make_token_splitter(CHUNK_TOKENS, CHUNK_TOKEN_OVERLAP)
+    else:
+        splitter = _make_splitter(chunk_size=1200, chunk_overlap=200)
+    return _stamp_token_counts(splitter.split_documents(documents))
+
+def process_documents_hierarchical(documents, first_parent_index: int = 0) -> Tuple[List, List]:
+    """Split into parent sections and small child chunks that point back to them.
+
+    Children are what gets embedded; each carries ``parent_index`` and a
+    page-relative ``start_index`` so overlapping hits can be merged later.
+    """
+    parent_splitter = _make_splitter(chunk_size=PARENT_CHUNK_SIZE, chunk_overlap=0)
+    if CHUNK_LENGTH_UNIT == "tokens":
+        child_splitter = _make_token_splitter(CHUNK_TOKENS, CHUNK_TOKEN_OVERLAP)
+    else:
+        child_splitter = _make_splitter(chunk_size=CHILD_CHUNK_SIZE, chunk_overlap=CHILD_CHUNK_OVERLAP)
+
+    parents = parent_splitter.split_documents(documents)
+    children = []
+    for i, parent in enumerate(parents, start=first_parent_index):
+        parent.metadata["parent_index"] = i
+        parent_start = parent.metadata.get("start_index", 0)
+        for child in child_splitter.split_documents([parent]):
+            child.metadata["start_index"] = parent_start + child.metadata.get("start_index", 0)
+            children.append(child)
+    _stamp_token_counts(parents)
+    return _stamp_token_counts(children), parents
@@ -0,0 +1,335 @@
+# src/index_io.py
+"""
+Offline export/import of the vector index.
+
+An export is a directory with:
+  - manifest.json   counts, dimensions, dtype and the embedding model used
+  - vectors.bin     one contiguous row-major float16/float32 block (mmap-able)
+  - metadata.parquet (or metadata.jsonl without pyarrow) with id, text and
+    metadata columns in the same row order as the vectors
+
+    python -m src.index_io export --out dumps/prod --dtype float16
+    python -m src.index_io import --path dumps/prod --target faiss --quantization sq8
+    python -m src.index_io import --path dumps/acme --target faiss --namespace acme
+
+Importing never calls the embedding API. A FAISS import goes to the
+namespace's local index directory, the one VECTOR_BACKEND=faiss serves it from.
+"""
+import argparse
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
+from src.config import (
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, NAMESPACE, VECTOR_BACKEND,
+    LOCAL_INDEX_QUANTIZATION, PQ_SUBQUANTIZERS, validate_config
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+TEXT_KEY = "text"
+
+
+@dataclass
+class IndexExport:
+    manifest: dict
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[dict]
+    vectors: np.ndarray
+
+
+class _MetadataWriter:
+    """Streams id/text/metadata rows to Parquet (row group per batch) or JSONL."""
+
+    def __init__(self, out: Path):
+        self.rows = 0
+        if pq is not None:
+            self.path = out / "metadata.parquet"
+            self._schema = pa.schema([("id", pa.string()), ("text", pa.string()), ("metadata", pa.string())])
+            self._writer = pq.ParquetWriter(str(self.path), self._schema, compression="zstd")
+        else:
+            self.path = out / "metadata.jsonl"
+            self._file = open(self.path, "w", encoding="utf-8")
+
+    def write(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        self.rows += len(ids)
+        if pq is not None:
+            self._writer.write_table(pa.table({
+                "id": ids,
+                "text": texts,
+                "metadata": [json.dumps(m) for m in metadatas]
+            }, schema=self._schema))
+            return
+        for row in zip(ids, texts, metadatas):
+            self._file.write(json.dumps({"id": row[0], "text": row[1], "metadata": row[2]}) + "\n")
+
+    def close(self) -> None:
+        if pq is not None:
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+def _iter_pinecone(namespace: str, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+    from src.pinecone_vectorstore import get_pinecone_index
+    index = get_pinecone_index()
+    for id_page in index.list(namespace=namespace, limit=batch_size):
+        if not id_page:
+            continue
+        fetched = index.fetch(ids=list(id_page), namespace=namespace).vectors
+        ids, texts, metadatas, vectors = [], [], [], []
+        for vector_id in id_page:
+            record = fetched.get(vector_id)
+            if record is None:
+                continue
+            metadata = dict(record.metadata or {})
+            ids.append(vector_id)
+            texts.append(metadata.pop(TEXT_KEY, ""))
+            metadatas.append(metadata)
+            vectors.append(record.values)
+        if ids:
+            yield ids, texts, metadatas, np.asarray(vectors, dtype=np.float32)
+
+
+def _iter_faiss(namespace: str, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+    import faiss
+    from src.pinecone_vectorstore import get_vectorstore
+    vs = get_vectorstore(namespace)
+    # A quantized index only holds approximations; its raw_vectors.bin has the originals
+    raw = getattr(vs, "raw_vectors", None) is not None
+    if not raw and not isinstance(vs.index, faiss.IndexFlat):
+        logger.warning("Namespace %r has a quantized index without raw vectors; exporting decoded (lossy) vectors",
+                       namespace)
+    total = vs.index.ntotal
+    for start in range(0, total, batch_size):
+        end = min(start + batch_size, total)
+        ids = [vs.index_to_docstore_id[i] for i in range(start, end)]
+        docs = [vs.docstore.search(doc_id) for doc_id in ids]
+        vectors = vs._exact_vectors(range(start, end)) if raw else vs.index.reconstruct_n(start, end - start)
+        yield (
+            ids,
+            [doc.page_content for doc in docs],
+            [dict(doc.metadata) for doc in docs],
+            np.asarray(vectors, dtype=np.float32)
+        )
+
+
+def export_index(
+    out_dir: str,
+    source: str = VECTOR_BACKEND,
+    namespace: str = NAMESPACE,
+    dtype: str = "float16",
+    batch_size: int = 100
+) -> dict:
+    """Stream every vector, id and metadata record from the source backend into an export directory."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    np_dtype = np.dtype(dtype)
+
+    batches = _iter_faiss(namespace, batch_size) if source == "faiss" else _iter_pinecone(namespace, batch_size)
+    writer = _MetadataWriter(out)
+    dim = None
+    with open(out / "vectors.bin", "wb") as vector_file:
+        for ids, texts, metadatas, vectors in batches:
+            dim = dim or vectors.shape[1]
+            vector_file.write(np.ascontiguousarray(vectors, dtype=np_dtype).tobytes())
+            writer.write(ids, texts, metadatas)
+    writer.close()
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "count": writer.rows,
+        "dim": dim or EMBEDDING_DIMENSIONS,
+        "dtype": np_dtype.name,
+        "embedding_model": EMBEDDING_MODEL,
+        "source_backend": source,
+        "namespace": namespace,
+        "metadata_file": writer.path.name,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    if not writer.rows:
+        logger.warning("Namespace %r of %s has no vectors; wrote an empty export", namespace, source)
+    return manifest
+
+
+def load_export(path: str, mmap: bool = True) -> IndexExport:
+    """Open an export; with ``mmap`` the vectors stay on disk until rows are touched."""
+    root = Path(path)
+    manifest = json.loads((root / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format: {manifest.get('format')}")
+
+    shape = (manifest["count"], manifest["dim"])
+    if not manifest["count"]:
+        vectors = np.empty(shape, dtype=manifest["dtype"])  # an empty file cannot be memory-mapped
+    elif mmap:
+        vectors = np.memmap(root / "vectors.bin", dtype=manifest["dtype"], mode="r", shape=shape)
+    else:
+        vectors = np.fromfile(root / "vectors.bin", dtype=manifest["dtype"]).reshape(shape)
+
+    metadata_path = root / manifest["metadata_file"]
+    if metadata_path.suffix == ".parquet":
+        if pq is None:
+            raise ImportError("pyarrow is required to read metadata.parquet")
+        table = pq.read_table(str(metadata_path))
+        ids = table.column("id").to_pylist()
+        texts = table.column("text").to_pylist()
+        metadatas = [json.loads(m) for m in table.column("metadata").to_pylist()]
+    else:
+        ids, texts, metadatas = [], [], []
+        with open(metadata_path, encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row["id"])
+                texts.append(row["text"])
+                metadatas.append(row["metadata"])
+
+    return IndexExport(manifest=manifest, ids=ids, texts=texts, metadatas=metadatas, vectors=vectors)
+
+
+def _check_importable(export: IndexExport, path: str) -> None:
+    if not export.ids:
+        raise ValueError(
+            f"{path} is an empty export (0 vectors from namespace {export.manifest.get('namespace')!r}); "
+            f"nothing to import"
+        )
+    if export.manifest["embedding_model"] != EMBEDDING_MODEL or export.manifest["dim"] != EMBEDDING_DIMENSIONS:
+        raise ValueError(
+            f"Export was built with {export.manifest['embedding_model']} ({export.manifest['dim']} dims), "
+            f"but this deployment uses {EMBEDDING_MODEL} ({EMBEDDING_DIMENSIONS} dims)"
+        )
+
+
+def import_to_pinecone(path: str, namespace: str = NAMESPACE, batch_size: int = 200) -> int:
+    """Bulk-upsert an export into Pinecone using the stored vectors."""
+    from src.pinecone_vectorstore import get_pinecone_index
+    export = load_export(path)
+    _check_importable(export, path)
+    index = get_pinecone_index()
+
+    for start in range(0, len(export.ids), batch_size):
+        end = min(start + batch_size, len(export.ids))
+        block = np.asarray(export.vectors[start:end], dtype=np.float32)
+        index.upsert(
+            vectors=[
+                {
+                    "id": export.ids[i],
+                    "values": block[i - start].tolist(),
+                    "metadata": {**export.metadatas[i], TEXT_KEY: export.texts[i]}
+                }
+                for i in range(start, end)
+            ],
+            namespace=namespace
+        )
+    return len(export.ids)
+
+
+def build_faiss_store(export: IndexExport, index: Optional[object] = None, batch_size: int = 10000):
+    """Build a LangChain FAISS store from an export; ``index`` may be a pre-trained empty faiss index."""
+    import faiss
+    from langchain.schema import Document
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from src.local_index import LocalFAISS
+    from src.pinecone_vectorstore import get_embedding
+
+    index = index if index is not None else faiss.IndexFlatL2(export.manifest["dim"])
+    for start in range(0, len(export.ids), batch_size):
+        index.add(np.asarray(export.vectors[start:start + batch_size], dtype=np.float32))
+
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(export.ids, export.texts, export.metadatas)
+    })
+    return LocalFAISS(
+        embedding_function=get_embedding(),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=dict(enumerate(export.ids))
+    )
+
+
+def import_to_faiss(
+    path: str,
+    out_dir: Optional[str] = None,
+    quantization: str = LOCAL_INDEX_QUANTIZATION,
+    pq_m: int = PQ_SUBQUANTIZERS,
+    namespace: str = NAMESPACE
+) -> int:
+    """
+    Write an export as a local FAISS index that VECTOR_BACKEND=faiss can serve,
+    by default into ``namespace``'s directory (see local_index_dir).
+    """
+    from src.local_index import train_index, write_raw_vectors, remove_raw_vectors
+    from src.pinecone_vectorstore import local_index_dir, reload_vectorstore
+    export = load_export(path)
+    _check_importable(export, path)
+    out_dir = out_dir or local_index_dir(namespace)
+    store = build_faiss_store(export, index=train_index(export.vectors, quantization, pq_m))
+    store.save_local(out_dir)
+    if quantization != "none":
+        # Full-precision copy for exact reranking of the quantized candidates
+        write_raw_vectors(out_dir, export.ids, export.vectors)
+    else:
+        remove_raw_vectors(out_dir)
+    if out_dir == local_index_dir(namespace):
+        from src.ingest import drop_deduplicator
+        reload_vectorstore(namespace)  # this process serves the imported index from now on
+        drop_deduplicator(namespace)
+    return len(export.ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import the vector index without re-embedding")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export")
+    exp.add_argument("--out", required=True)
+    exp.add_argument("--source", choices=["pinecone", "faiss"], default=VECTOR_BACKEND)
+    exp.add_argument("--namespace", default=NAMESPACE)
+    exp.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+
+    imp = sub.add_parser("import")
+    imp.add_argument("--path", required=True)
+    imp.add_argument("--target", choices=["pinecone", "faiss"], default=VECTOR_BACKEND)
+    imp.add_argument("--namespace", default=NAMESPACE)
+    imp.add_argument("--out", default=None,
+                     help="Local index directory for --target faiss (default: the namespace's directory)")
+    imp.add_argument("--quantization", choices=["none", "sq8", "pq"], default=LOCAL_INDEX_QUANTIZATION,
+                     help="Index compression for --target faiss")
+
+    args = parser.parse_args()
+    validate_config()
+    if args.command == "export":
+        manifest = export_index(args.out, args.source, args.namespace, args.dtype)
+        print(f"Exported {manifest['count']} vectors ({manifest['dtype']}, {manifest['dim']} dims) to {args.out}")
+    elif args.target == "faiss":
+        from src.pinecone_vectorstore import local_index_dir
+        out = args.out or local_index_dir(args.namespace)
+        print(f"Imported {import_to_faiss(args.path, out, args.quantization, namespace=args.namespace)} "
+              f"vectors into {out}")
+    else:
+        print(f"Imported {import_to_pinecone(args.path, args.namespace)} vectors into {args.namespace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,381 @@
 # src/ingest.py
-from datetime import datetime
+import logging
+import os
+from datetime import datetime, timezone
 from hashlib import sha1
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
 from tempfile import NamedTemporaryFile
-from typing import List
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
 
-from src.helper import process_documents
-from src.pinecone_vectorstore import get_vectorstore
+from src.admission import BATCH, priority_var
+from src.config import INGEST_SUMMARIES, SUMMARY_WORKERS, CHUNKING_MODE, DEDUP_ENABLED
+from src.dedup import ChunkDeduplicator, alt_source
+from src.filters import to_timestamp
+from src.metrics import INGEST_CHUNKS, timed
+from src.helper import process_documents, process_documents_hierarchical
+from src.parent_store import get_parent_store
+from src.pdf_extract import iter_pdf_page_batches
+from src.pinecone_vectorstore import (
+    get_vectorstore, persist_vectorstore, delete_document, update_metadata, iter_chunk_metadata,
+    iter_chunk_documents, fetch_metadata, resolve_namespace
+)
+
+logger = logging.getLogger(__name__)
+
+_summarizer = None
+_summary_pool = None
+_summary_pool_lock = Lock()
+_deduplicators: Dict[str, ChunkDeduplicator] = {}
+_deduplicators_lock = Lock()
+
+
+def _get_summarizer():
+    global _summarizer
+    if _summarizer is None:
+        from src.generative_ai import GenerativeAIEnhancer
+        _summarizer = GenerativeAIEnhancer()
+    return _summarizer
 
 
 def _hash_bytes(data: bytes) -> str:
     return sha1(data).hexdigest()[:12]
 
 
-def _upsert_chunks(chunks: List[Document], doc_id: str, filename: str) -> dict:
-    vs = get_vectorstore()
+def hash_file(path: str) -> str:
+    h = sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+def attach_summaries(chunks: List[Document], filename: str) -> str:
+    """Precompute chunk and document summaries so query time only assembles them."""
+    if not chunks:
+        return ""
+    summarizer = _get_summarizer()
+    chunk_summaries = summarizer.summarize_chunks(chunks)
+    doc_summary = summarizer.summarize_document(chunk_summaries, filename)
+    for ch, summary in zip(chunks, chunk_summaries):
+        if summary:
+            ch.metadata["chunk_summary"] = summary
+        if doc_summary:
+            ch.metadata["doc_summary"] = doc_summary
+    return doc_summary
+
+
+def store_summaries(chunks: List[Document], filename: str, namespace: Optional[str] = None) -> dict:
+    """
+    Summarize an indexed document's chunks and write the summaries back onto
+    the stored chunks and parent sections. ``chunks`` must be stamped (stamp_chunks).
+    """
+    with timed("ingest.summaries", chunks=len(chunks)):
+        doc_summary = attach_summaries(chunks, filename)
+    vs = get_vectorstore(namespace)
+    sections: dict = {}
+    for ch in chunks:
+        update = {k: ch.metadata[k] for k in ("chunk_summary", "doc_summary") if ch.metadata.get(k)}
+        if update:
+            update_metadata(vs, _chunk_id(ch.metadata), update)
+        if ch.metadata.get("parent_id") and ch.metadata.get("chunk_summary"):
+            sections.setdefault(ch.metadata["parent_id"], []).append(ch.metadata["chunk_summary"])
+    persist_vectorstore(vs, namespace)
+    if chunks and (doc_summary or sections):
+        get_parent_store().put_summaries(
+            chunks[0].metadata["doc_id"], doc_summary,
+            {parent_id: " ".join(parts) for parent_id, parts in sections.items()}, namespace
+        )
+    return {"doc_id": chunks[0].metadata["doc_id"] if chunks else None, "doc_summary": doc_summary}
+
+
+def _summary_job(chunks: List[Document], filename: str, namespace: Optional[str]) -> dict:
+    priority_var.set(BATCH)  # never ahead of chat traffic for the model
     try:
-        vs.delete(filter={"doc_id": doc_id})
+        return store_summaries(chunks, filename, namespace)
     except Exception as e:
-        if "namespace not found" not in str(e).lower():
-            pass 
+        logger.warning("Summaries for %s failed: %s", filename, e)
+        raise
+
+
+def _get_summary_pool() -> ThreadPoolExecutor:
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is None:
+            _summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summaries")
+        return _summary_pool
+
+
+def queue_summaries(chunks: List[Document], filename: str, namespace: Optional[str] = None) -> Future:
+    """Run store_summaries for an indexed document in the background, at batch priority."""
+    return _get_summary_pool().submit(copy_context().run, _summary_job, list(chunks), filename, namespace)
+
+
+def shutdown_summaries(wait: bool = True) -> None:
+    """Stop the summary workers; with ``wait`` the queued documents are summarized first."""
+    global _summary_pool
+    with _summary_pool_lock:
+        pool, _summary_pool = _summary_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+def _chunk_id(metadata: dict) -> str:
+    return f"{metadata['doc_id']}:{metadata.get('page', 0)}:{metadata['chunk_index']}"
+
+
+def split_pdf(path: str, filename: str) -> Tuple[List[Document], Optional[List[Document]]]:
+    """Extract and split a PDF; returns (chunks, parents) where parents is None in flat mode."""
+    chunks: List[Document] = []
+    parents: Optional[List[Document]] = [] if CHUNKING_MODE == "hierarchical" else None
+    # Pages arrive in order while later page ranges are still being extracted
+    for pages in iter_pdf_page_batches(path, source=filename):
+        if parents is not None:
+            batch_chunks, batch_parents = process_documents_hierarchical(
+                pages, first_parent_index=len(parents)
+            )
+            parents.extend(batch_parents)
+        else:
+            batch_chunks = process_documents(pages)
+        chunks.extend(batch_chunks)
+    return chunks, parents
+
+
+def get_deduplicator(namespace: Optional[str] = None) -> ChunkDeduplicator:
+    """
+    The namespace's deduplicator, shared by every ingest in this process. It is
+    seeded once from the chunks already indexed, so new files are deduplicated
+    against the whole corpus and not only against files ingested alongside them.
+    """
+    namespace = resolve_namespace(namespace)
+    with _deduplicators_lock:
+        dedup = _deduplicators.get(namespace)
+        if dedup is None:
+            dedup = ChunkDeduplicator()
+            with timed("ingest.dedup_seed", namespace=namespace):
+                dedup.seed(doc for _, doc in iter_chunk_documents(get_vectorstore(namespace)))
+            _deduplicators[namespace] = dedup
+        return dedup
+
+
+def drop_deduplicator(namespace: Optional[str] = None) -> None:
+    """Forget a namespace's deduplicator (its index was replaced or unloaded); the next ingest seeds a new one."""
+    with _deduplicators_lock:
+        _deduplicators.pop(resolve_namespace(namespace), None)
 
+
+def deduplicate(
+    chunks: List[Document],
+    deduplicator: Optional[ChunkDeduplicator] = None,
+    matches: Optional[list] = None
+) -> Tuple[List[Document], dict]:
+    """Run the dedup stage and report this document's share of duplicates."""
+    if not DEDUP_ENABLED:
+        return chunks, {}
+    dedup = deduplicator or ChunkDeduplicator()
+    before = dedup.stats()
+    chunks = dedup.filter(chunks, matches)
+    after = dedup.stats()
+    chunks_in = after["chunks_in"] - before["chunks_in"]
+    removed = after["duplicates_removed"] - before["duplicates_removed"]
+    return chunks, {
+        "duplicates_removed": removed,
+        "dedup_ratio": round(removed / chunks_in, 4) if chunks_in else 0.0
+    }
+
+
+def stamp_chunks(chunks: List[Document], doc_id: str, filename: str) -> List[str]:
+    """Attach document metadata to chunks and return their deterministic vector ids."""
     ids = []
+    now = datetime.now(timezone.utc)
+    ingested_at = now.replace(tzinfo=None).isoformat()
+    # Numeric copy of ingested_at so date-range filters work as $gte/$lte in Pinecone
+    ingested_ts = int(now.timestamp())
     for i, ch in enumerate(chunks):
-        page = ch.metadata.get("page", 0)
+        if "parent_index" in ch.metadata:
+            ch.metadata["parent_id"] = f"{doc_id}:p{ch.metadata.pop('parent_index')}"
         ch.metadata.update({
             "doc_id": doc_id,
             "source": filename,
-            "ingested_at": datetime.utcnow().isoformat(),
+            "ingested_at": ingested_at,
+            "ingested_ts": ingested_ts,
             "chunk_index": i,
         })
-        ids.append(f"{doc_id}:{page}:{i}")
+        ids.append(_chunk_id(ch.metadata))
+    return ids
+
 
-    vs.add_documents(chunks, ids=ids)
-    return {"doc_id": doc_id, "chunks": len(chunks)}
+def reset_document(
+    doc_id: str,
+    filename: str,
+    parents: Optional[List[Document]] = None,
+    namespace: Optional[str] = None
+) -> None:
+    """Remove a document's previous vectors and parent sections, then store the new parents."""
+    vs = get_vectorstore(namespace)
+    try:
+        delete_document(vs, doc_id)
+    except Exception as e:
+        if "namespace not found" not in str(e).lower():
+            pass
 
+    parent_store = get_parent_store()
+    parent_store.delete_doc(doc_id, namespace)
+    if parents:
+        for p in parents:
+            p.metadata.update({"doc_id": doc_id, "source": filename})
+        parent_store.put_parents(doc_id, parents, namespace)
+
+
+def upsert_batch(chunks: List[Document], ids: List[str], namespace: Optional[str] = None) -> int:
+    vs = get_vectorstore(namespace)
+    with timed("ingest.upsert", chunks=len(chunks)):
+        vs.add_documents(chunks, ids=ids)
+    with timed("ingest.persist"):
+        persist_vectorstore(vs, namespace)
+    INGEST_CHUNKS.inc(len(chunks), namespace=namespace or "default")
+    return len(chunks)
+
+
+def merge_alt_sources(alt_sources: Dict[str, List[str]], namespace: Optional[str] = None) -> Tuple[int, List[str]]:
+    """
+    Add alt_sources to stored canonical chunks by vector id, keeping the ones
+    they already have, so repeating a merge changes nothing. Returns the number
+    of chunks updated and the ids that are not stored (yet).
+    """
+    if not alt_sources:
+        return 0, []
+    vs = get_vectorstore(namespace)
+    stored = fetch_metadata(vs, list(alt_sources))
+    updated = 0
+    for vector_id, alts in alt_sources.items():
+        if vector_id not in stored:
+            continue
+        current = list(stored[vector_id].get("alt_sources") or [])
+        merged = current + [alt for alt in alts if alt not in current]
+        if merged == current:
+            continue
+        try:
+            update_metadata(vs, vector_id, {"alt_sources": merged})
+            updated += 1
+        except Exception as e:
+            logger.warning("Could not update alt_sources for %s: %s", vector_id, e)
+    if updated:
+        persist_vectorstore(vs, namespace)
+    return updated, [vector_id for vector_id in alt_sources if vector_id not in stored]
 
-def ingest_pdf_bytes(file_bytes: bytes, filename: str) -> dict:
-    """Ingest a single PDF given as bytes."""
+
+def alt_source_updates(matches: list) -> Dict[str, List[str]]:
+    """alt_sources that the duplicates in ``matches`` add, by canonical vector id (canonicals must be stamped)."""
+    updates: Dict[str, List[str]] = {}
+    for duplicate, canonical in matches:
+        alt = alt_source(duplicate)
+        if alt != alt_source(canonical):
+            alts = updates.setdefault(_chunk_id(canonical.metadata), [])
+            if alt not in alts:
+                alts.append(alt)
+    return updates
+
+
+def sync_alt_sources(dedup: ChunkDeduplicator, namespace: Optional[str] = None) -> int:
+    """Push alt_sources found in later files onto canonical chunks that were already upserted."""
+    if not dedup.late_updates:
+        return 0
+    alt_sources = {_chunk_id(c.metadata): c.metadata["alt_sources"] for c in dedup.late_updates.values()}
+    dedup.late_updates.clear()
+    return merge_alt_sources(alt_sources, namespace)[0]
+
+
+def _upsert_chunks(
+    chunks: List[Document],
+    doc_id: str,
+    filename: str,
+    parents: Optional[List[Document]] = None,
+    namespace: Optional[str] = None
+) -> dict:
+    with timed("ingest.reset"):
+        reset_document(doc_id, filename, parents, namespace)
+    ids = stamp_chunks(chunks, doc_id, filename)
+    upsert_batch(chunks, ids, namespace)
+    return {"doc_id": doc_id, "chunks": len(chunks), "parents": len(parents or [])}
+
+
+def ingest_pdf_bytes(
+    file_bytes: bytes,
+    filename: str,
+    deduplicator: Optional[ChunkDeduplicator] = None,
+    namespace: Optional[str] = None
+) -> dict:
+    """
+    Ingest a single PDF given as bytes into a namespace (default: PINECONE_NAMESPACE).
+    Chunks are deduplicated against the namespace's shared deduplicator unless
+    another ``deduplicator`` is given; files using the same one are stored one
+    at a time, since its undo log covers a single file.
+    """
     with NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
         tmp.write(file_bytes)
         tmp_path = tmp.name
 
-    loader = PyPDFLoader(tmp_path)
-    raw_docs = loader.load()
-    for d in raw_docs:
-        d.metadata.update({"source": filename})
+    try:
+        with timed("ingest.extract_split", filename=filename):
+            chunks, parents = split_pdf(tmp_path, filename)
+    finally:
+        os.unlink(tmp_path)
 
-    chunks = process_documents(raw_docs)
     doc_id = _hash_bytes(file_bytes)
-    return _upsert_chunks(chunks, doc_id, filename)
+    dedup = (deduplicator or get_deduplicator(namespace)) if DEDUP_ENABLED else None
+    with dedup.lock if dedup is not None else nullcontext():
+        with timed("ingest.dedup"):
+            if dedup is not None:
+                # A re-uploaded document replaces its stored chunks; they must not count as its duplicates
+                dedup.forget_doc(doc_id)
+            chunks, dedup_stats = deduplicate(chunks, dedup)
+        try:
+            result = _upsert_chunks(chunks, doc_id, filename, parents, namespace)
+        except Exception:
+            # Chunks that were never stored must not suppress their duplicates in later files
+            if dedup is not None:
+                dedup.rollback()
+            raise
+        if dedup is not None:
+            dedup.commit()
+            result["alt_sources_updated"] = sync_alt_sources(dedup, namespace)
+    if INGEST_SUMMARIES and chunks:
+        queue_summaries(chunks, filename, namespace)
+        result["summaries"] = "queued"
+    return {**result, **dedup_stats}
 
 
-def ingest_folder(folder: str = "Docs/") -> dict:
+def backfill_ingested_ts(namespace: Optional[str] = None) -> dict:
+    """
+    Stamp ``ingested_ts`` onto chunks indexed before it existed, from their
+    ``ingested_at`` string, so date filters stop excluding them. Chunks with
+    neither field cannot be dated and stay excluded until re-ingested.
+    """
+    vs = get_vectorstore(namespace)
+    stats = {"chunks": 0, "updated": 0, "undated": 0}
+    for vector_id, metadata in iter_chunk_metadata(vs):
+        stats["chunks"] += 1
+        if metadata.get("ingested_ts") is not None:
+            continue
+        if not metadata.get("ingested_at"):
+            stats["undated"] += 1
+            continue
+        update_metadata(vs, vector_id, {"ingested_ts": to_timestamp(metadata["ingested_at"])})
+        stats["updated"] += 1
+    if stats["updated"]:
+        persist_vectorstore(vs, namespace)
+    if stats["undated"]:
+        logger.warning("%d chunks have no ingestion date; re-ingest their documents to make them date-filterable",
+                       stats["undated"])
+    return stats
+
+
+def ingest_folder(folder: str = "Docs/", namespace: Optional[str] = None) -> dict:
     """Re-index all PDFs in a folder."""
     from pathlib import Path
     p = Path(folder)
@@ -63,13 +384,28 @@ def ingest_folder(folder: str = "Docs/") -> dict:
 
     total = 0
     indexed = 0
-    for pdf in p.glob("*.pdf"):
+    dedup = get_deduplicator(namespace) if DEDUP_ENABLED else None
+    before = dedup.stats() if dedup is not None else {}
+    alt_sources_updated = 0
+    for pdf in sorted(p.glob("*.pdf")):
         total += 1
         data = pdf.read_bytes()
         try:
-            ingest_pdf_bytes(data, pdf.name)
+            result = ingest_pdf_bytes(data, pdf.name, deduplicator=dedup, namespace=namespace)
+            alt_sources_updated += result.get("alt_sources_updated", 0)
             indexed += 1
         except Exception as e:
-            print(f"[ingest_folder] Failed on {pdf.name}: {e}")
+            logger.warning("Ingest failed on %s: %s", pdf.name, e)
 
-    return {"files": total, "indexed": indexed}
+    result = {"files": total, "indexed": indexed}
+    if dedup is not None:
+        after = dedup.stats()
+        chunks_in = after["chunks_in"] - before["chunks_in"]
+        removed = after["duplicates_removed"] - before["duplicates_removed"]
+        result.update({
+            "chunks_in": chunks_in,
+            "duplicates_removed": removed,
+            "dedup_ratio": round(removed / chunks_in, 4) if chunks_in else 0.0,
+            "alt_sources_updated": alt_sources_updated,
+        })
+    return result
@@ -1,30 +1,88 @@
-from src.config import OPENAI_API_KEY
-from src.pinecone_vectorstore import get_vectorstore
-from src.prompt import contextualize_prompt, answer_prompt
-from langchain_openai import ChatOpenAI
-from langchain.chains import create_retrieval_chain, create_history_aware_retriever
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
-
-llm = ChatOpenAI(api_key=OPENAI_API_KEY, model="gpt-4o", temperature=0)
-
-vectorstore = get_vectorstore()
-
-base_retriever = vectorstore.as_retriever(
-    search_type="mmr",
-    search_kwargs={"k": 8, "fetch_k": 24, "lambda_mult": 0.6}
-)
-
-compressor = LLMChainExtractor.from_llm(llm)
-compression_retriever = ContextualCompressionRetriever(
-    base_compressor=compressor,
-    base_retriever=base_retriever
-)
-
-history_aware_retriever = create_history_aware_retriever(
-    llm, compression_retriever, contextualize_prompt
-)
-
-qa_chain = create_stuff_documents_chain(llm, answer_prompt)
-rag_chain = create_retrieval_chain(history_aware_retriever, qa_chain)
+from threading import Lock
+
+from src.filters import SEARCH_KWARGS
+
+# Everything here is built on first use: importing this module costs no network calls.
+# The old module attributes (llm, vectorstore, rag_chain) still work via __getattr__.
+_shared = None
+_lock = Lock()
+
+
+def get_llm():
+    """Final-answer model (the "answer" stage in src.models)."""
+    from src.models import get_stage_llm
+    return get_stage_llm("answer")
+
+
+def _shared_chains():
+    """Namespace-independent parts, shared by every tenant's chain."""
+    global _shared
+    from src.models import get_stage_llm
+    with _lock:
+        if _shared is None:
+            from langchain.chains.combine_documents import create_stuff_documents_chain
+            from langchain.retrievers.document_compressors import LLMChainExtractor
+            from src.prompt import answer_prompt
+            # The "prompt" metadata labels these calls in src.prompt_cache's per-prompt stats
+            qa_chain = create_stuff_documents_chain(get_stage_llm("answer"), answer_prompt).with_config(
+                metadata={"prompt": "answer_prompt"}
+            )
+            compressor = LLMChainExtractor.from_llm(get_stage_llm("compress"))
+            _shared = (compressor, qa_chain)
+        return _shared
+
+
+def build_retriever(vectorstore):
+    """History-aware, compressed MMR retriever over one vector store (contextualize, search, compress)."""
+    from langchain.chains import create_history_aware_retriever
+    from langchain.retrievers import ContextualCompressionRetriever
+    from langchain_core.runnables import ConfigurableField
+    from src.models import get_stage_llm
+    from src.prompt import contextualize_prompt
+
+    compressor, _ = _shared_chains()
+    base_retriever = vectorstore.as_retriever(
+        search_type="mmr",
+        search_kwargs=SEARCH_KWARGS
+    ).configurable_fields(
+        # Per-request metadata filters arrive as {"configurable": {"search_kwargs": ...}}
+        search_kwargs=ConfigurableField(id="search_kwargs", name="Search kwargs")
+    )
+
+    compression_retriever = ContextualCompressionRetriever(
+        base_compressor=compressor,
+        base_retriever=base_retriever
+    )
+
+    return create_history_aware_retriever(
+        get_stage_llm("contextualize").with_config(metadata={"prompt": "contextualize_prompt"}),
+        compression_retriever, contextualize_prompt
+    )
+
+
+def build_retrieval_chain(vectorstore, retriever=None, namespace=None):
+    """History-aware, compressed MMR retrieval + answer chain over one vector store."""
+    from src.context import build_rag_chain
+    from src.metrics import chain_metrics
+
+    _, qa_chain = _shared_chains()
+    retriever = retriever or build_retriever(vectorstore)
+    # Times retrieval, compression and context packing into /metrics (LLM calls are timed by src.models)
+    return build_rag_chain(retriever, qa_chain, namespace).with_config(callbacks=[chain_metrics])
+
+
+def get_rag_chain(namespace=None):
+    """Retrieval chain for a namespace (default: PINECONE_NAMESPACE), taken from the shared tenant pool."""
+    from src.tenants import get_tenant_pool
+    return get_tenant_pool().get(namespace).rag_chain
+
+
+def __getattr__(name: str):
+    if name == "llm":
+        return get_llm()
+    if name == "vectorstore":
+        from src.tenants import get_tenant_pool
+        return get_tenant_pool().get().vectorstore
+    if name == "rag_chain":
+        return get_rag_chain()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,418 @@
+# src/local_index.py
+"""
+Compressed local FAISS index with exact reranking.
+
+    python -m src.local_index --quantization sq8
+
+rebuilds LOCAL_INDEX_DIR with the chosen quantization and writes the
+full-precision vectors to ``raw_vectors.bin`` for reranking.
+"""
+import argparse
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
+from src.config import (
+    LOCAL_INDEX_DIR, LOCAL_INDEX_QUANTIZATION, PQ_SUBQUANTIZERS, RERANK_FACTOR, RAW_VECTORS_DTYPE,
+    FILTER_BRUTE_FORCE_LIMIT
+)
+from src.filters import FILTER_FIELDS, TIMESTAMP_FIELD, to_timestamp
+
+RAW_VECTORS_FILE = "raw_vectors.bin"
+RAW_INDEX_FILE = "raw_vectors.json"
+_TRAIN_SAMPLE = 100_000
+
+
+def train_index(vectors: np.ndarray, quantization: str = "none", pq_m: int = PQ_SUBQUANTIZERS):
+    """
+    Create an empty faiss index trained on a sample of ``vectors`` (may be an np.memmap).
+
+    ``none`` keeps float32 (4 bytes/dim), ``sq8`` stores int8 scalar codes
+    (1 byte/dim), ``pq`` stores product-quantization codes (pq_m bytes/vector).
+    """
+    count, dim = vectors.shape
+    if quantization == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif quantization == "pq":
+        if dim % pq_m:
+            raise ValueError(f"Dimension {dim} is not divisible by PQ_SUBQUANTIZERS={pq_m}")
+        index = faiss.IndexPQ(dim, pq_m, 8, faiss.METRIC_L2)
+    elif quantization == "none":
+        index = faiss.IndexFlatL2(dim)
+    else:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    if not index.is_trained:
+        if count == 0:
+            raise ValueError(f"Cannot train a {quantization} index without vectors")
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, size=min(count, _TRAIN_SAMPLE), replace=False))
+        index.train(np.asarray(vectors[sample], dtype=np.float32))
+    return index
+
+
+def build_index(vectors: np.ndarray, quantization: str = "none", pq_m: int = PQ_SUBQUANTIZERS, batch_size: int = 10000):
+    """Train an index for ``quantization`` and add all ``vectors`` in batches."""
+    index = train_index(vectors, quantization, pq_m)
+    for start in range(0, vectors.shape[0], batch_size):
+        index.add(np.asarray(vectors[start:start + batch_size], dtype=np.float32))
+    return index
+
+
+def write_raw_vectors(
+    folder: str,
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    dtype: str = RAW_VECTORS_DTYPE,
+    batch_size: int = 10000
+) -> None:
+    """Store full-precision vectors next to the index for exact reranking (memory-mapped at query time)."""
+    root = Path(folder)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / (RAW_VECTORS_FILE + ".tmp")
+    with open(tmp, "wb") as f:
+        for start in range(0, len(ids), batch_size):
+            f.write(np.ascontiguousarray(vectors[start:start + batch_size], dtype=dtype).tobytes())
+    os.replace(tmp, root / RAW_VECTORS_FILE)
+    (root / RAW_INDEX_FILE).write_text(
+        json.dumps({"dtype": dtype, "dim": int(vectors.shape[1]), "ids": list(ids)}),
+        encoding="utf-8"
+    )
+
+
+def remove_raw_vectors(folder: str) -> None:
+    for name in (RAW_VECTORS_FILE, RAW_INDEX_FILE):
+        (Path(folder) / name).unlink(missing_ok=True)
+
+
+class MetadataIndex:
+    """
+    Inverted index over the filterable chunk metadata of a local store:
+    posting lists of index rows per source/doc_id value and a per-row
+    ingestion timestamp, so a filter resolves to candidate rows without
+    touching the vectors.
+    """
+
+    def __init__(self, store: FAISS):
+        postings: Dict[str, Dict[Any, List[int]]] = {field: {} for field in FILTER_FIELDS}
+        self.size = store.index.ntotal
+        self.timestamps = np.full(self.size, np.nan)
+        for row, doc_id in store.index_to_docstore_id.items():
+            doc = store.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                continue
+            metadata = doc.metadata
+            for field in FILTER_FIELDS:
+                if field in metadata:
+                    postings[field].setdefault(metadata[field], []).append(row)
+            ts = metadata.get(TIMESTAMP_FIELD)
+            if ts is None and metadata.get("ingested_at"):
+                ts = to_timestamp(metadata["ingested_at"])
+            if ts is not None:
+                self.timestamps[row] = ts
+        self.postings = {
+            field: {value: np.array(rows, dtype=np.int64) for value, rows in values.items()}
+            for field, values in postings.items()
+        }
+
+    def candidates(self, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Sorted rows matching ``filter``, or None if it uses fields/operators this index doesn't cover."""
+        rows: Optional[np.ndarray] = None
+        for field, condition in filter.items():
+            if field in self.postings:
+                if isinstance(condition, dict):
+                    if set(condition) - {"$eq", "$in"}:
+                        return None
+                    values = list(condition.get("$in", [])) + ([condition["$eq"]] if "$eq" in condition else [])
+                else:
+                    values = condition if isinstance(condition, list) else [condition]
+                lists = [self.postings[field].get(value) for value in values]
+                matched = np.unique(np.concatenate([l for l in lists if l is not None] or [np.empty(0, np.int64)]))
+            elif field == TIMESTAMP_FIELD and isinstance(condition, dict):
+                if set(condition) - {"$gte", "$lte", "$gt", "$lt"}:
+                    return None
+                mask = ~np.isnan(self.timestamps)
+                with np.errstate(invalid="ignore"):
+                    if "$gte" in condition:
+                        mask &= self.timestamps >= condition["$gte"]
+                    if "$gt" in condition:
+                        mask &= self.timestamps > condition["$gt"]
+                    if "$lte" in condition:
+                        mask &= self.timestamps <= condition["$lte"]
+                    if "$lt" in condition:
+                        mask &= self.timestamps < condition["$lt"]
+                matched = np.flatnonzero(mask)
+            else:
+                return None
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return rows
+
+
+class LocalFAISS(FAISS):
+    """
+    FAISS store that can serve a quantized index and rerank its candidates
+    exactly. With ``rerank_factor`` > 1, ``k * rerank_factor`` candidates are
+    fetched from the compressed index and re-scored against full-precision
+    vectors read from a memory-mapped file, so only the touched rows are
+    paged into RAM.
+    """
+
+    def __init__(self, *args, rerank_factor: int = RERANK_FACTOR, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rerank_factor = rerank_factor
+        self.raw_vectors: Optional[np.ndarray] = None
+        self._raw_rows: Dict[str, int] = {}
+        self._metadata_index: Optional[MetadataIndex] = None
+
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """Built on the first filtered query and dropped whenever rows are added or deleted."""
+        if self._metadata_index is None or self._metadata_index.size != self.index.ntotal:
+            self._metadata_index = MetadataIndex(self)
+        return self._metadata_index
+
+    def add_texts(self, *args, **kwargs) -> List[str]:
+        self._metadata_index = None
+        return super().add_texts(*args, **kwargs)
+
+    def add_embeddings(self, *args, **kwargs) -> List[str]:
+        self._metadata_index = None
+        return super().add_embeddings(*args, **kwargs)
+
+    def delete(self, *args, **kwargs) -> Optional[bool]:
+        self._metadata_index = None
+        return super().delete(*args, **kwargs)
+
+    @staticmethod
+    def _create_filter_func(filter):
+        # Chunks missing a filtered field (e.g. ingested before ingested_ts existed) never match
+        # instead of raising on None >= int
+        func = FAISS._create_filter_func(filter)
+
+        def safe(metadata: Dict[str, Any]) -> bool:
+            try:
+                return func(metadata)
+            except TypeError:
+                return False
+        return safe
+
+    def attach_raw_vectors(self, folder: str) -> bool:
+        root = Path(folder)
+        if not (root / RAW_INDEX_FILE).exists():
+            return False
+        info = json.loads((root / RAW_INDEX_FILE).read_text(encoding="utf-8"))
+        self._raw_rows = {doc_id: row for row, doc_id in enumerate(info["ids"])}
+        self.raw_vectors = np.memmap(
+            root / RAW_VECTORS_FILE, dtype=info["dtype"], mode="r",
+            shape=(len(info["ids"]), info["dim"])
+        )
+        if hasattr(mmap, "MADV_RANDOM") and self.raw_vectors._mmap is not None:
+            # Reranking touches scattered rows; skip readahead so only those pages become resident
+            self.raw_vectors._mmap.madvise(mmap.MADV_RANDOM)
+        return True
+
+    @property
+    def reranking(self) -> bool:
+        return self.raw_vectors is not None and self.rerank_factor > 1
+
+    def _exact_vectors(self, rows: Sequence[int]) -> np.ndarray:
+        """Full-precision vectors for index rows; rows added after the raw file was written fall back to reconstruct()."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.raw_vectors is None:
+            return self.index.reconstruct_batch(rows)
+        raw = np.array([self._raw_rows.get(self.index_to_docstore_id[int(r)], -1) for r in rows], dtype=np.int64)
+        have = raw >= 0
+        out = np.empty((len(rows), self.index.d), dtype=np.float32)
+        if have.any():
+            out[have] = self.raw_vectors[raw[have]]
+        if not have.all():
+            out[~have] = self.index.reconstruct_batch(rows[~have])
+        return out
+
+    def _ranked_rows(
+        self,
+        vector: np.ndarray,
+        rows: Sequence[int],
+        fetch: int,
+        filter_func: Optional[Callable] = None
+    ) -> List[Tuple[Document, float, np.ndarray]]:
+        """Score ``rows`` exactly against ``vector`` and return the best ``fetch`` documents."""
+        exact = self._exact_vectors(rows)
+        distances = ((exact - vector) ** 2).sum(axis=1)
+        ranked = []
+        for j in np.argsort(distances):
+            doc = self.docstore.search(self.index_to_docstore_id[int(rows[j])])
+            if not isinstance(doc, Document):
+                continue
+            if filter_func is not None and not filter_func(doc.metadata):
+                continue
+            ranked.append((doc, float(distances[j]), exact[j]))
+            if len(ranked) == fetch:
+                break
+        return ranked
+
+    def _query_vector(self, embedding: List[float]) -> np.ndarray:
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        return vector
+
+    def _prefiltered_candidates(
+        self,
+        embedding: List[float],
+        fetch: int,
+        filter: Optional[Union[Callable, Dict[str, Any]]]
+    ) -> Optional[List[Tuple[Document, float, np.ndarray]]]:
+        """
+        Brute-force search over just the rows the metadata index selects.
+        Returns None when the filter can't be resolved by the index or
+        matches too many rows, leaving it to the ANN search + post-filter.
+        """
+        if not isinstance(filter, dict):
+            return None
+        rows = self.metadata_index.candidates(filter)
+        if rows is None or len(rows) > FILTER_BRUTE_FORCE_LIMIT:
+            return None
+        if len(rows) == 0:
+            return []
+        return self._ranked_rows(self._query_vector(embedding), rows, fetch)
+
+    def _filtered_fetch_k(self, k: int, fetch_k: int, filter: Optional[Union[Callable, Dict[str, Any]]]) -> int:
+        """Widen the ANN candidate pool by the filter's selectivity so post-filtering still finds k."""
+        if not isinstance(filter, dict):
+            return fetch_k
+        rows = self.metadata_index.candidates(filter)
+        if rows is None or len(rows) == 0:
+            return fetch_k
+        return min(self.index.ntotal, max(fetch_k, int(2 * k * self.index.ntotal / len(rows))))
+
+    def _reranked_candidates(
+        self,
+        embedding: List[float],
+        fetch: int,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None,
+        search_k: Optional[int] = None
+    ) -> List[Tuple[Document, float, np.ndarray]]:
+        vector = self._query_vector(embedding)
+        _, indices = self.index.search(vector, (search_k or fetch) * self.rerank_factor)
+        rows = [int(i) for i in indices[0] if i != -1]
+        if not rows:
+            return []
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        return self._ranked_rows(vector, rows, fetch, filter_func)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        ranked = self._prefiltered_candidates(embedding, k, filter) if filter is not None else None
+        if ranked is None:
+            if filter is not None:
+                fetch_k = self._filtered_fetch_k(k, fetch_k, filter)
+            if not self.reranking:
+                return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+            ranked = self._reranked_candidates(embedding, k, filter, search_k=max(k, fetch_k) if filter else k)
+        docs = [(doc, score) for doc, score, _ in ranked]
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            docs = [(doc, score) for doc, score in docs if score <= score_threshold]
+        return docs[:k]
+
+    def max_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None
+    ) -> List[Tuple[Document, float]]:
+        ranked = self._prefiltered_candidates(embedding, fetch_k, filter) if filter is not None else None
+        if ranked is None:
+            search_k = self._filtered_fetch_k(fetch_k, fetch_k, filter) if filter is not None else fetch_k
+            if not self.reranking:
+                return super().max_marginal_relevance_search_with_score_by_vector(
+                    embedding, k=k, fetch_k=search_k, lambda_mult=lambda_mult, filter=filter
+                )
+            ranked = self._reranked_candidates(embedding, fetch_k, filter, search_k=search_k)
+        if not ranked:
+            return []
+        selected = maximal_marginal_relevance(
+            np.array([embedding], dtype=np.float32),
+            np.stack([vec for _, _, vec in ranked]),
+            k=k,
+            lambda_mult=lambda_mult
+        )
+        return [(ranked[i][0], ranked[i][1]) for i in selected]
+
+
+def quantize_local_index(
+    folder: str = LOCAL_INDEX_DIR,
+    quantization: str = LOCAL_INDEX_QUANTIZATION,
+    pq_m: int = PQ_SUBQUANTIZERS,
+    batch_size: int = 10000
+) -> dict:
+    """Rebuild a saved local index with another quantization, keeping ids and documents."""
+    from src.pinecone_vectorstore import get_embedding
+
+    store = LocalFAISS.load_local(folder, get_embedding(), allow_dangerous_deserialization=True)
+    store.attach_raw_vectors(folder)
+    total = store.index.ntotal
+    if total == 0:
+        raise ValueError(f"No vectors in {folder}")
+    ids = [store.index_to_docstore_id[i] for i in range(total)]
+
+    # Write exact vectors first (from the old raw file where available), then build from that file
+    staging = Path(folder) / "raw_vectors.staging"
+    with open(staging, "wb") as f:
+        for start in range(0, total, batch_size):
+            rows = list(range(start, min(start + batch_size, total)))
+            f.write(store._exact_vectors(rows).astype(RAW_VECTORS_DTYPE).tobytes())
+    vectors = np.memmap(staging, dtype=RAW_VECTORS_DTYPE, mode="r", shape=(total, store.index.d))
+
+    store.index = build_index(vectors, quantization, pq_m, batch_size)
+    store.save_local(folder)
+    if quantization == "none":
+        remove_raw_vectors(folder)
+    else:
+        write_raw_vectors(folder, ids, vectors, batch_size=batch_size)
+    del vectors
+    staging.unlink()
+    return {"vectors": total, "quantization": quantization, "index_bytes": index_size(store.index)}
+
+
+def index_size(index) -> int:
+    """Serialized size of a faiss index in bytes (what it occupies in RAM once loaded)."""
+    return int(faiss.serialize_index(index).size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the local FAISS index with a different quantization")
+    parser.add_argument("--folder", default=LOCAL_INDEX_DIR)
+    parser.add_argument("--quantization", choices=["none", "sq8", "pq"], default=LOCAL_INDEX_QUANTIZATION)
+    parser.add_argument("--pq-m", type=int, default=PQ_SUBQUANTIZERS, help="PQ sub-quantizers (bytes per vector)")
+    args = parser.parse_args()
+    result = quantize_local_index(args.folder, args.quantization, args.pq_m)
+    print(f"Rebuilt {result['vectors']} vectors as {result['quantization']} "
+          f"({result['index_bytes'] / 2**20:.1f} MiB index) in {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
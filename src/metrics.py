@@ -0,0 +1,354 @@
+# src/metrics.py
+import logging
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Prometheus text exposition is written here directly, so /metrics needs no extra dependency.
+
+logger = logging.getLogger("rag.trace")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        """Current value per label tuple (histograms: (bucket counts, sum))."""
+        with self._lock:
+            return {key: (list(v[0]), v[1]) if isinstance(v, tuple) else v for key, v in self._values.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "HTTP request latency", ("method", "path", "status"))
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Latency of retrieval, context packing and ingestion stages", ("stage",))
+STAGE_ERRORS = Counter(
+    "rag_stage_errors_total", "Failed retrieval/ingestion stages", ("stage",))
+STAGE_RETRIES = Counter(
+    "rag_stage_retries_total", "Pipeline stage attempts retried after a transient error", ("stage",))
+LLM_CALL_SECONDS = Histogram(
+    "rag_llm_call_seconds", "Chat model call latency", ("stage", "model", "prompt"))
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total", "Chat model tokens; kind is input, cached (part of input) or output",
+    ("stage", "model", "kind"))
+LLM_ERRORS = Counter(
+    "rag_llm_errors_total", "Failed chat model calls (before any fallback)", ("stage", "model"))
+CACHE_EVENTS = Counter(
+    "rag_cache_events_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+INGEST_CHUNKS = Counter(
+    "rag_ingest_chunks_total", "Chunks written to the vector store", ("namespace",))
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total", "Requests and outbound calls refused under load", ("priority", "reason"))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def llm_stage_stats() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Chat model calls, errors, tokens and average latency per stage and model, read from the LLM metrics."""
+    totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def entry(stage: str, model: str) -> Dict[str, Any]:
+        return totals.setdefault((stage, model), {"calls": 0, "errors": 0, "input_tokens": 0,
+                                                  "output_tokens": 0, "latency_s": 0.0})
+
+    for (stage, model, _prompt), (counts, seconds) in LLM_CALL_SECONDS.snapshot().items():
+        entry(stage, model)["calls"] += sum(counts)
+        entry(stage, model)["latency_s"] += seconds
+    for (stage, model, kind), value in LLM_TOKENS.snapshot().items():
+        if kind in ("input", "output"):
+            entry(stage, model)[f"{kind}_tokens"] += value
+    for (stage, model), value in LLM_ERRORS.snapshot().items():
+        entry(stage, model)["errors"] += value
+
+    stages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for (stage, model), t in totals.items():
+        stages.setdefault(stage, {})[model] = {
+            "calls": t["calls"],
+            "errors": t["errors"],
+            "input_tokens": t["input_tokens"],
+            "output_tokens": t["output_tokens"],
+            "avg_latency_s": round(t["latency_s"] / max(t["calls"], 1), 3),
+        }
+    return stages
+
+
+# --- request correlation -----------------------------------------------------
+
+recent_spans: deque = deque(maxlen=2000)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def bind_session(session_id: Optional[str]) -> None:
+    """Tag the spans of the current request with a chat session id."""
+    session_id_var.set(session_id)
+
+
+def record_span(stage: str, seconds: float, status: str = "ok", **attrs) -> None:
+    """Keep a span of the current request for /traces and log it on the rag.trace logger."""
+    span = {"request_id": request_id_var.get(), "session_id": session_id_var.get(),
+            "stage": stage, "seconds": round(seconds, 4), "status": status, **attrs}
+    recent_spans.append(span)
+    logger.debug("span %s", span)
+
+
+def spans_for(request_id: str) -> List[dict]:
+    return [span for span in list(recent_spans) if span["request_id"] == request_id]
+
+
+def llm_usage(request_id: str) -> Dict[str, int]:
+    """Chat model calls and tokens among the recorded spans of one request id."""
+    usage = {"llm_calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+    for span in spans_for(request_id):
+        if span["stage"].startswith("llm:"):
+            usage["llm_calls"] += 1
+            for kind in ("input_tokens", "cached_tokens", "output_tokens"):
+                usage[kind] += span.get(kind, 0)
+    return usage
+
+
+@contextmanager
+def timed(stage: str, **attrs):
+    """Time a block into rag_stage_seconds and the current request's trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        seconds = time.perf_counter() - start
+        STAGE_ERRORS.inc(stage=stage)
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        record_span(stage, seconds, "error", **attrs)
+        raise
+    seconds = time.perf_counter() - start
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    record_span(stage, seconds, **attrs)
+
+
+# --- LangChain callbacks -----------------------------------------------------
+
+# Named runs of the retrieval chain (see src.context.build_rag_chain) timed as stages
+TRACED_CHAINS = {"retrieval_chain", "retrieve_documents", "pack_context"}
+
+
+def call_usage(response) -> Dict[str, int]:
+    """Input/cached/output tokens of one LLM call, from usage_metadata or the raw OpenAI usage."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                details = usage.get("input_token_details") or {}
+                return {
+                    "input_tokens": usage.get("input_tokens", 0),
+                    "cached_tokens": details.get("cache_read", 0) or 0,
+                    "output_tokens": usage.get("output_tokens", 0),
+                }
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return {
+        "input_tokens": token_usage.get("prompt_tokens", 0),
+        "cached_tokens": details.get("cached_tokens", 0) or 0,
+        "output_tokens": token_usage.get("completion_tokens", 0),
+    }
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records chat model calls (latency, tokens, errors per stage/model/prompt) and
+    retriever/chain stages into the metrics above. Model clients carry it as a
+    constructor callback; chains pass it in their config with ``llm=False`` so
+    model calls are not counted twice. It is the only handler that times model
+    calls: the per-prompt cache view in src.prompt_cache is fed from here.
+    """
+    run_inline = True
+
+    def __init__(self, llm: bool = True, retrieval: bool = True):
+        self._llm = llm
+        self._retrieval = retrieval
+        self._runs: Dict[UUID, tuple] = {}
+        self._lock = Lock()
+
+    @property
+    def ignore_llm(self) -> bool:
+        return not self._llm
+
+    @property
+    def ignore_chat_model(self) -> bool:
+        return not self._llm
+
+    @property
+    def ignore_retriever(self) -> bool:
+        return not self._retrieval
+
+    @property
+    def ignore_chain(self) -> bool:
+        return not self._retrieval
+
+    def _start(self, run_id: UUID, *info) -> None:
+        with self._lock:
+            self._runs[run_id] = (*info, time.perf_counter())
+
+    def _finish(self, run_id: UUID):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        return run[:-1], time.perf_counter() - run[-1]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        self._start(run_id, metadata.get("stage", "other"), metadata.get("ls_model_name", "unknown"),
+                    metadata.get("prompt", "other"))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        (stage, model, prompt), seconds = finished
+        from src.prompt_cache import get_prompt_cache_tracker
+        usage = call_usage(response)
+        LLM_CALL_SECONDS.observe(seconds, stage=stage, model=model, prompt=prompt)
+        LLM_TOKENS.inc(usage["input_tokens"], stage=stage, model=model, kind="input")
+        LLM_TOKENS.inc(usage["cached_tokens"], stage=stage, model=model, kind="cached")
+        LLM_TOKENS.inc(usage["output_tokens"], stage=stage, model=model, kind="output")
+        CACHE_EVENTS.inc(cache="prompt_prefix", result="hit" if usage["cached_tokens"] else "miss")
+        record_span(f"llm:{stage}", seconds, model=model, prompt=prompt,
+                    input_tokens=usage["input_tokens"], cached_tokens=usage["cached_tokens"],
+                    output_tokens=usage["output_tokens"])
+        get_prompt_cache_tracker().record(prompt, stage, model, seconds, usage)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        (stage, model, prompt), seconds = finished
+        LLM_ERRORS.inc(stage=stage, model=model)
+        record_span(f"llm:{stage}", seconds, "error", model=model, prompt=prompt, error=type(error).__name__)
+
+    def on_retriever_start(self, serialized, query, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "retriever"
+        self._start(run_id, f"retriever:{name}")
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_stage(run_id, documents=len(documents))
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_stage(run_id, error=error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name")
+        if name in TRACED_CHAINS:
+            self._start(run_id, name)
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_stage(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_stage(run_id, error=error)
+
+    def _end_stage(self, run_id: UUID, error: Optional[BaseException] = None, **attrs) -> None:
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        (stage,), seconds = finished
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if error is not None:
+            STAGE_ERRORS.inc(stage=stage)
+            record_span(stage, seconds, "error", error=type(error).__name__)
+        else:
+            record_span(stage, seconds, **attrs)
+
+
+llm_metrics = MetricsCallbackHandler(llm=True, retrieval=False)
+chain_metrics = MetricsCallbackHandler(llm=False, retrieval=True)
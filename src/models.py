@@ -0,0 +1,103 @@
+# src/models.py
+from threading import Lock
+from typing import Dict
+
+from src import config
+from src.config import (
+    CHAT_MODEL, AUX_CHAT_MODEL, MODEL_ROUTES, FALLBACK_CHAT_MODEL,
+    STAGE_TIMEOUT_SECONDS, STAGE_MAX_RETRIES, LOCAL_LLM_BASE_URL,
+    STUB_MODELS, FAKE_LLM_LATENCY_MS, FAKE_LLM_OUTPUT_TOKENS
+)
+
+# Pipeline stages and their sampling temperature. Only the stages that write the
+# answer the user reads default to CHAT_MODEL; the rest default to AUX_CHAT_MODEL.
+STAGES = {
+    "contextualize": 0.0,   # history-aware query reformulation (retrieval chain)
+    "compress": 0.0,        # LLMChainExtractor over retrieved chunks
+    "answer": 0.0,          # stuff-documents QA answer
+    "query_rewrite": 0.3,   # GenerativeAIEnhancer.enhance_query_with_context
+    "summary": 0.3,         # query-time document summaries and summary fusion
+    "ingest_summary": 0.3,  # chunk/document summaries at ingestion
+    "response": 0.3,        # final enhanced response
+    "followups": 0.7,
+    "faq": 0.7,
+    "variations": 0.7,
+}
+FINAL_STAGES = ("answer", "response")
+
+_models: Dict[str, object] = {}
+_lock = Lock()
+
+
+def stage_model(stage: str) -> str:
+    """Model name routed to ``stage``."""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown pipeline stage: {stage}")
+    if STUB_MODELS:
+        return "fake"
+    default = CHAT_MODEL if stage in FINAL_STAGES else AUX_CHAT_MODEL
+    return MODEL_ROUTES.get(stage, default)
+
+
+def _chat_model(model: str, temperature: float, timeout=None, max_retries=None):
+    """
+    ChatOpenAI client for ``model``; "local:<name>" targets the OpenAI-compatible
+    server at LOCAL_LLM_BASE_URL (Ollama, vLLM, llama.cpp, ...) and "fake" or
+    "fake:<latency_ms>" is the offline src.fakes.FakeChatModel.
+    """
+    from src.admission import admission_callback
+    from src.metrics import llm_metrics
+
+    # admission_callback first: it blocks until the scheduler grants a slot, and
+    # rejects the call before llm_metrics has seen it start
+    callbacks = [admission_callback, llm_metrics]
+    if model == "fake" or model.startswith("fake:"):
+        from src.fakes import FakeChatModel
+        latency = float(model.split(":", 1)[1]) if ":" in model else FAKE_LLM_LATENCY_MS
+        return FakeChatModel(latency_ms=latency, output_tokens=FAKE_LLM_OUTPUT_TOKENS, callbacks=callbacks)
+
+    from langchain_openai import ChatOpenAI
+    # Credentials are read per client, so a .env loaded at startup (src.config.load_env) still applies
+    kwargs = {"api_key": config.OPENAI_API_KEY, "callbacks": callbacks}
+    if model.startswith("local:"):
+        model = model[len("local:"):]
+        kwargs.update(base_url=LOCAL_LLM_BASE_URL, api_key=config.OPENAI_API_KEY or "local")
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    # The SDK's own retries (2 by default) would run inside every src.retry.StageRunner
+    # attempt, so they are capped at STAGE_MAX_RETRIES for every client
+    kwargs["max_retries"] = STAGE_MAX_RETRIES if max_retries is None else max_retries
+    return ChatOpenAI(model=model, temperature=temperature, **kwargs)
+
+
+def get_stage_llm(stage: str):
+    """
+    Chat model for one pipeline stage, built once. When the routed model differs
+    from FALLBACK_CHAT_MODEL it gets a STAGE_TIMEOUT_SECONDS timeout and falls back
+    to FALLBACK_CHAT_MODEL on provider errors and timeouts; src.admission.Overloaded
+    is not retried on the fallback, since it would only queue again. Calls carry {"stage": stage} metadata, which
+    src.metrics records as per-stage latency and token stats.
+    """
+    with _lock:
+        if stage not in _models:
+            model = stage_model(stage)
+            temperature = STAGES[stage]
+            if model == FALLBACK_CHAT_MODEL or STUB_MODELS:
+                llm = _chat_model(model, temperature)
+            else:
+                from openai import APIError
+                llm = _chat_model(model, temperature, STAGE_TIMEOUT_SECONDS, STAGE_MAX_RETRIES).with_fallbacks(
+                    [_chat_model(FALLBACK_CHAT_MODEL, temperature)],
+                    exceptions_to_handle=(APIError, TimeoutError, ConnectionError),
+                )
+            _models[stage] = llm.with_config(metadata={"stage": stage})
+        return _models[stage]
+
+
+def routes() -> Dict[str, dict]:
+    """Configured model per stage, for the stats endpoint."""
+    return {
+        stage: {"model": stage_model(stage), "temperature": STAGES[stage],
+                "fallback": None if stage_model(stage) == FALLBACK_CHAT_MODEL or STUB_MODELS else FALLBACK_CHAT_MODEL}
+        for stage in STAGES
+    }
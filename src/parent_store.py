@@ -0,0 +1,125 @@
+# src/parent_store.py
+import json
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from src.config import PARENT_STORE_DIR, NAMESPACE
+from src.pinecone_vectorstore import resolve_namespace
+
+
+class ParentStore:
+    """File-backed store of parent sections, one JSON file per namespace and doc_id.
+
+    Only child chunks are embedded; parents are looked up here when a
+    retrieval result needs to be expanded to its surrounding section.
+    Like local indexes, the default namespace uses the root directory and
+    other tenants ``tenants/<namespace>``, so tenants ingesting the same
+    file never share (or delete) each other's parents.
+    """
+
+    def __init__(self, root: str = PARENT_STORE_DIR, cache_size: int = 256):
+        self.root = Path(root)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, dict]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _dir(self, namespace: str) -> Path:
+        return self.root if namespace == NAMESPACE else self.root / "tenants" / namespace
+
+    def _path(self, doc_id: str, namespace: str) -> Path:
+        return self._dir(namespace) / f"{doc_id}.json"
+
+    def _load(self, doc_id: str, namespace: str) -> Dict[str, dict]:
+        key = (namespace, doc_id)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        path = self._path(doc_id, namespace)
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+        with self._lock:
+            self._cache[key] = data
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return data
+
+    def put_parents(self, doc_id: str, parents: List[Document], namespace: Optional[str] = None) -> List[str]:
+        """Persist parent sections for a document and return their ids."""
+        namespace = resolve_namespace(namespace)
+        data = {}
+        ids = []
+        for parent in parents:
+            parent_id = f"{doc_id}:p{parent.metadata.get('parent_index', len(ids))}"
+            data[parent_id] = {"text": parent.page_content, "metadata": parent.metadata}
+            ids.append(parent_id)
+
+        self._dir(namespace).mkdir(parents=True, exist_ok=True)
+        self._path(doc_id, namespace).write_text(json.dumps(data), encoding="utf-8")
+        with self._lock:
+            self._cache[(namespace, doc_id)] = data
+        return ids
+
+    def put_summaries(
+        self,
+        doc_id: str,
+        doc_summary: str,
+        section_summaries: Dict[str, str],
+        namespace: Optional[str] = None
+    ) -> int:
+        """
+        Store summaries on a document's parent sections, so sections expanded at
+        query time carry them like child chunks do. Returns the sections updated;
+        a document deleted (or re-ingested) in the meantime is left alone.
+        """
+        namespace = resolve_namespace(namespace)
+        path = self._path(doc_id, namespace)
+        if not path.exists():
+            return 0
+        data = json.loads(path.read_text(encoding="utf-8"))
+        for parent_id, record in data.items():
+            if doc_summary:
+                record["metadata"]["doc_summary"] = doc_summary
+            if section_summaries.get(parent_id):
+                record["metadata"]["chunk_summary"] = section_summaries[parent_id]
+        path.write_text(json.dumps(data), encoding="utf-8")
+        with self._lock:
+            self._cache[(namespace, doc_id)] = data
+        return len(data)
+
+    def get_parents(self, parent_ids: Iterable[str], namespace: Optional[str] = None) -> Dict[str, Document]:
+        """Fetch parent sections by id; unknown ids are skipped."""
+        namespace = resolve_namespace(namespace)
+        found = {}
+        for parent_id in parent_ids:
+            doc_id = parent_id.rsplit(":p", 1)[0]
+            record = self._load(doc_id, namespace).get(parent_id)
+            if record:
+                found[parent_id] = Document(
+                    page_content=record["text"],
+                    metadata={**record["metadata"], "parent_id": parent_id}
+                )
+        return found
+
+    def delete_doc(self, doc_id: str, namespace: Optional[str] = None) -> None:
+        namespace = resolve_namespace(namespace)
+        with self._lock:
+            self._cache.pop((namespace, doc_id), None)
+        path = self._path(doc_id, namespace)
+        if path.exists():
+            path.unlink()
+
+
+_parent_store = None
+
+
+def get_parent_store() -> ParentStore:
+    global _parent_store
+    if _parent_store is None:
+        _parent_store = ParentStore()
+    return _parent_store
@@ -0,0 +1,119 @@
+# src/pdf_extract.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from src.config import PDF_BACKEND, PDF_WORKERS, PDF_PAGES_PER_TASK
+
+try:
+    import fitz  # PyMuPDF, optional and considerably faster than pypdf
+except ImportError:
+    fitz = None
+
+_pool = None
+_pool_lock = Lock()
+
+
+def resolve_backend(backend: str = PDF_BACKEND) -> str:
+    """Pick the extraction backend: "pymupdf" when requested/available, else "pypdf"."""
+    if backend in ("auto", "pymupdf") and fitz is not None:
+        return "pymupdf"
+    return "pypdf"
+
+
+def _page_count(path: str, backend: str) -> int:
+    if backend == "pymupdf":
+        with fitz.open(path) as pdf:
+            return pdf.page_count
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_range(path: str, backend: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract text for pages [start, end). Runs inside pool workers."""
+    if backend == "pymupdf":
+        with fitz.open(path) as pdf:
+            return [(i, pdf[i].get_text()) for i in range(start, end)]
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the parent has threads (server, upsert workers) whose locks a fork would copy
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool(wait: bool = True) -> None:
+    """Stop the shared extraction workers; the next parallel extraction starts a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+@contextmanager
+def extraction_pool(workers: int = PDF_WORKERS) -> Iterator[ProcessPoolExecutor]:
+    """The shared extraction pool for the duration of a block, shut down when it exits."""
+    try:
+        yield _get_pool(workers)
+    finally:
+        shutdown_pool()
+
+
+def iter_pdf_page_batches(
+    path: str,
+    source: Optional[str] = None,
+    backend: str = PDF_BACKEND,
+    workers: int = PDF_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK
+) -> Iterator[List[Document]]:
+    """
+    Yield a PDF's pages in order, one batch per page range.
+
+    Ranges are extracted in parallel on a shared process pool, so callers can
+    split the first batches while later ones are still being parsed. Page
+    metadata matches PyPDFLoader (``source``, ``page``, ``total_pages``).
+    """
+    backend = resolve_backend(backend)
+    source = source or path
+    total = _page_count(path, backend)
+    ranges = [(s, min(s + pages_per_task, total)) for s in range(0, total, pages_per_task)]
+
+    def to_docs(pages: List[Tuple[int, str]]) -> List[Document]:
+        return [
+            Document(page_content=text, metadata={"source": source, "page": i, "total_pages": total})
+            for i, text in pages
+        ]
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield to_docs(_extract_range(path, backend, start, end))
+        return
+
+    pool = _get_pool(workers)
+    futures = [pool.submit(_extract_range, path, backend, start, end) for start, end in ranges]
+    try:
+        for future in futures:
+            yield to_docs(future.result())
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def iter_pdf_pages(path: str, source: Optional[str] = None, **kwargs) -> Iterator[Document]:
+    for batch in iter_pdf_page_batches(path, source, **kwargs):
+        yield from batch
+
+
+def load_pdf(path: str, source: Optional[str] = None, **kwargs) -> List[Document]:
+    return list(iter_pdf_pages(path, source, **kwargs))
@@ -1,17 +1,204 @@
-from src.config import OPENAI_API_KEY, PINECONE_INDEX, NAMESPACE
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-
-_embedding = OpenAIEmbeddings(
-    api_key=OPENAI_API_KEY,
-    model="text-embedding-3-small",
-    dimensions=1024,             
-    disallowed_special=()
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain.schema import Document
+
+from src import config
+from src.config import (
+    PINECONE_INDEX, NAMESPACE,
+    EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, VECTOR_BACKEND, LOCAL_INDEX_DIR, TENANT_NAMESPACES,
+    STUB_MODELS, FAKE_EMBEDDING_LATENCY_MS
 )
 
-def get_vectorstore():
+# Clients are created on first use so importing this module needs no network or keys;
+# credentials are read from src.config then, so a .env loaded at startup still applies
+_embedding = None
+_embedding_lock = Lock()
+_pinecone_index = None
+_pinecone_lock = Lock()
+_local_stores: Dict[str, object] = {}
+_local_lock = Lock()
+# Bumped on every index write in this process; part of the key for request coalescing
+_corpus_versions: Dict[str, int] = {}
+_NAMESPACE_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def get_embedding():
+    global _embedding
+    with _embedding_lock:
+        if _embedding is None:
+            from src.admission import ScheduledEmbeddings, scheduler
+            if STUB_MODELS:
+                from src.fakes import FakeEmbeddings
+                inner = FakeEmbeddings(EMBEDDING_DIMENSIONS, FAKE_EMBEDDING_LATENCY_MS)
+            else:
+                from langchain_openai import OpenAIEmbeddings
+                inner = OpenAIEmbeddings(
+                    api_key=config.OPENAI_API_KEY,
+                    model=EMBEDDING_MODEL,
+                    dimensions=EMBEDDING_DIMENSIONS,
+                    disallowed_special=()
+                )
+            # Embedding calls share the outbound concurrency/rate limits with chat calls
+            _embedding = ScheduledEmbeddings(inner, scheduler)
+        return _embedding
+
+
+def get_pinecone_index():
+    """Shared Pinecone index handle (one client per process)."""
+    global _pinecone_index
+    with _pinecone_lock:
+        if _pinecone_index is None:
+            from pinecone import Pinecone
+            _pinecone_index = Pinecone(api_key=config.PINECONE_API_KEY).Index(PINECONE_INDEX)
+        return _pinecone_index
+
+
+def resolve_namespace(namespace: Optional[str] = None) -> str:
+    """Validate a per-request namespace; None means the deployment default."""
+    if not namespace:
+        return NAMESPACE
+    if not _NAMESPACE_RE.match(namespace):
+        raise ValueError(f"Invalid namespace: {namespace!r}")
+    if namespace != NAMESPACE and "*" not in TENANT_NAMESPACES and namespace not in TENANT_NAMESPACES:
+        raise ValueError(f"Unknown namespace: {namespace!r} (add it to TENANT_NAMESPACES)")
+    return namespace
+
+
+def local_index_dir(namespace: Optional[str] = None) -> str:
+    """The default namespace keeps LOCAL_INDEX_DIR itself; other tenants get a subdirectory."""
+    namespace = resolve_namespace(namespace)
+    if namespace == NAMESPACE:
+        return LOCAL_INDEX_DIR
+    return str(Path(LOCAL_INDEX_DIR) / "tenants" / namespace)
+
+
+def _load_local_store(namespace: str):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from src.local_index import LocalFAISS
+
+    path = Path(local_index_dir(namespace))
+    if (path / "index.faiss").exists():
+        store = LocalFAISS.load_local(str(path), get_embedding(), allow_dangerous_deserialization=True)
+        store.attach_raw_vectors(str(path))
+        return store
+    return LocalFAISS(
+        embedding_function=get_embedding(),
+        index=faiss.IndexFlatL2(EMBEDDING_DIMENSIONS),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+
+
+def get_vectorstore(namespace: Optional[str] = None):
+    """Vector store for one namespace; all namespaces share the embedding client and Pinecone index handle."""
+    namespace = resolve_namespace(namespace)
+    if VECTOR_BACKEND == "faiss":
+        with _local_lock:
+            if namespace not in _local_stores:
+                _local_stores[namespace] = _load_local_store(namespace)
+            return _local_stores[namespace]
+    from langchain_pinecone import PineconeVectorStore
     return PineconeVectorStore(
-        index_name=PINECONE_INDEX,
-        embedding=_embedding,
-        namespace=NAMESPACE
+        index=get_pinecone_index(),
+        embedding=get_embedding(),
+        namespace=namespace
     )
+
+
+def reload_vectorstore(namespace: Optional[str] = None):
+    """Drop a cached local index (all of them without a namespace) so the next get_vectorstore() reads it from disk."""
+    with _local_lock:
+        if namespace is None:
+            _local_stores.clear()
+            for name in _corpus_versions:
+                _corpus_versions[name] += 1
+        else:
+            _local_stores.pop(resolve_namespace(namespace), None)
+            bump_corpus_version(namespace)
+
+
+def corpus_version(namespace: Optional[str] = None) -> int:
+    """Changes whenever this process writes to (or reloads) a namespace's index."""
+    return _corpus_versions.get(resolve_namespace(namespace), 0)
+
+
+def bump_corpus_version(namespace: Optional[str] = None) -> None:
+    namespace = resolve_namespace(namespace)
+    _corpus_versions[namespace] = _corpus_versions.get(namespace, 0) + 1
+
+
+def persist_vectorstore(vs, namespace: Optional[str] = None) -> None:
+    """Write the local index to disk; Pinecone writes are already durable."""
+    bump_corpus_version(namespace)
+    if VECTOR_BACKEND == "faiss":
+        with _local_lock:
+            vs.save_local(local_index_dir(namespace))
+
+
+def local_ids_for_doc(vs, doc_id: str) -> List[str]:
+    return [
+        doc_key for doc_key, doc in vs.docstore._dict.items()
+        if doc.metadata.get("doc_id") == doc_id
+    ]
+
+
+def delete_document(vs, doc_id: str) -> None:
+    if VECTOR_BACKEND == "faiss":
+        ids = local_ids_for_doc(vs, doc_id)
+        if ids:
+            vs.delete(ids)
+        return
+    vs.delete(filter={"doc_id": doc_id})
+
+
+def iter_chunk_metadata(vs, batch_size: int = 100) -> Iterator[Tuple[str, dict]]:
+    """(vector id, metadata) for every chunk in a store's namespace."""
+    if VECTOR_BACKEND == "faiss":
+        for doc_key, doc in list(vs.docstore._dict.items()):
+            yield doc_key, doc.metadata
+        return
+    for ids in vs.index.list(namespace=vs._namespace, limit=batch_size):
+        fetched = vs.index.fetch(ids=list(ids), namespace=vs._namespace)
+        for vector_id, vector in fetched.vectors.items():
+            yield vector_id, dict(vector.metadata or {})
+
+
+def iter_chunk_documents(vs, batch_size: int = 100) -> Iterator[Tuple[str, Document]]:
+    """(vector id, chunk) for every chunk in a store's namespace; Pinecone keeps the text in metadata."""
+    if VECTOR_BACKEND == "faiss":
+        yield from list(vs.docstore._dict.items())
+        return
+    for vector_id, metadata in iter_chunk_metadata(vs, batch_size):
+        text = metadata.pop(vs._text_key, "")
+        yield vector_id, Document(page_content=text, metadata=metadata)
+
+
+def fetch_metadata(vs, vector_ids: List[str], batch_size: int = 100) -> Dict[str, dict]:
+    """Stored metadata of the given chunks; ids that are not stored are left out."""
+    if VECTOR_BACKEND == "faiss":
+        found = {}
+        for vector_id in vector_ids:
+            doc = vs.docstore.search(vector_id)
+            if not isinstance(doc, str):
+                found[vector_id] = doc.metadata
+        return found
+    found = {}
+    for start in range(0, len(vector_ids), batch_size):
+        fetched = vs.index.fetch(ids=vector_ids[start:start + batch_size], namespace=vs._namespace)
+        for vector_id, vector in fetched.vectors.items():
+            found[vector_id] = dict(vector.metadata or {})
+    return found
+
+
+def update_metadata(vs, vector_id: str, metadata: dict) -> None:
+    if VECTOR_BACKEND == "faiss":
+        doc = vs.docstore.search(vector_id)
+        if not isinstance(doc, str):
+            doc.metadata.update(metadata)
+            vs._metadata_index = None  # filter postings are built from metadata
+        return
+    vs.index.update(id=vector_id, set_metadata=metadata, namespace=vs._namespace)
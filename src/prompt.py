@@ -1,8 +1,15 @@
-# src/enhanced_prompt.py
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+# src/prompt.py
+from threading import RLock
 
-contextualize_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are an expert query contextualizer for a customer support RAG system.
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# Templates are built on first access (module __getattr__ below), not at import
+_prompts = {}
+_prompts_lock = RLock()
+
+def _build_contextualize_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an expert query contextualizer for a customer support RAG system.
 
 Your task is to reformulate the user's current question by incorporating relevant context from the conversation history. This helps retrieve the most relevant documents.
 
@@ -31,12 +38,13 @@ Current Question: "It's account number 12345"
 Contextualized: "Billing error investigation for account number 12345"
 
 Given the conversation history and current question, provide a contextualized query:"""),
-    MessagesPlaceholder("chat_history"),
-    ("human", "{input}"),
-])
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
 
-answer_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are an advanced AI customer support assistant with sophisticated reasoning capabilities.
+def _build_answer_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an advanced AI customer support assistant with sophisticated reasoning capabilities.
 
 CORE MISSION: Provide exceptional customer support by delivering accurate, helpful, and contextually appropriate responses using company documentation.
 
@@ -88,244 +96,216 @@ QUALITY STANDARDS:
 - ✅ Appropriate length - thorough but not overwhelming
 
 Remember: You are representing the company, so maintain professionalism while being genuinely helpful and solution-focused."""),
-    ("human", """COMPANY DOCUMENTATION CONTEXT:
+        ("human", """COMPANY DOCUMENTATION CONTEXT:
 {context}
 
 CUSTOMER QUESTION: {input}
 
 Please provide a comprehensive response following the framework above:"""),
-])
-
-
-INTENT_PROMPTS = {
-    "complaint": ChatPromptTemplate.from_messages([
-        ("system", """You are a specialized customer service agent handling complaints with advanced conflict resolution skills.
-
-COMPLAINT HANDLING PROTOCOL:
-1. **Acknowledge & Empathize**: Recognize the customer's frustration and show understanding
-2. **Investigate**: Use provided documentation to understand the issue fully
-3. **Solve**: Provide clear resolution steps or alternatives
-4. **Prevent**: Suggest ways to avoid similar issues in the future
-5. **Follow-up**: Offer additional support channels if needed
-
-TONE: Empathetic, solution-focused, professional, and reassuring
-PRIORITY: Customer satisfaction and issue resolution"""),
-        ("human", "CONTEXT: {context}\n\nCUSTOMER COMPLAINT: {input}\n\nProvide an empathetic and solution-focused response:"),
-    ]),
-    
-    "inquiry": ChatPromptTemplate.from_messages([
-        ("system", """You are an expert information specialist focused on providing comprehensive, educational responses.
-
-INQUIRY RESPONSE STRATEGY:
-1. **Educate**: Provide thorough information from company documents
-2. **Clarify**: Explain complex concepts in accessible terms
-3. **Expand**: Offer related information that might be helpful
-4. **Guide**: Suggest logical next steps or additional resources
-
-TONE: Informative, helpful, detailed, and encouraging
-PRIORITY: Complete understanding and customer education"""),
-        ("human", "CONTEXT: {context}\n\nCUSTOMER INQUIRY: {input}\n\nProvide a comprehensive and educational response:"),
-    ]),
-    
-    "request": ChatPromptTemplate.from_messages([
-        ("system", """You are an action-oriented support agent specialized in handling customer requests efficiently.
-
-REQUEST FULFILLMENT APPROACH:
-1. **Understand**: Clarify exactly what the customer needs
-2. **Execute**: Provide step-by-step instructions using company procedures
-3. **Verify**: Ensure the customer has everything needed to succeed
-4. **Support**: Offer assistance for any complications that might arise
-
-TONE: Clear, directive, supportive, and confident
-PRIORITY: Successful task completion and customer empowerment"""),
-        ("human", "CONTEXT: {context}\n\nCUSTOMER REQUEST: {input}\n\nProvide clear, actionable instructions:"),
-    ]),
-    
-    "general": answer_prompt
-}
+    ])
 
-SUMMARIZATION_PROMPTS = {
-    "policy": ChatPromptTemplate.from_template("""
-Summarize this policy document focusing on:
-- Key rules and regulations
-- Important deadlines or timeframes  
-- Exceptions or special conditions
-- Impact on customers/employees
-
-DOCUMENT: {content}
-FOCUS AREA: {query}
-
-POLICY SUMMARY:
-"""),
-    
-    "procedure": ChatPromptTemplate.from_template("""
-Summarize this procedural document highlighting:
-- Step-by-step processes
-- Required prerequisites
-- Important warnings or notes
-- Expected outcomes
-
-DOCUMENT: {content}
-FOCUS AREA: {query}
-
-PROCEDURE SUMMARY:
-"""),
-    
-    "general": ChatPromptTemplate.from_template("""
-Create a comprehensive summary of this document that:
-- Captures the main points and key information
-- Highlights important details relevant to customer support
-- Organizes information logically
-- Maintains accuracy and completeness
-
-DOCUMENT: {content}
-USER QUESTION: {query}
-
-SUMMARY:
-""")
-}
 
-FAQ_GENERATION_PROMPT = ChatPromptTemplate.from_template("""
-You are an expert FAQ creator for customer support systems. 
-
-Generate high-quality FAQ pairs from the provided documentation that:
-
-QUALITY CRITERIA:
-✅ Address real customer pain points and common questions
-✅ Provide complete, actionable answers
-✅ Use customer-friendly language (avoid jargon)
-✅ Cover diverse aspects of the business/service
-✅ Include specific details (numbers, timeframes, procedures)
-✅ Anticipate follow-up questions within answers
-
-FAQ CATEGORIES TO CONSIDER:
-- Account Management
-- Billing & Payments  
-- Products/Services
-- Technical Support
-- Policies & Procedures
-- Getting Started
-- Troubleshooting
-
-FORMAT REQUIREMENTS:
-- Questions should be natural and conversational
-- Answers should be comprehensive but scannable
-- Use bullet points for lists and steps
-- Include relevant policy references when applicable
-
-COMPANY DOCUMENTATION:
-{documents}
+# The prompts below use a stable-prefix layout: static instructions first (a system
+# message), then the per-request parts ordered from least to most volatile -
+# tone/style, documents, history, question. Providers that cache prompt prefixes
+# (OpenAI does so automatically past 1024 tokens) can then reuse the shared prefix.
 
-Generate {num_faqs} diverse, high-quality FAQ pairs:
-""")
+def _build_chunk_summary_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """Summarize this excerpt from a company document in 2-3 sentences for a customer support knowledge base.
+Keep concrete facts such as policies, procedures, deadlines, amounts and contact details."""),
+        ("human", """SOURCE: {source}
 
-VARIATION_PROMPTS = {
-    "professional": ChatPromptTemplate.from_template("""
-Create a professional variation of this customer support response:
+EXCERPT:
+{content}
 
-ORIGINAL: {response}
+SUMMARY:"""),
+    ])
 
-PROFESSIONAL VARIATION GUIDELINES:
-- Use formal business language
-- Emphasize company policies and procedures
-- Include relevant reference numbers or documentation
-- Maintain professional distance while being helpful
+def _build_document_summary_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """Combine these section summaries of a single company document into one concise overview (at most one paragraph).
+Mention the main topics covered and any key policies or procedures."""),
+        ("human", """DOCUMENT: {source}
 
-PROFESSIONAL VARIATION:
-"""),
-    
-    "friendly": ChatPromptTemplate.from_template("""
-Create a friendly, conversational variation of this customer support response:
+SECTION SUMMARIES:
+{summaries}
 
-ORIGINAL: {response}
+DOCUMENT OVERVIEW:"""),
+    ])
 
-FRIENDLY VARIATION GUIDELINES:
-- Use warm, approachable language
-- Include empathetic phrases and acknowledgments
-- Make it feel like talking to a helpful friend
-- Maintain professionalism while being personable
+def _build_summary_fusion_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", "Using only the precomputed summaries below, write a short summary that answers the user's query."),
+        ("human", """PRECOMPUTED SUMMARIES:
+{summaries}
+
+USER QUERY: {query}
+
+SUMMARY:"""),
+    ])
+
+def _build_query_summary_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an expert document summarizer for a customer support system.
+
+Create a comprehensive yet concise summary that:
+1. Directly addresses the user's query if provided
+2. Highlights the most important information from the documents
+3. Maintains key details like procedures, policies, and specific instructions
+4. Uses clear, customer-friendly language
+5. Organizes information logically"""),
+        ("human", """DOCUMENTS TO SUMMARIZE:
+{documents}
 
-FRIENDLY VARIATION:
-"""),
-    
-    "concise": ChatPromptTemplate.from_template("""
-Create a concise, efficient variation of this customer support response:
+USER QUERY: {query}
 
-ORIGINAL: {response}
+SUMMARY:"""),
+    ])
 
-CONCISE VARIATION GUIDELINES:
-- Eliminate unnecessary words and phrases
-- Focus on essential information only
-- Use bullet points for clarity
-- Maintain all critical information while reducing length
+INTENT_GUIDANCE = {
+    "complaint": "Empathetic and solution-focused",
+    "inquiry": "Informative and helpful",
+    "request": "Action-oriented and clear",
+    "compliment": "Appreciative and encouraging",
+    "general": "Helpful, clear and friendly",
+}
 
-CONCISE VARIATION:
-""")
+RESPONSE_STYLES = {
+    "professional": "Use formal business language, reference the relevant policies or procedures, and stay helpful while keeping a professional distance.",
+    "friendly": "Use warm, approachable language with empathetic acknowledgments, like a helpful friend who is still professional.",
+    "concise": "Give only the essential information in short sentences or bullet points, with no filler.",
 }
 
-FOLLOWUP_PROMPT = ChatPromptTemplate.from_template("""
-Based on this customer support interaction, suggest intelligent follow-up questions that would be genuinely helpful.
+def _build_contextual_response_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an expert customer support assistant with advanced AI capabilities.
+
+Generate a response that:
+
+1. **DIRECTLY ADDRESSES** the user's specific question
+2. **LEVERAGES CONTEXT** from retrieved company documents
+3. **MAINTAINS CONVERSATION FLOW** considering previous exchanges
+4. **ADAPTS TONE** to the user's intent (see TONE below)
+5. **FOLLOWS THE RESPONSE STYLE** (see STYLE below)
+6. **PROVIDES ACTIONABLE INFORMATION** when possible
+7. **ACKNOWLEDGES LIMITATIONS** if information is incomplete
+8. **SUGGESTS NEXT STEPS** when appropriate
+
+RESPONSE STRUCTURE:
+- Start with direct answer to the query
+- Provide relevant details from company documents
+- Include any necessary procedures or steps
+- End with helpful follow-up suggestions if needed"""),
+        ("system", """TONE: {intent_guidance}
+STYLE: {style_instructions}"""),
+        ("human", """RETRIEVED COMPANY INFORMATION:
+{context}
 
-CUSTOMER QUESTION: {query}
-ASSISTANT RESPONSE: {response}
-CONTEXT: {context}
+CONVERSATION CONTEXT:
+{history_context}
 
-FOLLOW-UP CRITERIA:
-✅ Naturally builds on the current conversation
-✅ Addresses related topics the customer might need
-✅ Helps the customer accomplish their broader goals
-✅ Specific and actionable (not generic)
-✅ Appropriate for the customer's apparent knowledge level
+DETECTED INTENT: {intent}
+CURRENT USER QUERY: {query}
 
-AVOID:
-❌ Generic questions like "Anything else?"
-❌ Repetitive questions about the same topic
-❌ Questions that require information not available
-❌ Overly complex or technical questions
+Generate a natural, helpful response:"""),
+    ])
 
-Generate 3-5 relevant follow-up questions:
-""")
+def _build_faq_extraction_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an expert at creating customer support FAQs from company documentation.
 
-QUERY_ENHANCEMENT_PROMPT = ChatPromptTemplate.from_template("""
-Enhance this customer query to improve document retrieval while preserving the original intent.
+Generate high-quality FAQ pairs that:
+1. Address common customer questions likely to arise from this documentation
+2. Provide clear, actionable answers
+3. Cover different aspects of the company's services/products
+4. Use customer-friendly language
+5. Are specific and helpful
 
-CONVERSATION HISTORY:
-{history}
+Format each FAQ as:
+Q: [Question]
+A: [Answer]"""),
+        ("human", """COMPANY DOCUMENTATION:
+{documents}
 
-CURRENT QUERY: {query}
+Generate {num_faqs} diverse FAQs covering different topics from the documentation:"""),
+    ])
+
+def _build_response_variations_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are tasked with creating variations of a customer support response for A/B testing.
+
+The variations must:
+1. Maintain the same core information and accuracy
+2. Use different phrasing and structure
+3. Vary in tone (professional, friendly, concise)
+4. Keep the same level of helpfulness
+5. Be suitable for customer support context"""),
+        ("human", """ORIGINAL RESPONSE:
+{base_response}
+
+Generate {num_variations} different variations:"""),
+    ])
+
+def _build_followup_suggestions_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """Based on a customer support interaction, suggest relevant follow-up questions.
+
+Generate 3-5 intelligent follow-up questions that:
+1. Build naturally on the current conversation
+2. Address related topics the customer might want to know
+3. Are specific and actionable
+4. Help the customer get more value from the support system"""),
+        ("human", """CONTEXT: {context}
+
+USER QUERY: {query}
+ASSISTANT RESPONSE: {response}
+
+Follow-up questions:"""),
+    ])
 
-ENHANCEMENT GOALS:
-- Add relevant context from conversation history
-- Replace ambiguous references (it, this, that) with specific terms
-- Include synonyms or related terms that might appear in documents
-- Maintain the customer's original question intent
-- Keep the enhanced query natural and focused
+def _build_query_context_prompt():
+    return ChatPromptTemplate.from_messages([
+        ("system", """Enhance the user query by adding relevant context from the conversation history.
 
-ENHANCED QUERY:
-""")
+Create an enhanced query that:
+1. Maintains the original intent
+2. Adds relevant context for better document retrieval
+3. Clarifies any ambiguous references
+4. Stays concise and focused"""),
+        ("human", """CONVERSATION HISTORY:
+{context}
+
+CURRENT QUERY: {query}
 
-def get_prompt_by_intent(intent: str):
-    """Get the appropriate prompt template based on detected intent"""
-    return INTENT_PROMPTS.get(intent, INTENT_PROMPTS["general"])
+Enhanced query:"""),
+    ])
 
-def get_summarization_prompt(document_type: str = "general"):
-    """Get appropriate summarization prompt based on document type"""
-    return SUMMARIZATION_PROMPTS.get(document_type, SUMMARIZATION_PROMPTS["general"])
+def _get(name: str):
+    """Build a prompt once and cache it."""
+    if name not in _prompts:
+        with _prompts_lock:
+            if name not in _prompts:
+                _prompts[name] = globals()[f"_build_{name.lower()}"]()
+    return _prompts[name]
 
-def get_variation_prompt(style: str = "professional"):
-    """Get variation prompt for specific response style"""
-    return VARIATION_PROMPTS.get(style, VARIATION_PROMPTS["professional"])
+def __getattr__(name: str):
+    if name in __all__ and f"_build_{name.lower()}" in globals():
+        return _get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'contextualize_prompt',
     'answer_prompt', 
-    'INTENT_PROMPTS',
-    'SUMMARIZATION_PROMPTS',
-    'FAQ_GENERATION_PROMPT',
-    'VARIATION_PROMPTS',
-    'FOLLOWUP_PROMPT',
-    'QUERY_ENHANCEMENT_PROMPT',
-    'get_prompt_by_intent',
-    'get_summarization_prompt', 
-    'get_variation_prompt'
+    'CHUNK_SUMMARY_PROMPT',
+    'DOCUMENT_SUMMARY_PROMPT',
+    'SUMMARY_FUSION_PROMPT',
+    'QUERY_SUMMARY_PROMPT',
+    'CONTEXTUAL_RESPONSE_PROMPT',
+    'FAQ_EXTRACTION_PROMPT',
+    'RESPONSE_VARIATIONS_PROMPT',
+    'FOLLOWUP_SUGGESTIONS_PROMPT',
+    'QUERY_CONTEXT_PROMPT',
+    'INTENT_GUIDANCE',
+    'RESPONSE_STYLES'
 ]
\ No newline at end of file
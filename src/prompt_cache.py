@@ -0,0 +1,75 @@
+# src/prompt_cache.py
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any, Dict
+
+from src.metrics import llm_stage_stats
+
+# Chains label their LLM calls with {"metadata": {"prompt": <name>}}; other calls land here
+UNLABELLED = "other"
+
+
+class PromptCacheTracker:
+    """
+    Cached vs. uncached prompt tokens and latency of every chat model call, per
+    prompt, so the effect of provider-side prefix caching is measurable. Calls
+    are timed once, by src.metrics.MetricsCallbackHandler, which records them
+    here; the per-stage/model view (see src.models) is read from the same
+    handler's LLM metrics, which shows what routing a stage to a smaller model
+    or its fallback costs and saves.
+    """
+
+    def __init__(self, recent: int = 200):
+        self._lock = Lock()
+        self._totals = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0,
+                                            "output_tokens": 0, "latency_s": 0.0,
+                                            "cached_calls": 0, "cached_latency_s": 0.0})
+        self.recent = deque(maxlen=recent)
+
+    def record(self, prompt: str, stage: str, model: str, latency: float, usage: Dict[str, int]) -> None:
+        with self._lock:
+            totals = self._totals[prompt or UNLABELLED]
+            totals["calls"] += 1
+            totals["latency_s"] += latency
+            for key in ("input_tokens", "cached_tokens", "output_tokens"):
+                totals[key] += usage[key]
+            if usage["cached_tokens"]:
+                totals["cached_calls"] += 1
+                totals["cached_latency_s"] += latency
+            self.recent.append({"prompt": prompt, "stage": stage, "model": model,
+                                "latency_s": round(latency, 3), **usage})
+
+    def snapshot(self, recent: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            per_prompt = {}
+            for prompt, t in self._totals.items():
+                uncached_calls = t["calls"] - t["cached_calls"]
+                per_prompt[prompt] = {
+                    "calls": t["calls"],
+                    "input_tokens": t["input_tokens"],
+                    "cached_tokens": t["cached_tokens"],
+                    "uncached_tokens": t["input_tokens"] - t["cached_tokens"],
+                    "output_tokens": t["output_tokens"],
+                    "cache_hit_ratio": round(t["cached_tokens"] / max(t["input_tokens"], 1), 3),
+                    "avg_latency_cached_s": round(t["cached_latency_s"] / max(t["cached_calls"], 1), 3),
+                    "avg_latency_uncached_s": round(
+                        (t["latency_s"] - t["cached_latency_s"]) / max(uncached_calls, 1), 3),
+                }
+            recent_calls = list(self.recent)[-recent:]
+        input_tokens = sum(p["input_tokens"] for p in per_prompt.values())
+        cached_tokens = sum(p["cached_tokens"] for p in per_prompt.values())
+        return {
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hit_ratio": round(cached_tokens / max(input_tokens, 1), 3),
+            "prompts": per_prompt,
+            "stages": llm_stage_stats(),
+            "recent_calls": recent_calls,
+        }
+
+
+_tracker = PromptCacheTracker()
+
+
+def get_prompt_cache_tracker() -> PromptCacheTracker:
+    return _tracker
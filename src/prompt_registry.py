@@ -0,0 +1,132 @@
+# src/prompt_registry.py
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.prompts import MessagesPlaceholder
+
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
+
+from src import prompt
+from src.tokens import count_prompt_tokens
+
+# Intent and style variants exist only for CONTEXTUAL_RESPONSE_PROMPT (see src.prompt.INTENT_GUIDANCE)
+DEFAULT_INTENT = "general"
+DEFAULT_STYLE = "professional"
+
+
+class PromptRegistry:
+    """
+    Named prompt templates and ``prompt | llm`` chains, built once and reused
+    across requests instead of being re-parsed on every call.
+    """
+
+    def __init__(self, max_chains: int = 128):
+        self.max_chains = max_chains
+        self._templates: Dict[Tuple, Any] = {}
+        # (name, variant, id(llm)) -> (llm, chain); the llm is kept so its id is not reused
+        self._chains: "OrderedDict[Tuple, Tuple[Any, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def template(self, name: str):
+        """Template ``name`` from src.prompt."""
+        key = (name, None)
+        cached = self._templates.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            return self._templates.setdefault(key, getattr(prompt, name))
+
+    def response_template(self, intent: Optional[str] = None, style: Optional[str] = None):
+        """CONTEXTUAL_RESPONSE_PROMPT with the tone for ``intent`` and ``style`` filled in."""
+        intent, style = _response_variant(intent, style)
+        key = ("CONTEXTUAL_RESPONSE_PROMPT", f"{intent}:{style}")
+        cached = self._templates.get(key)
+        if cached is not None:
+            return cached
+        template = self.template("CONTEXTUAL_RESPONSE_PROMPT").partial(
+            intent_guidance=prompt.INTENT_GUIDANCE[intent],
+            style_instructions=prompt.RESPONSE_STYLES[style]
+        )
+        with self._lock:
+            return self._templates.setdefault(key, template)
+
+    def chain(self, name: str, llm):
+        """``template(name) | llm``, cached per llm instance."""
+        return self._chain((name, None, id(llm)), llm, lambda: self.template(name), label=name)
+
+    def response_chain(self, llm, intent: Optional[str] = None, style: Optional[str] = None):
+        intent, style = _response_variant(intent, style)
+        key = ("CONTEXTUAL_RESPONSE_PROMPT", f"{intent}:{style}", id(llm))
+        return self._chain(key, llm, lambda: self.response_template(intent, style),
+                           label="CONTEXTUAL_RESPONSE_PROMPT")
+
+    def _chain(self, key: Tuple, llm, template_factory, label: str):
+        with self._lock:
+            cached = self._chains.get(key)
+            if cached is not None:
+                self._chains.move_to_end(key)
+                return cached[1]
+        # The label shows up as the prompt name in src.prompt_cache's per-call token stats
+        chain = (template_factory() | llm).with_config(metadata={"prompt": label})
+        with self._lock:
+            self._chains[key] = (llm, chain)
+            while len(self._chains) > self.max_chains:
+                self._chains.popitem(last=False)
+        return chain
+
+    def token_report(self) -> Dict[str, Any]:
+        """
+        Tokens each prompt costs before any variables are filled in, so prompt
+        growth shows up as a number. The response prompt is reported per
+        intent and style.
+        """
+        report: Dict[str, Any] = {}
+        for name in prompt.__all__:
+            value = getattr(prompt, name)
+            if hasattr(value, "format_messages"):
+                report[name] = _static_tokens(value)
+        report["CONTEXTUAL_RESPONSE_PROMPT"] = {
+            f"{intent}:{style}": _static_tokens(self.response_template(intent, style))
+            for intent in prompt.INTENT_GUIDANCE for style in prompt.RESPONSE_STYLES
+        }
+        return report
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"templates": len(self._templates), "chains": len(self._chains), "max_chains": self.max_chains}
+
+
+def _response_variant(intent: Optional[str], style: Optional[str]) -> Tuple[str, str]:
+    # Unknown intents/styles fall back to the defaults rather than failing the request
+    return (intent if intent in prompt.INTENT_GUIDANCE else DEFAULT_INTENT,
+            style if style in prompt.RESPONSE_STYLES else DEFAULT_STYLE)
+
+
+def _static_tokens(template) -> int:
+    placeholders = {m.variable_name for m in template.messages if isinstance(m, MessagesPlaceholder)}
+    values = {var: [] if var in placeholders else "" for var in template.input_variables}
+    for var in placeholders:
+        values.setdefault(var, [])
+    messages = template.format_messages(**values)
+    return sum(count_prompt_tokens(str(m.content)) for m in messages)
+
+
+_registry = None
+_registry_lock = Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
+
+
+if __name__ == "__main__":
+    import json
+    print(json.dumps(get_prompt_registry().token_report(), indent=2))
@@ -0,0 +1,169 @@
+# src/retry.py
+import random
+import time
+from threading import Event, Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from src.admission import Overloaded
+from src.config import REQUEST_LATENCY_BUDGET_SECONDS, STAGE_RETRY_ATTEMPTS, RETRY_BASE_DELAY_SECONDS
+from src.metrics import STAGE_RETRIES, timed
+
+
+class LatencyBudget:
+    """
+    Wall-clock deadline for one request. Stages consult it before starting and
+    before retrying; ``cancel()`` (client disconnected) stops the remaining stages.
+    """
+
+    def __init__(self, seconds: float = REQUEST_LATENCY_BUDGET_SECONDS):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self._cancelled = Event()
+        self._lock = Lock()
+
+    @classmethod
+    def for_request(cls, requested: Optional[float] = None) -> "LatencyBudget":
+        """Client-requested timeout, capped at REQUEST_LATENCY_BUDGET_SECONDS."""
+        if requested is None or requested <= 0:
+            return cls()
+        return cls(min(requested, REQUEST_LATENCY_BUDGET_SECONDS))
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.seconds - self.elapsed()
+
+    @property
+    def deadline(self) -> float:
+        """``time.monotonic()`` value at which the budget runs out."""
+        return self.started + self.seconds
+
+    def extend_to(self, deadline: float) -> None:
+        """Move the deadline out to ``deadline``, never in; a coalesced run lasts as long as its longest waiter."""
+        with self._lock:
+            self.seconds = max(self.seconds, deadline - self.started)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+class StageFailed(Exception):
+    """A required pipeline stage failed on every attempt the budget allowed."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"{stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class DeadlineExceeded(Exception):
+    """The request's budget ran out before a required stage could start."""
+
+
+class RequestCancelled(Exception):
+    """The client went away; remaining stages were not run."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Transient provider errors: connection problems, timeouts, rate limits and 5xx."""
+    if isinstance(error, Overloaded):
+        return False  # our own load shedding; retrying would only queue again
+    try:
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code >= 500
+    except ImportError:
+        pass
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+# Moving average of successful stage durations, used to decide whether an
+# optional stage still fits in what is left of a request's budget
+_stage_seconds: Dict[str, float] = {}
+_stage_lock = Lock()
+_EWMA_ALPHA = 0.2
+
+
+def expected_seconds(stage: str) -> float:
+    return _stage_seconds.get(stage, 0.0)
+
+
+def _observe(stage: str, seconds: float) -> None:
+    with _stage_lock:
+        previous = _stage_seconds.get(stage)
+        _stage_seconds[stage] = seconds if previous is None else previous + _EWMA_ALPHA * (seconds - previous)
+
+
+class StageRunner:
+    """
+    Runs the stages of one request with retries under a shared LatencyBudget.
+    A failed attempt is retried after full-jitter exponential backoff only if
+    the error is transient and the budget still covers the backoff plus another
+    attempt as long as the failed one. Optional stages are skipped when their
+    usual duration exceeds the remaining budget, and return ``default`` (listed
+    in ``failures``) when they still fail; required ones raise StageFailed, or
+    DeadlineExceeded when the budget is already spent. Every stage raises
+    RequestCancelled once the budget is cancelled.
+    """
+
+    def __init__(self, budget: Optional[LatencyBudget] = None, attempts: int = STAGE_RETRY_ATTEMPTS,
+                 base_delay: float = RETRY_BASE_DELAY_SECONDS):
+        self.budget = budget or LatencyBudget()
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.failures: Dict[str, str] = {}
+        self.retries: Dict[str, int] = {}
+        self.stages_run: List[str] = []
+        self.stages_skipped: List[str] = []
+
+    def run(self, stage: str, func: Callable, *args, optional: bool = False, default: Any = None, **kwargs):
+        if self.budget.cancelled:
+            raise RequestCancelled(f"Client disconnected before {stage}")
+        if optional and self.budget.remaining() < expected_seconds(stage):
+            self.stages_skipped.append(stage)
+            return default
+        if not optional and self.budget.remaining() <= 0:
+            raise DeadlineExceeded(f"Request deadline passed before {stage}")
+
+        self.stages_run.append(stage)
+        for attempt in range(1, self.attempts + 1):
+            start = time.monotonic()
+            try:
+                with timed(f"enhanced.{stage}", attempt=attempt):
+                    result = func(*args, **kwargs)
+                _observe(stage, time.monotonic() - start)
+                return result
+            except Exception as e:
+                delay = random.uniform(0, self.base_delay * 2 ** (attempt - 1))
+                cost = time.monotonic() - start
+                if (attempt < self.attempts and is_retryable(e) and not self.budget.cancelled
+                        and self.budget.remaining() > delay + cost):
+                    self.retries[stage] = self.retries.get(stage, 0) + 1
+                    STAGE_RETRIES.inc(stage=stage)
+                    time.sleep(delay)
+                    continue
+                if optional:
+                    self.failures[stage] = str(e)
+                    return default
+                if isinstance(e, Overloaded):
+                    raise
+                raise StageFailed(stage, e) from e
+
+    def report(self) -> Dict[str, Any]:
+        """Metadata for the response: stages run, skipped and failed, retries and budget."""
+        return {
+            "stages_run": self.stages_run,
+            "stages_skipped": self.stages_skipped,
+            "failed_stages": self.failures,
+            "retries": self.retries,
+            "partial": bool(self.failures or self.stages_skipped),
+            "budget_seconds": self.budget.seconds,
+            "budget_remaining_seconds": round(self.budget.remaining(), 3),
+        }
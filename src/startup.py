@@ -0,0 +1,68 @@
+# src/startup.py
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from src import config
+
+logger = logging.getLogger(__name__)
+
+# Settings read when a client is built rather than at import (see src.models, src.pinecone_vectorstore)
+RUNTIME_SETTINGS = {"OPENAI_API_KEY", "PINECONE_API_KEY"}
+
+
+def load_env() -> List[str]:
+    """
+    Load ``.env`` for a server whose modules are already imported. Credentials
+    still apply; other settings it changes were copied at import, so they are
+    reported rather than silently half-applied (pass them in the environment,
+    e.g. ``uvicorn --env-file .env``).
+    """
+    changed = config.load_env()
+    late = [name for name in changed if name not in RUNTIME_SETTINGS]
+    if late:
+        logger.warning(".env sets %s after the app was imported; put them in the environment to apply them",
+                       ", ".join(late))
+    return changed
+
+
+def warm_up(namespaces: Optional[Iterable[Optional[str]]] = None) -> Dict[str, float]:
+    """
+    Build what the first request would otherwise pay for: config checks,
+    tokenizers, prompts, LLM clients, and the retrieval chain (and with it
+    the vector store) of each namespace. Returns seconds per step.
+    """
+    timings: Dict[str, float] = {}
+
+    def step(name, func):
+        start = time.perf_counter()
+        func()
+        timings[name] = round(time.perf_counter() - start, 3)
+
+    def settings():
+        load_env()
+        config.validate_config()
+    step("config", settings)
+
+    def tokenizers():
+        from src.tokens import get_encoding
+        get_encoding(config.EMBEDDING_MODEL)
+        get_encoding(config.CHAT_MODEL)
+    step("tokenizers", tokenizers)
+
+    def prompts():
+        from src import prompt
+        for name in prompt.__all__:
+            getattr(prompt, name)
+    step("prompts", prompts)
+
+    def enhanced_chain():
+        from src.enhanced_llm import get_enhanced_rag_chain
+        get_enhanced_rag_chain()
+    step("enhanced_chain", enhanced_chain)
+
+    from src.tenants import get_tenant_pool
+    pool = get_tenant_pool()
+    for namespace in namespaces or [None]:
+        step(f"retrieval_chain:{namespace or 'default'}", lambda: pool.get(namespace))
+    return timings
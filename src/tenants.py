@@ -0,0 +1,129 @@
+# src/tenants.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+from src.config import NAMESPACE, TENANT_POOL_SIZE, TENANT_IDLE_SECONDS, VECTOR_BACKEND
+from src.metrics import CACHE_EVENTS, timed
+from src.pinecone_vectorstore import get_vectorstore, reload_vectorstore, resolve_namespace
+
+
+@dataclass
+class TenantChain:
+    """
+    Per-namespace retrieval objects; LLMs, embeddings and the Pinecone client are shared.
+    ``rag_chain`` is ``retriever`` followed by context packing and the answer.
+    """
+    namespace: str
+    vectorstore: Any
+    rag_chain: Any
+    retriever: Any = None
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def build_tenant_chain(namespace: str) -> TenantChain:
+    from src.llm import build_retriever, build_retrieval_chain
+    vectorstore = get_vectorstore(namespace)
+    retriever = build_retriever(vectorstore)
+    return TenantChain(namespace=namespace, vectorstore=vectorstore,
+                       rag_chain=build_retrieval_chain(vectorstore, retriever, namespace), retriever=retriever)
+
+
+class TenantPool:
+    """
+    LRU pool of per-namespace chains. Entries are built on first use,
+    evicted beyond ``max_size`` or after ``idle_seconds`` without a request,
+    and concurrent first requests for one namespace share a single build.
+    """
+
+    def __init__(
+        self,
+        builder: Callable[[str], TenantChain] = build_tenant_chain,
+        max_size: int = TENANT_POOL_SIZE,
+        idle_seconds: int = TENANT_IDLE_SECONDS
+    ):
+        self.builder = builder
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, TenantChain]" = OrderedDict()
+        self._building: Dict[str, Lock] = {}
+        self._lock = Lock()
+        self.stats = {"hits": 0, "builds": 0, "evictions": 0}
+
+    def get(self, namespace: Optional[str] = None) -> TenantChain:
+        namespace = resolve_namespace(namespace)
+        with self._lock:
+            entry = self._touch(namespace)
+            if entry is not None:
+                CACHE_EVENTS.inc(cache="tenant_pool", result="hit")
+                return entry
+            build_lock = self._building.setdefault(namespace, Lock())
+        CACHE_EVENTS.inc(cache="tenant_pool", result="miss")
+
+        with build_lock:
+            with self._lock:
+                entry = self._touch(namespace)
+                if entry is not None:
+                    return entry
+            with timed("tenant_build", namespace=namespace):
+                entry = self.builder(namespace)
+            with self._lock:
+                self.stats["builds"] += 1
+                self._entries[namespace] = entry
+                self._building.pop(namespace, None)
+                evicted = self._evict_locked()
+        for name in evicted:
+            self._release(name)
+        return entry
+
+    def _touch(self, namespace: str) -> Optional[TenantChain]:
+        entry = self._entries.get(namespace)
+        if entry is not None:
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(namespace)
+            self.stats["hits"] += 1
+        return entry
+
+    def _evict_locked(self) -> list:
+        evicted = []
+        cutoff = time.monotonic() - self.idle_seconds
+        for name, entry in list(self._entries.items()):
+            if len(self._entries) > self.max_size or entry.last_used < cutoff:
+                del self._entries[name]
+                evicted.append(name)
+        self.stats["evictions"] += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _release(namespace: str) -> None:
+        # Local indexes are the only per-tenant state worth freeing; the default one stays loaded
+        if VECTOR_BACKEND == "faiss" and namespace != NAMESPACE:
+            from src.ingest import drop_deduplicator
+            reload_vectorstore(namespace)
+            drop_deduplicator(namespace)
+
+    def evict(self, namespace: str) -> bool:
+        with self._lock:
+            found = self._entries.pop(namespace, None) is not None
+        if found:
+            self._release(namespace)
+        return found
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"namespaces": list(self._entries), "size": len(self._entries),
+                    "max_size": self.max_size, **self.stats}
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_tenant_pool() -> TenantPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TenantPool()
+        return _pool
@@ -0,0 +1,73 @@
+# src/tokens.py
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+
+from src.config import EMBEDDING_MODEL, CHAT_MODEL, TOKENIZER_FALLBACK
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = EMBEDDING_MODEL) -> Optional["tiktoken.Encoding"]:
+    """
+    Tokenizer for a model, loaded once per process (tiktoken also caches the
+    BPE file on disk, see TIKTOKEN_CACHE_DIR). When the encoding cannot be
+    loaded, e.g. on an offline host with a cold cache, returns None so counts
+    are estimated from characters, or raises if TOKENIZER_FALLBACK is false.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        if not TOKENIZER_FALLBACK:
+            raise RuntimeError(f"Tokenizer for {model} unavailable and TOKENIZER_FALLBACK is off: {e}") from e
+        logger.warning("Tokenizer for %s unavailable, estimating from characters: %s", model, e)
+        return None
+
+
+def encoding_name(model: str = EMBEDDING_MODEL) -> str:
+    """Name of the encoding counts for ``model`` are made with ("estimate" for the character fallback)."""
+    encoding = get_encoding(model)
+    return encoding.name if encoding is not None else "estimate"
+
+
+def _estimate(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def count_tokens(text: str, model: str = EMBEDDING_MODEL) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return _estimate(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens_batch(texts: List[str], model: str = EMBEDDING_MODEL) -> List[int]:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return [_estimate(text) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
+
+
+def count_prompt_tokens(text: str) -> int:
+    """Token count as seen by the chat model that receives the stuffed context."""
+    return count_tokens(text, CHAT_MODEL)
+
+
+def count_prompt_tokens_batch(texts: List[str]) -> List[int]:
+    return count_tokens_batch(texts, CHAT_MODEL)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = CHAT_MODEL) -> str:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -1,23 +1,295 @@
-from src.config import OPENAI_API_KEY, PINECONE_INDEX, NAMESPACE
-from src.helper import load_pdf_files, process_documents
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-
-embedding = OpenAIEmbeddings(
-    api_key=OPENAI_API_KEY,
-    model="text-embedding-3-small",
-    dimensions=1024,             
-    disallowed_special=()
-)
+"""
+Resumable bulk indexer for a folder of PDFs.
+
+    python store_index.py --folder Docs/ --batch-size 200 --workers 4 [--namespace tenant-a]
+
+Chunks are embedded and upserted in batches through the same code path as
+``src/ingest.py``. Every finished batch is recorded in a checkpoint file, so
+a crashed or interrupted run picks up where it stopped on the next start
+(use ``--reset`` to start over). A file that cannot be read or prepared is
+recorded in the checkpoint with its error and skipped; it is tried again on
+the next run. Near-duplicate detection covers the chunks already indexed
+in the namespace as well as the files of this run. The alt_sources each
+document adds to canonical chunks are kept in the checkpoint and merged
+into the index at the end of every run until they are stored, so an
+interrupted run ends with the same metadata as a clean one. With
+INGEST_SUMMARIES, each document is summarized in the background once all
+its batches are stored; the run waits for those jobs, and a document whose
+summaries did not finish is summarized again on the next run.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional
 
-docs = load_pdf_files("Docs/")
-splits = process_documents(docs)
+if __name__ == "__main__":
+    # Run as a script: read .env before the src imports below copy their settings
+    from src.config import load_env
+    load_env()
 
-vectorstore = PineconeVectorStore.from_documents(
-    documents=splits,
-    embedding=embedding,
-    index_name=PINECONE_INDEX,
-    namespace=NAMESPACE
+from src.config import PINECONE_INDEX, NAMESPACE, INGEST_SUMMARIES, DEDUP_ENABLED, LOG_LEVEL, validate_config
+from src.ingest import (
+    hash_file, split_pdf, deduplicate, stamp_chunks, reset_document, upsert_batch, get_deduplicator,
+    alt_source_updates, merge_alt_sources, backfill_ingested_ts, queue_summaries
 )
+from src.pdf_extract import extraction_pool
+from src.pinecone_vectorstore import resolve_namespace
+
+logger = logging.getLogger("store_index")
+
+
+class Checkpoint:
+    """JSON checkpoint of completed batches, rewritten atomically after every batch."""
+
+    def __init__(self, path: str, namespace: str = NAMESPACE, reset: bool = False):
+        self.path = Path(path)
+        self._lock = Lock()
+        if self.path.exists() and not reset:
+            self.state = json.loads(self.path.read_text(encoding="utf-8"))
+            if self.state.get("namespace", NAMESPACE) != namespace:
+                raise ValueError(
+                    f"Checkpoint {path} belongs to namespace {self.state.get('namespace')!r}; "
+                    f"use another --checkpoint or --reset"
+                )
+        else:
+            self.state = {"index": PINECONE_INDEX, "namespace": namespace, "docs": {}}
+
+    def doc(self, doc_id: str) -> dict:
+        return self.state["docs"].get(doc_id, {})
+
+    def start_doc(self, doc_id: str, filename: str, batches: int, dropped: list,
+                  alt_sources: Optional[dict] = None) -> None:
+        """``alt_sources`` (canonical vector id -> sources) is only given on a document's first dedup."""
+        with self._lock:
+            entry = self.state["docs"].setdefault(doc_id, {"file": filename, "done": []})
+            entry.update({"batches": batches, "dropped": dropped})
+            if alt_sources is not None:
+                entry["alt_sources"] = alt_sources
+                entry["alt_sources_synced"] = not alt_sources
+            entry.pop("error", None)
+            # A document without chunks (or with every batch already done) has nothing left to queue
+            entry["complete"] = len(entry["done"]) >= batches
+            self._save()
+
+    def fail_doc(self, doc_id: str, filename: str, error: str) -> None:
+        with self._lock:
+            entry = self.state["docs"].setdefault(doc_id, {"file": filename, "done": []})
+            entry["error"] = error
+            self._save()
+
+    def finish_batch(self, doc_id: str, batch_no: int) -> bool:
+        """Record a stored batch; True when it was the document's last one."""
+        with self._lock:
+            entry = self.state["docs"][doc_id]
+            entry["done"].append(batch_no)
+            entry["complete"] = len(entry["done"]) >= entry["batches"]
+            self._save()
+            return entry["complete"]
+
+    def unsynced_alt_sources(self) -> Dict[str, dict]:
+        with self._lock:
+            return {doc_id: entry["alt_sources"] for doc_id, entry in self.state["docs"].items()
+                    if entry.get("alt_sources") and not entry.get("alt_sources_synced")}
+
+    def finish_alt_sources(self, doc_id: str) -> None:
+        with self._lock:
+            self.state["docs"][doc_id]["alt_sources_synced"] = True
+            self._save()
+
+    def finish_summaries(self, doc_id: str) -> None:
+        with self._lock:
+            self.state["docs"][doc_id]["summarized"] = True
+            self._save()
+
+    def _save(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.state), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def sync_alt_sources(checkpoint: Checkpoint, namespace: str = NAMESPACE) -> int:
+    """
+    Merge every document's recorded alt_sources into the stored canonical chunks.
+    A document stays pending while any of its canonicals is not stored yet.
+    """
+    updated = 0
+    for doc_id, alt_sources in checkpoint.unsynced_alt_sources().items():
+        count, missing = merge_alt_sources(alt_sources, namespace)
+        updated += count
+        if not missing:
+            checkpoint.finish_alt_sources(doc_id)
+    return updated
+
+
+def run(
+    folder: str,
+    batch_size: int,
+    workers: int,
+    checkpoint_path: str,
+    reset: bool,
+    namespace: str = NAMESPACE
+) -> dict:
+    checkpoint = Checkpoint(checkpoint_path, namespace=namespace, reset=reset)
+    dedup = get_deduplicator(namespace) if DEDUP_ENABLED else None
+    dedup_before = dedup.stats() if dedup is not None else None
+    stats = {"files": 0, "files_skipped": 0, "failed_files": 0, "pages": 0, "chunks": 0,
+             "batches": 0, "batches_skipped": 0, "failed_batches": 0,
+             "documents_summarized": 0, "failed_summaries": 0}
+    start = time.perf_counter()
+
+    pending = set()
+    summaries = []
+
+    def summarize(doc_id, filename, chunks):
+        summaries.append((doc_id, queue_summaries(chunks, filename, namespace)))
+
+    # Extraction workers live for this run only and are shut down with it
+    with ThreadPoolExecutor(max_workers=workers) as pool, extraction_pool():
+        def submit(doc_id, batch_no, chunks, ids, filename, doc_chunks):
+            def job():
+                upsert_batch(chunks, ids, namespace)
+                if checkpoint.finish_batch(doc_id, batch_no) and INGEST_SUMMARIES:
+                    summarize(doc_id, filename, doc_chunks)
+                return len(chunks)
+            pending.add(pool.submit(job))
+            # Keep a bounded number of batches in flight
+            while len(pending) >= workers * 2:
+                drain(return_when=FIRST_COMPLETED)
+
+        def drain(return_when=None):
+            done, _ = wait(pending, return_when=return_when) if return_when else wait(pending)
+            for future in done:
+                pending.discard(future)
+                try:
+                    stats["chunks"] += future.result()
+                    stats["batches"] += 1
+                except Exception as e:
+                    stats["failed_batches"] += 1
+                    logger.warning("Batch failed (will retry on next run): %s", e)
+
+        for pdf in sorted(Path(folder).glob("*.pdf")):
+            doc_id = hash_file(str(pdf))
+            entry = checkpoint.doc(doc_id)
+            if entry.get("complete") and (entry.get("summarized") or not INGEST_SUMMARIES or not entry["batches"]):
+                stats["files_skipped"] += 1
+                continue
+
+            stats["files"] += 1
+            try:
+                chunks, parents = split_pdf(str(pdf), pdf.name)
+                pages = len({ch.metadata.get("page") for ch in chunks})
+                matches = []
+                if dedup is not None:
+                    # Its chunks already stored (seeded from the index) are about to be rewritten
+                    dedup.forget_doc(doc_id)
+                if "dropped" in entry:
+                    # Replay the first run's dedup decisions so batch numbers stay stable, but
+                    # register the chunks again so later files are matched against them
+                    dropped = entry["dropped"]
+                    skip = set(dropped)
+                    if dedup is not None:
+                        dedup.filter(chunks)
+                    chunks = [ch for i, ch in enumerate(chunks) if i not in skip]
+                else:
+                    kept, _ = deduplicate(chunks, dedup, matches)
+                    kept_ids = {id(ch) for ch in kept}
+                    dropped = [i for i, ch in enumerate(chunks) if id(ch) not in kept_ids]
+                    chunks = kept
+                batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+                done = set(entry.get("done", []))
+
+                if not done:
+                    reset_document(doc_id, pdf.name, parents, namespace)
+                ids = stamp_chunks(chunks, doc_id, pdf.name)
+                id_batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+                todo = [n for n in range(len(batches)) if n not in done]
+                # A replayed document's alt_sources are already in the checkpoint
+                alt_sources = None if "dropped" in entry else alt_source_updates(matches)
+                checkpoint.start_doc(doc_id, pdf.name, len(batches), dropped, alt_sources)
+            except Exception as e:
+                # A corrupt or encrypted PDF must not abort this run, nor every resumed one
+                if dedup is not None:
+                    dedup.rollback()
+                stats["failed_files"] += 1
+                checkpoint.fail_doc(doc_id, pdf.name, str(e))
+                logger.warning("Skipping %s (will retry on next run): %s", pdf.name, e)
+                continue
+            if dedup is not None:
+                dedup.commit()  # failed batches are retried from the checkpoint on the next run
+            stats["pages"] += pages
+            stats["batches_skipped"] += len(batches) - len(todo)
+
+            if not todo and chunks and INGEST_SUMMARIES:
+                # Stored by an earlier run whose summary job did not finish
+                summarize(doc_id, pdf.name, chunks)
+            for n in todo:
+                submit(doc_id, n, batches[n], id_batches[n], pdf.name, chunks)
+            logger.info("%s: %d chunks, %d/%d batches queued", pdf.name, len(chunks), len(todo), len(batches))
+
+        drain()
+
+    wait([future for _, future in summaries])
+    for doc_id, future in summaries:
+        if future.exception() is None:
+            checkpoint.finish_summaries(doc_id)
+            stats["documents_summarized"] += 1
+        else:
+            stats["failed_summaries"] += 1
+    if dedup is not None:
+        after = dedup.stats()
+        chunks_in = after["chunks_in"] - dedup_before["chunks_in"]
+        removed = after["duplicates_removed"] - dedup_before["duplicates_removed"]
+        stats.update({"chunks_in": chunks_in, "duplicates_removed": removed,
+                      "dedup_ratio": round(removed / chunks_in, 4) if chunks_in else 0.0})
+        # Written from the checkpoint instead, which also covers documents of interrupted runs
+        dedup.late_updates.clear()
+        stats["alt_sources_updated"] = sync_alt_sources(checkpoint, namespace)
+    stats["elapsed_s"] = round(time.perf_counter() - start, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable bulk indexer for a folder of PDFs")
+    parser.add_argument("--folder", default="Docs/")
+    parser.add_argument("--batch-size", type=int, default=200, help="Chunks per embedding/upsert batch")
+    parser.add_argument("--workers", type=int, default=4, help="Batches embedded and upserted in parallel")
+    parser.add_argument("--checkpoint", default=".index_checkpoint.json")
+    parser.add_argument("--reset", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--namespace", default=NAMESPACE, help="Target tenant namespace")
+    parser.add_argument("--backfill-timestamps", action="store_true",
+                        help="Stamp ingested_ts onto chunks indexed without it, then exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVEL, format="[%(name)s] %(message)s")
+    validate_config()
+    namespace = resolve_namespace(args.namespace)
+    if args.backfill_timestamps:
+        stats = backfill_ingested_ts(namespace)
+        print(f"Backfilled ingested_ts on {stats['updated']} of {stats['chunks']} chunks in "
+              f"{PINECONE_INDEX}/{namespace} ({stats['undated']} without an ingestion date)")
+        return
+    stats = run(args.folder, args.batch_size, args.workers, args.checkpoint, args.reset, namespace)
+
+    elapsed = max(stats["elapsed_s"], 1e-9)
+    print(f"\nUpserted {stats['chunks']} chunks into {PINECONE_INDEX}/{namespace}")
+    print(f"  files:   {stats['files'] - stats['failed_files']} indexed, {stats['files_skipped']} already complete, "
+          f"{stats['failed_files']} failed")
+    print(f"  batches: {stats['batches']} done, {stats['batches_skipped']} skipped (checkpoint), "
+          f"{stats['failed_batches']} failed")
+    if INGEST_SUMMARIES:
+        print(f"  summaries: {stats['documents_summarized']} documents, {stats['failed_summaries']} failed "
+              f"(retried on next run)")
+    if "dedup_ratio" in stats:
+        print(f"  dedup:   {stats['duplicates_removed']} duplicates removed ({stats['dedup_ratio']:.1%})")
+    print(f"  elapsed: {stats['elapsed_s']}s -> {stats['chunks'] / elapsed:.1f} chunks/s, "
+          f"{stats['pages'] / elapsed:.1f} pages/s")
+
 
-print(f"Upserted {len(splits)} chunks into {PINECONE_INDEX}/{NAMESPACE}")
+if __name__ == "__main__":
+    main()
@@ -495,6 +495,11 @@ st.markdown("""
 
 # Configuration
 FASTAPI_URL = "http://127.0.0.1:8000"
+# Client timeouts; the server gets a slightly shorter deadline (X-Request-Timeout) so it
+# can skip optional stages and still answer before the client gives up
+ENHANCED_QUERY_TIMEOUT = 45
+QUERY_TIMEOUT = 30
+DEADLINE_MARGIN = 3
 
 # Initialize session state
 if 'session_id' not in st.session_state:
@@ -530,14 +535,16 @@ def send_enhanced_query(user_input: str, session_id: str, use_enhancements: bool
                 "input": user_input,
                 "use_summarization": True,
                 "generate_followups": True,
-                "response_style": "professional"
+                "response_style": "professional",
+                "defer_extras": True
             }
             
             response = requests.post(
                 f"{FASTAPI_URL}/query/enhanced",
                 json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=45
+                headers={"Content-Type": "application/json",
+                         "X-Request-Timeout": str(ENHANCED_QUERY_TIMEOUT - DEADLINE_MARGIN)},
+                timeout=ENHANCED_QUERY_TIMEOUT
             )
         else:
             payload = {
@@ -549,8 +556,9 @@ def send_enhanced_query(user_input: str, session_id: str, use_enhancements: bool
             response = requests.post(
                 f"{FASTAPI_URL}/query",
                 json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
+                headers={"Content-Type": "application/json",
+                         "X-Request-Timeout": str(QUERY_TIMEOUT - DEADLINE_MARGIN)},
+                timeout=QUERY_TIMEOUT
             )
         
         if response.status_code == 200:
@@ -565,6 +573,20 @@ def send_enhanced_query(user_input: str, session_id: str, use_enhancements: bool
     except Exception as e:
         return None, f"Error: {str(e)}"
 
+def fetch_response_extras(response_id: str, wait: float = 10) -> Dict[str, Any]:
+    """Summary and follow-ups computed after the answer; waits up to ``wait`` seconds for them"""
+    try:
+        response = requests.get(
+            f"{FASTAPI_URL}/responses/{response_id}/extras",
+            params={"wait": wait},
+            timeout=wait + 5
+        )
+        if response.status_code == 200:
+            return response.json()
+    except Exception:
+        pass
+    return {"status": "failed"}
+
 def get_usage_stats():
     """Get usage statistics from API"""
     try:
@@ -683,6 +705,16 @@ with col_main:
                         <div class="message-timestamp">{message['timestamp']}</div>
                 """, unsafe_allow_html=True)
                 
+                # Extras (summary, follow-ups) arrive after the answer is shown
+                if message.get('extras_pending'):
+                    extras = fetch_response_extras(message['response_id'])
+                    if extras.get('status') != 'pending':
+                        message['extras_pending'] = False
+                        features = message.setdefault('enhanced_features', {})
+                        for key in ('document_summary', 'follow_up_suggestions'):
+                            if extras.get(key):
+                                features[key] = extras[key]
+                
                 # Enhanced features display
                 if 'enhanced_features' in message:
                     features = message['enhanced_features']
@@ -803,6 +835,9 @@ with col_main:
                     
                     if 'metadata' in result:
                         bot_message['metadata'] = result['metadata']
+                        if result['metadata'].get('extras_pending'):
+                            bot_message['response_id'] = result['metadata']['response_id']
+                            bot_message['extras_pending'] = True
                     
                     st.session_state.chat_history.append(bot_message)
                     st.success("✅ Response received!")
@@ -1018,6 +1053,10 @@ if hasattr(st.session_state, 'show_ai_test') and st.session_state.show_ai_test:
                 if test_results:
                     st.success("✅ Comparison complete!")
                     
+                    if test_results.get('comparison'):
+                        st.markdown("**Latency and token usage** (enhanced approaches include the shared retrieval):")
+                        st.table(test_results['comparison'])
+                    
                     approaches = test_results.get('results', {})
                     tab_names = list(approaches.keys())
                     
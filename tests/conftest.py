@@ -0,0 +1,49 @@
+# tests/conftest.py
+"""The suite runs offline: fake models and embeddings and a local FAISS index in a temp dir."""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# Settings are read when src.config is imported, so they are set before any test module loads
+_WORKDIR = tempfile.mkdtemp(prefix="rag-tests-")
+os.environ.update({
+    "STUB_MODELS": "true",
+    "TENANT_NAMESPACES": "*",
+    "VECTOR_BACKEND": "faiss",
+    "LOCAL_INDEX_DIR": os.path.join(_WORKDIR, "index"),
+    "PARENT_STORE_DIR": os.path.join(_WORKDIR, "parents"),
+    "EMBEDDING_DIMENSIONS": "64",
+    "WARMUP_ON_STARTUP": "false",
+    "INGEST_SUMMARIES": "false",
+})
+
+
+TOPICS = ["refund", "warranty", "delivery", "password", "invoice", "subscription"]
+
+
+@pytest.fixture
+def namespace() -> str:
+    """A fresh tenant namespace, so tests do not share an index."""
+    return f"t{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def indexed_namespace(namespace) -> str:
+    """A namespace holding a small support-policy corpus, indexed through src.ingest."""
+    from langchain.schema import Document
+    from src.ingest import stamp_chunks, upsert_batch
+
+    chunks = [
+        Document(
+            page_content=f"The {topic} policy, section {i}: customers contact support and the {topic} "
+                         f"request is handled within {i + 2} business days.",
+            metadata={"source": f"{topic}.pdf", "page": i}
+        )
+        for topic in TOPICS for i in range(3)
+    ]
+    for topic in TOPICS:
+        docs = [ch for ch in chunks if ch.metadata["source"] == f"{topic}.pdf"]
+        upsert_batch(docs, stamp_chunks(docs, topic, f"{topic}.pdf"), namespace)
+    return namespace
@@ -0,0 +1,89 @@
+# tests/test_admission.py
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import main
+from src.admission import (
+    BATCH, CHAT, INGEST, AdmissionController, OutboundScheduler, Overloaded, ScheduledEmbeddings
+)
+from src.fakes import FakeEmbeddings
+
+
+def test_outbound_calls_wait_for_a_slot_then_give_up():
+    scheduler = OutboundScheduler(max_concurrency=1, rate=0, max_wait=0.1)
+    scheduler.acquire(CHAT)
+    with pytest.raises(Overloaded) as rejected:
+        scheduler.acquire(CHAT)
+    assert rejected.value.retry_after >= 1
+    assert scheduler.snapshot()["timeouts"] == 1 and scheduler.queue_depth() == 0
+    scheduler.release()
+    with scheduler.slot(CHAT):
+        assert scheduler.snapshot()["active"] == 1
+
+
+def test_waiting_chat_calls_are_served_before_earlier_batch_calls():
+    scheduler = OutboundScheduler(max_concurrency=1, rate=0, max_wait=5)
+    scheduler.acquire(CHAT)
+    order = []
+
+    def call(priority, name):
+        with scheduler.slot(priority):
+            order.append(name)
+
+    threads = [threading.Thread(target=call, args=(BATCH, "batch"))]
+    threads[0].start()
+    while scheduler.queue_depth() < 1:
+        time.sleep(0.001)
+    threads.append(threading.Thread(target=call, args=(CHAT, "chat")))
+    threads[1].start()
+    while scheduler.queue_depth() < 2:
+        time.sleep(0.001)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["chat", "batch"]
+
+
+def test_rate_limit_spaces_out_calls():
+    scheduler = OutboundScheduler(max_concurrency=10, rate=20, burst=1, max_wait=5)
+    embeddings = ScheduledEmbeddings(FakeEmbeddings(), scheduler)
+    start = time.monotonic()
+    for _ in range(4):
+        embeddings.embed_query("refund")
+    assert time.monotonic() - start >= 0.14  # three refills at 20/s after the burst
+
+
+def test_lower_priorities_are_shed_first():
+    controller = AdmissionController(OutboundScheduler(max_concurrency=1), max_inflight=4, max_queue=8)
+    assert controller.try_admit(INGEST) is None
+    assert controller.try_admit(INGEST) is not None  # ingest gets a quarter of the slots
+    assert controller.try_admit(BATCH) is None
+    assert controller.try_admit(BATCH) is not None  # batch gets half
+    assert controller.try_admit(CHAT) is None and controller.try_admit(CHAT) is None
+    assert controller.try_admit(CHAT) is not None
+    controller.leave()
+    assert controller.try_admit(CHAT) is None
+    stats = controller.snapshot()["priorities"]
+    assert stats["chat"] == {"admitted": 3, "rejected": 1} and stats["ingest"]["rejected"] == 1
+
+
+def test_saturated_service_answers_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(main.admission, "_inflight", main.admission.max_inflight)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/query", json={"input": "refund window?", "session_id": "s"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_outbound_overload_maps_to_429():
+    error = main.http_error(Overloaded("Model capacity exhausted", retry_after=7))
+    assert error.status_code == 429 and error.headers == {"Retry-After": "7"}
@@ -0,0 +1,79 @@
+# tests/test_ai_approaches.py
+import asyncio
+import threading
+
+import httpx
+
+import main
+from src.enhanced_llm import get_enhanced_rag_chain
+
+
+def test_variants_share_one_retrieval_and_run_concurrently(monkeypatch):
+    chain = get_enhanced_rag_chain()
+    original = chain.enhanced_invoke
+    both_running = threading.Barrier(2, timeout=5)
+    retrievals = []
+
+    def enhanced_invoke(**kwargs):
+        retrievals.append(kwargs["retrieval_result"])
+        both_running.wait()  # raises BrokenBarrierError if the variants ran one after the other
+        return original(**kwargs)
+
+    monkeypatch.setattr(chain, "enhanced_invoke", enhanced_invoke)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as c:
+            return await c.post("/test/ai-approaches", params={"query": "How do refunds work?"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    body = response.json()
+    assert all("error" not in result for result in body["results"].values())
+    assert len(retrievals) == 2 and retrievals[0] is retrievals[1]
+    assert retrievals[0]["answer"] == body["results"]["original_rag"]["answer"]
+
+    comparison = {row["approach"]: row for row in body["comparison"]}
+    shared = body["shared_retrieval"]
+    for name in ("enhanced_with_summarization", "full_enhanced"):
+        # Each enhanced variant reports its own calls on top of the shared retrieval's
+        assert comparison[name]["llm_calls"] > shared["llm_calls"]
+        assert comparison[name]["seconds"] >= shared["seconds"]
+
+
+def test_variants_use_the_requested_namespace_and_filters(monkeypatch, indexed_namespace):
+    chain = get_enhanced_rag_chain()
+    original = chain.enhanced_invoke
+    calls = []
+
+    def enhanced_invoke(**kwargs):
+        calls.append(kwargs)
+        return original(**kwargs)
+
+    monkeypatch.setattr(chain, "enhanced_invoke", enhanced_invoke)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as c:
+            return await c.post("/test/ai-approaches", params={
+                "query": "How do refunds work?", "namespace": indexed_namespace, "source": "delivery.pdf"
+            })
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    body = response.json()
+    assert body["namespace"] == indexed_namespace
+    assert all("error" not in result for result in body["results"].values())
+
+    assert len(calls) == 2
+    for call in calls:
+        assert (call["namespace"], call["filters"]) == (indexed_namespace, body["filters"])
+        context = call["retrieval_result"]["context"]
+        assert context and {doc.metadata["source"] for doc in context} == {"delivery.pdf"}
+    assert body["results"]["full_enhanced"]["metadata"]["namespace"] == indexed_namespace
+
+
+def test_unknown_namespace_is_a_client_error():
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as c:
+            return await c.post("/test/ai-approaches", params={"query": "refunds", "namespace": "not a namespace!"})
+
+    assert asyncio.run(scenario()).status_code == 400
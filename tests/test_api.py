@@ -0,0 +1,49 @@
+# tests/test_api.py
+import asyncio
+import threading
+import time
+
+import httpx
+
+import main
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+
+def test_sync_file_ingest_does_not_block_other_requests(monkeypatch):
+    started = threading.Event()
+
+    def slow_ingest(data, filename, namespace=None):
+        started.set()
+        time.sleep(0.5)
+        return {"doc_id": "x", "chunks": 0, "parents": 0}
+
+    monkeypatch.setattr(main, "ingest_pdf_bytes", slow_ingest)
+
+    async def scenario():
+        async with client() as c:
+            ingest = asyncio.create_task(
+                c.post("/ingest/file", params={"sync": "true"}, files={"file": ("a.pdf", b"%PDF")})
+            )
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            root = await c.get("/")
+            ingest_running = not ingest.done()
+            return (await ingest).status_code, root.status_code, ingest_running
+
+    ingest_status, root_status, ingest_running = asyncio.run(scenario())
+    assert (ingest_status, root_status) == (200, 200)
+    assert ingest_running
+
+
+def test_shutdown_stops_the_pdf_extraction_pool():
+    import src.pdf_extract as pdf_extract
+
+    async def scenario():
+        async with main.lifespan(main.app):
+            pdf_extract._get_pool(1)
+
+    asyncio.run(scenario())
+    assert pdf_extract._pool is None
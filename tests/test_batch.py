@@ -0,0 +1,120 @@
+# tests/test_batch.py
+import asyncio
+import json
+import threading
+
+import httpx
+
+import main
+from src import batch
+from src.batch import answer_batch
+from src.pinecone_vectorstore import get_vectorstore
+
+
+def test_answers_stream_while_other_retrievals_are_still_running(monkeypatch, indexed_namespace):
+    vs = get_vectorstore(indexed_namespace)
+    search = vs.max_marginal_relevance_search_by_vector
+    release, slow_done = threading.Event(), threading.Event()
+
+    def slow_when_filtered(vector, **kwargs):
+        if kwargs.get("filter"):
+            release.wait(timeout=5)
+            slow_done.set()
+        return search(vector, **kwargs)
+
+    monkeypatch.setattr(vs, "max_marginal_relevance_search_by_vector", slow_when_filtered)
+    items = [
+        {"id": "fast", "input": "How long does a refund take?"},
+        {"id": "slow", "input": "How long does delivery take?", "filters": {"source": {"$in": ["delivery.pdf"]}}},
+    ]
+    results = answer_batch(items, indexed_namespace, concurrency=1, retrieval_workers=2)
+
+    first = next(results)
+    assert first["id"] == "fast" and "error" not in first
+    assert not slow_done.is_set()
+    release.set()
+    second = next(results)
+    assert second["id"] == "slow" and {s["source"] for s in second["sources"]} <= {"delivery.pdf"}
+
+
+def test_every_item_gets_one_result_and_failures_stay_per_item(monkeypatch, indexed_namespace):
+    vs = get_vectorstore(indexed_namespace)
+    search = vs.max_marginal_relevance_search_by_vector
+
+    def failing_when_filtered(vector, **kwargs):
+        if kwargs.get("filter"):
+            raise RuntimeError("search backend unavailable")
+        return search(vector, **kwargs)
+
+    monkeypatch.setattr(vs, "max_marginal_relevance_search_by_vector", failing_when_filtered)
+    items = [{"id": i, "input": f"Question {i} about the invoice policy"} for i in range(6)]
+    items[3]["filters"] = {"source": "invoice.pdf"}
+
+    results = {r["id"]: r for r in answer_batch(items, indexed_namespace, concurrency=3, retrieval_workers=2)}
+    assert sorted(results) == list(range(6))
+    assert results[3]["error"] == "search backend unavailable"
+    assert all(r["answer"] for i, r in results.items() if i != 3)
+
+
+def test_retrieval_starts_before_later_chunks_are_embedded(monkeypatch, indexed_namespace):
+    vs = get_vectorstore(indexed_namespace)
+    search = vs.max_marginal_relevance_search_by_vector
+    embed = batch.embed_questions
+    first_retrieved = threading.Event()
+    overlapped = []
+
+    def searching(vector, **kwargs):
+        first_retrieved.set()
+        return search(vector, **kwargs)
+
+    def embedding(questions, batch_size):
+        if questions[0].startswith("Question 2"):
+            overlapped.append(first_retrieved.wait(timeout=5))
+        return embed(questions, batch_size)
+
+    monkeypatch.setattr(vs, "max_marginal_relevance_search_by_vector", searching)
+    monkeypatch.setattr(batch, "embed_questions", embedding)
+    items = [{"id": i, "input": f"Question {i} about the refund policy"} for i in range(4)]
+
+    results = list(answer_batch(items, indexed_namespace, concurrency=2, retrieval_workers=2, embed_size=2))
+    assert overlapped == [True]
+    assert sorted(r["id"] for r in results) == [0, 1, 2, 3] and all("error" not in r for r in results)
+
+
+def test_a_failed_embedding_chunk_fails_only_its_items(monkeypatch, indexed_namespace):
+    embed = batch.embed_questions
+
+    def embedding(questions, batch_size):
+        if questions[0].startswith("Question 2"):
+            raise RuntimeError("embedding service unavailable")
+        return embed(questions, batch_size)
+
+    monkeypatch.setattr(batch, "embed_questions", embedding)
+    items = [{"id": i, "input": f"Question {i} about the warranty policy"} for i in range(5)]
+
+    results = {r["index"]: r for r in answer_batch(items, indexed_namespace, embed_size=2)}
+    assert sorted(results) == [0, 1, 2, 3, 4]
+    assert {i for i, r in results.items() if "error" in r} == {2, 3}
+    assert results[2]["error"] == "embedding service unavailable"
+
+
+def test_batch_endpoint_reports_a_batch_wide_failure_per_question(monkeypatch, indexed_namespace):
+    import src.llm
+
+    def broken():
+        raise RuntimeError("chat model not configured")
+
+    monkeypatch.setattr(src.llm, "_shared_chains", broken)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as c:
+            return await c.post("/query/batch", json={
+                "namespace": indexed_namespace,
+                "questions": [{"input": "How do refunds work?"}, {"input": "How long is the warranty?", "id": "w"}]
+            })
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["index"], line["id"]) for line in lines] == [(0, 0), (1, "w")]
+    assert all(line["error"] == "chat model not configured" for line in lines)
@@ -0,0 +1,55 @@
+# tests/test_benchmarks.py
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.bench_suite import compare, latency_stats
+from src.fakes import FakeChatModel, FakeEmbeddings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_fake_chat_model_is_deterministic_and_reports_usage():
+    model = FakeChatModel(output_tokens=36)
+    first, again = model.invoke("What is the refund window?"), model.invoke("What is the refund window?")
+    other = model.invoke("How do I reset my password?")
+    assert first.content == again.content != other.content
+    assert first.usage_metadata["output_tokens"] == 36 and first.usage_metadata["input_tokens"] > 0
+    assert first.content.splitlines()[-1].endswith("?")
+
+
+def test_fake_embeddings_keep_neighbours_plausible():
+    embeddings = FakeEmbeddings(dimensions=64)
+    query = np.array(embeddings.embed_query("refund policy for damaged orders"))
+    related, unrelated = (np.array(v) for v in embeddings.embed_documents(
+        ["our refund policy covers damaged orders", "reset your account password by email"]))
+    assert query @ related > query @ unrelated
+    assert abs(np.linalg.norm(query) - 1) < 1e-5
+
+
+def test_latency_stats_and_baseline_comparison():
+    stats = latency_stats([i / 1000 for i in range(1, 101)])
+    assert (stats["n"], stats["p50_ms"], stats["p99_ms"]) == (100, 51.0, 99.0)
+
+    rows = compare({"query": {"p50_ms": 12.0, "label": "x"}, "new": 1}, {"query": {"p50_ms": 10.0}})
+    assert rows == [("query.p50_ms", 10.0, 12.0, 20.0)]
+
+
+def test_suite_runs_end_to_end_and_compares_against_a_baseline(tmp_path):
+    out = tmp_path / "bench.json"
+    command = [sys.executable, "-m", "benchmarks.bench_suite", "--pages", "20", "--pages-per-doc", "5",
+               "--requests", "3", "--sessions", "2", "--session-sizes", "10", "--session-ops", "20",
+               "--dimensions", "32", "--out", str(out)]
+    first = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert first.returncode == 0, first.stderr
+    results = json.loads(out.read_text())["results"]
+    assert set(results) == {"splitter", "ingest", "query", "sessions"}
+    assert results["query"]["query_enhanced"]["n"] == 3
+
+    second = subprocess.run(command[:-2] + ["--only", "splitter", "--baseline", str(out)],
+                            cwd=ROOT, capture_output=True, text=True, timeout=300)
+    assert second.returncode == 0, second.stderr
+    assert "changes vs." in second.stderr and "splitter." in second.stderr
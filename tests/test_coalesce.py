@@ -0,0 +1,73 @@
+# tests/test_coalesce.py
+import asyncio
+import threading
+
+import pytest
+
+from src.coalesce import SingleFlight, request_key
+from src.retry import DeadlineExceeded, LatencyBudget
+
+
+def test_identical_requests_share_one_run():
+    flight, calls = SingleFlight(), []
+
+    def answer(query):
+        calls.append(query)
+        threading.Event().wait(0.1)
+        return {"answer": query.upper()}
+
+    async def scenario():
+        key = request_key("What is the refund window?", "t", 0)
+        same = request_key("  what is the REFUND window ", "t", 0)
+        return await asyncio.gather(flight.run(key, answer, "a"), flight.run(same, answer, "b"))
+
+    (first, leader_shared), (second, follower_shared) = asyncio.run(scenario())
+    assert calls == ["a"] and first is second
+    assert (leader_shared, follower_shared) == (False, True)
+    assert flight.snapshot()["coalesced"] == 1
+
+
+def test_keys_differ_by_namespace_corpus_version_and_filters():
+    base = request_key("refund window", "t", 0)
+    assert base != request_key("refund window", "u", 0)
+    assert base != request_key("refund window", "t", 1)
+    assert base != request_key("refund window", "t", 0, {"source": {"$in": ["a.pdf"]}})
+
+
+def test_run_lasts_until_the_latest_waiter_deadline():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader_budget, follower_budget = LatencyBudget(0.2), LatencyBudget(5)
+
+    def answer():
+        release.wait(timeout=5)
+        return {"budget_remaining": leader_budget.remaining()}
+
+    async def scenario():
+        key = request_key("q", "t", 0)
+        leader = asyncio.ensure_future(flight.run(key, answer, budget=leader_budget, on_abandon=leader_budget.cancel))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.run(key, answer, budget=follower_budget))
+        with pytest.raises(DeadlineExceeded):
+            await leader  # the leader gives up at its own deadline ...
+        release.set()
+        return await follower  # ... while the shared run keeps the follower's
+
+    result, shared = asyncio.run(scenario())
+    assert shared and result["budget_remaining"] > 4
+    assert not leader_budget.cancelled
+    assert flight.snapshot()["abandoned"] == 0
+
+
+def test_run_is_abandoned_when_every_waiter_times_out():
+    flight = SingleFlight()
+    release = threading.Event()
+    budget = LatencyBudget(0.1)
+
+    async def scenario():
+        with pytest.raises(DeadlineExceeded):
+            await flight.run(request_key("q", "t", 0), release.wait, 5, budget=budget, on_abandon=budget.cancel)
+
+    asyncio.run(scenario())
+    release.set()
+    assert budget.cancelled and flight.snapshot()["abandoned"] == 1
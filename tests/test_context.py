@@ -0,0 +1,95 @@
+# tests/test_context.py
+import pytest
+from langchain.schema import Document
+
+from src import context, tokens
+from src.config import CHAT_MODEL
+from src.context import pack_context
+from src.helper import process_documents
+
+
+def doc(text: str, **metadata) -> Document:
+    return Document(page_content=text, metadata={"source": "policy.pdf", "page": 0, **metadata})
+
+
+def test_chunks_carry_token_counts_in_the_chat_models_encoding():
+    chunks = process_documents([doc("Refunds take five business days. " * 80)])
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.metadata["token_count"] == tokens.count_prompt_tokens(chunk.page_content)
+        assert chunk.metadata["token_encoding"] == tokens.encoding_name(CHAT_MODEL)
+
+
+def test_packing_uses_stored_counts_without_recounting(monkeypatch):
+    encoding = tokens.encoding_name(CHAT_MODEL)
+    docs = [doc(f"chunk {i}", page=i, token_count=40, token_encoding=encoding) for i in range(5)]
+
+    def no_recount(text):
+        raise AssertionError("stored token_count should be used")
+
+    monkeypatch.setattr(context, "count_prompt_tokens", no_recount)
+    packed = pack_context(docs, token_budget=100, expand_parents=False)
+    assert [d.page_content for d in packed[:2]] == ["chunk 0", "chunk 1"]
+    assert len(packed) == 2
+
+
+def test_counts_from_another_encoding_are_recounted(monkeypatch):
+    recounted = []
+    monkeypatch.setattr(context, "count_prompt_tokens", lambda text: recounted.append(text) or 1)
+    pack_context([doc("chunk", token_count=9999, token_encoding="r50k_base")], expand_parents=False)
+    assert recounted == ["chunk"]
+
+
+def test_merged_chunks_drop_their_stale_count():
+    first = doc("Refunds take five business days.", start_index=0, token_count=6)
+    second = doc("five business days. Exchanges take two.", start_index=13, token_count=7)
+    merged = context._merge_overlaps([first, second])
+    assert merged[0].page_content == "Refunds take five business days. Exchanges take two."
+    assert "token_count" not in merged[0].metadata
+
+
+def test_missing_tokenizer_fails_when_fallback_is_off(monkeypatch):
+    def offline(model):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tokens.tiktoken, "encoding_for_model", offline)
+    monkeypatch.setattr(tokens, "TOKENIZER_FALLBACK", False)
+    with pytest.raises(RuntimeError, match="TOKENIZER_FALLBACK"):
+        tokens.get_encoding.__wrapped__("gpt-4o")
+
+    monkeypatch.setattr(tokens, "TOKENIZER_FALLBACK", True)
+    assert tokens.get_encoding.__wrapped__("gpt-4o") is None
+
+
+PAGE = "Refunds are issued within five business days. Exchanges take two days. Store credit never expires. "
+
+
+def window(start: int, length: int, **metadata) -> Document:
+    return doc(PAGE[start:start + length], start_index=start, **metadata)
+
+
+def test_out_of_order_overlapping_chunks_merge_in_rank_order():
+    ranked = [
+        window(40, 45, chunk_index=2),
+        doc("Warranty claims need a receipt.", page=3, start_index=0, chunk_index=9),
+        window(0, 50, chunk_index=0),
+        window(70, len(PAGE) - 70, chunk_index=3),
+        window(10, 20, chunk_index=1),  # contained in the second window
+    ]
+    merged = context._merge_overlaps(ranked)
+
+    assert [d.page_content for d in merged] == [PAGE, "Warranty claims need a receipt."]
+    # The best-ranked chunk's metadata, with the start of the merged span
+    assert merged[0].metadata["chunk_index"] == 2 and merged[0].metadata["start_index"] == 0
+
+
+def test_offsets_that_do_not_match_the_text_are_not_stitched():
+    merged = context._merge_overlaps([doc("Refunds are issued", start_index=0),
+                                      doc("something unrelated", start_index=10)])
+    assert len(merged) == 2
+
+
+def test_chunks_without_offsets_are_deduplicated_by_containment():
+    merged = context._merge_overlaps([doc("Exchanges take two days."), window(0, 75), doc("Store credit.")])
+    assert [d.page_content for d in merged] == [PAGE[:75], "Store credit."]
+    assert merged[0].metadata["start_index"] == 0  # the span still has its offset
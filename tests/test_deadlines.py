@@ -0,0 +1,80 @@
+# tests/test_deadlines.py
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import main
+from src.config import REQUEST_LATENCY_BUDGET_SECONDS
+from src.retry import DeadlineExceeded, LatencyBudget, RequestCancelled
+
+
+def post(path, json, headers=None):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=json, headers=headers or {})
+    return asyncio.run(scenario())
+
+
+def test_client_timeouts_are_capped():
+    assert LatencyBudget.for_request(None).seconds == REQUEST_LATENCY_BUDGET_SECONDS
+    assert LatencyBudget.for_request(0).seconds == REQUEST_LATENCY_BUDGET_SECONDS
+    assert LatencyBudget.for_request(2.5).seconds == 2.5
+    assert LatencyBudget.for_request(REQUEST_LATENCY_BUDGET_SECONDS * 10).seconds == REQUEST_LATENCY_BUDGET_SECONDS
+
+
+def test_spent_deadline_is_a_504(indexed_namespace):
+    response = post("/query/enhanced", {"session_id": "s", "input": "How long does a refund take?",
+                                        "namespace": indexed_namespace},
+                    headers={"X-Request-Timeout": "0.000001", "X-Request-ID": "deadline-test"})
+    assert response.status_code == 504
+    assert response.headers["X-Request-ID"] == "deadline-test"
+
+
+def test_malformed_timeout_header_is_a_400():
+    response = post("/query/enhanced", {"session_id": "s", "input": "q"}, headers={"X-Request-Timeout": "soon"})
+    assert response.status_code == 400
+
+
+def test_error_mapping():
+    assert main.http_error(DeadlineExceeded("late")).status_code == 504
+    assert main.http_error(RequestCancelled("gone")).status_code == 499
+
+
+class DisconnectingRequest:
+    def __init__(self, after: int):
+        self.polls = 0
+        self.after = after
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls >= self.after
+
+
+def test_disconnect_cancels_the_work(monkeypatch):
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+    budget = LatencyBudget(30)
+    finished = threading.Event()
+
+    async def slow():
+        await asyncio.sleep(5)
+        finished.set()
+
+    async def scenario():
+        with pytest.raises(RequestCancelled):
+            await main.until_disconnected(DisconnectingRequest(after=3), slow(), on_disconnect=budget.cancel)
+
+    asyncio.run(scenario())
+    assert budget.cancelled and not finished.is_set()
+
+
+def test_connected_client_gets_the_result(monkeypatch):
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def quick():
+        await asyncio.sleep(0.03)
+        return "answer"
+
+    assert asyncio.run(main.until_disconnected(DisconnectingRequest(after=1000), quick())) == "answer"
@@ -0,0 +1,60 @@
+# tests/test_dedup.py
+from langchain.schema import Document
+
+from src.dedup import ChunkDeduplicator
+
+TEXT = (
+    "Refunds are issued to the original payment method within five business days of approval. "
+    "Orders returned without a receipt are refunded as store credit at the current selling price. "
+    "Contact customer support by phone or email if the refund has not arrived after ten days."
+)
+
+
+def chunk(text: str, source: str, page: int = 0) -> Document:
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_exact_and_near_duplicates_are_dropped():
+    dedup = ChunkDeduplicator()
+    first = chunk(TEXT, "a.pdf")
+    kept = dedup.filter([first, chunk(TEXT, "b.pdf"), chunk(TEXT.replace("five", "5"), "c.pdf", 2)])
+    assert kept == [first]
+    assert first.metadata["alt_sources"] == ["b.pdf#page=0", "c.pdf#page=2"]
+    assert dedup.stats()["duplicates_removed"] == 2
+
+
+def test_rollback_forgets_a_failed_files_chunks():
+    dedup = ChunkDeduplicator()
+    dedup.filter([chunk(TEXT, "a.pdf")])
+    dedup.rollback()
+
+    second = chunk(TEXT, "b.pdf")
+    assert dedup.filter([second]) == [second]
+    assert dedup.stats() == {"chunks_in": 1, "duplicates_removed": 0, "dedup_ratio": 0.0}
+
+
+def test_rollback_keeps_committed_canonicals_and_drops_new_alt_sources():
+    dedup = ChunkDeduplicator()
+    canonical = chunk(TEXT, "a.pdf")
+    dedup.filter([canonical])
+    canonical.metadata["doc_id"] = "a"
+    dedup.commit()
+
+    assert dedup.filter([chunk(TEXT, "b.pdf")]) == []
+    assert dedup.late_updates
+    dedup.rollback()
+    assert "alt_sources" not in canonical.metadata
+    assert not dedup.late_updates
+    assert dedup.filter([chunk(TEXT, "c.pdf")]) == []
+    assert canonical.metadata["alt_sources"] == ["c.pdf#page=0"]
+
+
+def test_forget_doc_stops_matching_a_document_until_rolled_back():
+    dedup = ChunkDeduplicator()
+    dedup.seed([Document(page_content=TEXT, metadata={"source": "a.pdf", "page": 0, "doc_id": "a"})])
+    dedup.commit()
+
+    dedup.forget_doc("a")
+    assert dedup.filter([chunk(TEXT, "a.pdf")]) != []
+    dedup.rollback()
+    assert dedup.filter([chunk(TEXT.replace("five", "5"), "b.pdf")]) == []
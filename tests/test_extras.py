@@ -0,0 +1,69 @@
+# tests/test_extras.py
+import asyncio
+import threading
+import time
+
+import httpx
+
+import main
+from src.admission import BATCH, CHAT, priority_var
+from src.extras import ExtrasStore
+
+
+def wait_for(store, response_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while store.get(response_id)["status"] == "pending" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return store.get(response_id)
+
+
+def test_jobs_run_in_the_background_at_batch_priority():
+    store = ExtrasStore(workers=1)
+    release = threading.Event()
+
+    def job():
+        release.wait(timeout=5)
+        return {"follow_up_suggestions": ["q"], "priority": priority_var.get()}
+
+    priority_var.set(CHAT)
+    store.submit("r1", job)
+    assert store.get("r1")["status"] == "pending"
+    release.set()
+    entry = wait_for(store, "r1")
+    assert entry["status"] == "ready" and entry["priority"] == BATCH
+    assert entry["follow_up_suggestions"] == ["q"]
+
+
+def test_failures_expiry_and_eviction():
+    store = ExtrasStore(workers=1, ttl=0.2, max_entries=2)
+
+    def broken():
+        raise RuntimeError("model unavailable")
+
+    store.submit("a", broken)
+    entry = wait_for(store, "a")
+    assert entry["status"] == "failed" and entry["error"] == "model unavailable"
+    store.submit("b", dict)
+    store.submit("c", dict)
+    assert store.get("a") is None and store.snapshot()["evicted"] == 1
+    time.sleep(0.25)
+    assert store.get("b") is None
+
+
+def test_deferred_extras_are_fetched_by_response_id(indexed_namespace):
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            answer = await client.post("/query/enhanced", json={
+                "session_id": "extras", "input": "How long does a refund take?", "namespace": indexed_namespace,
+                "generate_followups": True, "use_summarization": True, "defer_extras": True})
+            response_id = answer.json()["response_id"]
+            extras = await client.get(f"/responses/{response_id}/extras", params={"wait": 10})
+            missing = await client.get("/responses/nope/extras")
+            return answer, extras, missing
+
+    answer, extras, missing = asyncio.run(scenario())
+    assert answer.status_code == 200 and answer.json()["metadata"]["extras_pending"]
+    assert answer.json()["suggestions"] == []
+    assert extras.json()["status"] == "ready" and extras.json()["follow_up_suggestions"]
+    assert missing.status_code == 404
@@ -0,0 +1,57 @@
+# tests/test_fast_splitter.py
+import random
+
+import pytest
+from langchain.schema import Document
+
+from src.fast_splitter import FastTextSplitter
+
+WORDS = ["refund", "warranty", "the", "customer", "must", "contact", "support", "within", "days", "policy"]
+
+
+def page(seed: int, paragraphs: int = 12) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))) for _ in range(rng.randint(1, 4)))
+        for _ in range(paragraphs)
+    )
+
+
+@pytest.fixture
+def pages():
+    return [Document(page_content=page(seed), metadata={"source": "a.pdf", "page": seed}) for seed in range(8)]
+
+
+def test_chunks_point_at_their_page_text_and_respect_the_size(pages):
+    splitter = FastTextSplitter(chunk_size=300, chunk_overlap=60)
+    chunks = splitter.split_documents(pages)
+    by_page = {doc.metadata["page"]: doc.page_content for doc in pages}
+    for chunk in chunks:
+        start = chunk.metadata["start_index"]
+        assert by_page[chunk.metadata["page"]][start:start + len(chunk.page_content)] == chunk.page_content
+        assert 0 < len(chunk.page_content) <= 300
+        assert chunk.page_content == chunk.page_content.strip()
+
+
+def test_every_word_is_covered_and_neighbours_overlap(pages):
+    splitter = FastTextSplitter(chunk_size=300, chunk_overlap=60)
+    for doc, spans in zip(pages, splitter.split_spans([d.page_content for d in pages])):
+        covered = set()
+        for start, end in spans:
+            covered.update(range(start, end))
+        assert all(i in covered for i, ch in enumerate(doc.page_content) if not ch.isspace())
+        assert any(b_start < a_end for (_, a_end), (b_start, _) in zip(spans, spans[1:]))
+
+
+def test_batch_split_matches_page_by_page(pages):
+    splitter = FastTextSplitter(chunk_size=250, chunk_overlap=40)
+    batched = splitter.split_spans([d.page_content for d in pages])
+    assert batched == [splitter.split_spans([d.page_content])[0] for d in pages]
+
+
+def test_unbroken_text_and_blank_pages():
+    splitter = FastTextSplitter(chunk_size=100, chunk_overlap=10)
+    assert [len(t) for t in splitter.split_text("x" * 250)] == [100, 100, 50]  # no mid-word overlap
+    assert splitter.split_spans(["", "   \n\n  ", "word"]) == [[], [], [(0, 4)]]
+    with pytest.raises(ValueError):
+        FastTextSplitter(chunk_size=100, chunk_overlap=100)
@@ -0,0 +1,40 @@
+# tests/test_filters.py
+import pytest
+from langchain.schema import Document
+
+import src.local_index as local_index
+from src.filters import build_filter
+from src.ingest import backfill_ingested_ts, upsert_batch
+from src.pinecone_vectorstore import get_vectorstore
+
+
+def sources(namespace: str, filter: dict) -> set:
+    docs = get_vectorstore(namespace).similarity_search("support policy", k=50, filter=filter)
+    return {doc.metadata["source"] for doc in docs}
+
+
+def test_source_and_doc_id_filters(indexed_namespace):
+    assert sources(indexed_namespace, build_filter(source="refund.pdf")) == {"refund.pdf"}
+    assert sources(indexed_namespace, build_filter(doc_id=["invoice", "delivery"])) == {"invoice.pdf", "delivery.pdf"}
+    assert sources(indexed_namespace, build_filter(ingested_before="2000-01-01")) == set()
+
+
+@pytest.mark.parametrize("brute_force_limit", [0, 50000], ids=["ann-post-filter", "metadata-prefilter"])
+def test_backfill_makes_legacy_chunks_date_filterable(monkeypatch, indexed_namespace, brute_force_limit):
+    monkeypatch.setattr(local_index, "FILTER_BRUTE_FORCE_LIMIT", brute_force_limit)
+    legacy = [
+        Document(page_content="The legacy policy: support answers within a week.",
+                 metadata={"source": "legacy.pdf", "doc_id": "legacy", "ingested_at": "2023-05-01T12:00:00"}),
+        Document(page_content="The undated policy: support answers within a month.",
+                 metadata={"source": "undated.pdf", "doc_id": "undated"}),
+    ]
+    upsert_batch(legacy, ["legacy:0", "undated:0"], indexed_namespace)
+    since_2023 = build_filter(ingested_after="2023-01-01")
+    if brute_force_limit == 0:
+        assert "legacy.pdf" not in sources(indexed_namespace, since_2023)
+
+    assert backfill_ingested_ts(indexed_namespace) == {"chunks": 20, "updated": 1, "undated": 1}
+    found = sources(indexed_namespace, since_2023)
+    assert "legacy.pdf" in found and "undated.pdf" not in found
+    assert "legacy.pdf" not in sources(indexed_namespace, build_filter(ingested_after="2024-01-01"))
+    assert backfill_ingested_ts(indexed_namespace)["updated"] == 0
@@ -0,0 +1,66 @@
+# tests/test_ingest.py
+from langchain.schema import Document
+
+from src import ingest
+from src.pinecone_vectorstore import get_vectorstore
+
+SHARED = "Refunds are issued to the original payment method within five business days of approval."
+
+
+def stored_docs(namespace: str):
+    return list(get_vectorstore(namespace).docstore._dict.values())
+
+
+def test_failed_file_does_not_suppress_duplicates_in_later_files(tmp_path, monkeypatch, namespace):
+    (tmp_path / "a.pdf").write_bytes(b"first")
+    (tmp_path / "b.pdf").write_bytes(b"second")
+    monkeypatch.setattr(ingest, "split_pdf", lambda path, filename: (
+        [Document(page_content=SHARED, metadata={"source": filename, "page": 0})], None
+    ))
+    upsert = ingest.upsert_batch
+
+    def failing_upsert(chunks, ids, namespace=None):
+        if chunks[0].metadata["source"] == "a.pdf":
+            raise ConnectionError("upsert failed")
+        return upsert(chunks, ids, namespace)
+
+    monkeypatch.setattr(ingest, "upsert_batch", failing_upsert)
+    result = ingest.ingest_folder(str(tmp_path), namespace=namespace)
+
+    assert result["indexed"] == 1
+    assert result["duplicates_removed"] == 0
+    assert [d.metadata["source"] for d in stored_docs(namespace)] == ["b.pdf"]
+
+
+def test_failed_file_is_logged(tmp_path, monkeypatch, caplog, namespace):
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+
+    def broken_split(path, filename):
+        raise ValueError("EOF marker not found")
+
+    monkeypatch.setattr(ingest, "split_pdf", broken_split)
+    with caplog.at_level("WARNING", logger="src.ingest"):
+        result = ingest.ingest_folder(str(tmp_path), namespace=namespace)
+
+    assert result["indexed"] == 0
+    assert "broken.pdf" in caplog.text and "EOF marker not found" in caplog.text
+
+
+def test_uploads_are_deduplicated_against_the_indexed_corpus(monkeypatch, namespace):
+    pages = {"a.pdf": [SHARED, "Warranty claims need the serial number printed on the device label."],
+             "b.pdf": [SHARED, "Deliveries to remote areas take up to ten business days to arrive."]}
+    monkeypatch.setattr(ingest, "split_pdf", lambda path, filename: (
+        [Document(page_content=text, metadata={"source": filename, "page": i})
+         for i, text in enumerate(pages[filename])], None
+    ))
+
+    first = ingest.ingest_pdf_bytes(b"a", "a.pdf", namespace=namespace)
+    # A new process (or an unloaded tenant) rebuilds the signatures from the index
+    ingest.drop_deduplicator(namespace)
+    second = ingest.ingest_pdf_bytes(b"b", "b.pdf", namespace=namespace)
+    again = ingest.ingest_pdf_bytes(b"a", "a.pdf", namespace=namespace)
+
+    assert (first["chunks"], second["chunks"], second["duplicates_removed"]) == (2, 1, 1)
+    assert (again["chunks"], again["duplicates_removed"]) == (2, 0)
+    canonical = [d for d in stored_docs(namespace) if d.page_content == SHARED]
+    assert len(canonical) == 1 and canonical[0].metadata["alt_sources"] == ["b.pdf#page=0"]
@@ -0,0 +1,50 @@
+# tests/test_loadgen.py
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import main
+from benchmarks import loadgen
+
+
+def load_args(**overrides):
+    args = dict(url="http://test", conversations=4, duration=0, rate=0, concurrency=2, min_turns=2, max_turns=3,
+                think_time=0, enhanced_ratio=0.5, query_enhancements_ratio=0.5, timeout=30, seed=3)
+    return SimpleNamespace(**{**args, **overrides})
+
+
+def test_recorder_reports_percentiles_and_error_rates():
+    recorder = loadgen.Recorder()
+    for i in range(1, 101):
+        recorder.add("/query", i / 1000, "timeout" if i % 10 == 0 else None)
+    report = recorder.report()["endpoints"]["/query"]
+    assert (report["requests"], report["p50_ms"], report["p99_ms"], report["max_ms"]) == (100, 51.0, 99.0, 100.0)
+    assert report["error_rate"] == 0.1 and report["errors"] == {"timeout": 10}
+
+
+def test_conversations_replay_against_the_app_within_the_concurrency_limit(monkeypatch):
+    in_flight = {"now": 0, "max": 0}
+
+    class InProcessClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            kwargs.pop("limits", None)
+            super().__init__(transport=httpx.ASGITransport(app=main.app), **kwargs)
+
+        async def post(self, *args, **kwargs):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            try:
+                return await super().post(*args, **kwargs)
+            finally:
+                in_flight["now"] -= 1
+
+    monkeypatch.setattr(loadgen.httpx, "AsyncClient", InProcessClient)
+    args = load_args()
+    report = asyncio.run(loadgen.run(args))
+
+    assert report["conversations"] == 4
+    assert 4 * args.min_turns <= report["requests"] <= 4 * args.max_turns
+    assert set(report["endpoints"]) <= {"/query", "/query/enhanced"}
+    assert all(stats["error_rate"] == 0 for stats in report["endpoints"].values())
+    assert 1 <= in_flight["max"] <= args.concurrency
@@ -0,0 +1,73 @@
+# tests/test_local_index.py
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+
+from src.local_index import LocalFAISS, index_size, quantize_local_index
+from src.pinecone_vectorstore import get_embedding
+
+DIM = 64
+
+
+@pytest.fixture
+def saved_store(tmp_path):
+    """2000 clustered random vectors saved as an exact local index."""
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(20, DIM))
+    vectors = (centers[rng.integers(0, 20, 2000)] + 0.3 * rng.normal(size=(2000, DIM))).astype(np.float32)
+    store = LocalFAISS(embedding_function=get_embedding(), index=faiss.IndexFlatL2(DIM),
+                       docstore=InMemoryDocstore(), index_to_docstore_id={})
+    store.add_embeddings([(f"chunk {i}", v.tolist()) for i, v in enumerate(vectors)],
+                         metadatas=[{"source": f"s{i % 7}.pdf"} for i in range(2000)], ids=[str(i) for i in range(2000)])
+    store.save_local(str(tmp_path))
+    return tmp_path, vectors
+
+
+def load(folder, rerank_factor):
+    store = LocalFAISS.load_local(str(folder), get_embedding(), allow_dangerous_deserialization=True,
+                                  rerank_factor=rerank_factor)
+    store.attach_raw_vectors(str(folder))
+    return store
+
+
+def exact_top(vectors, query, k):
+    return [str(i) for i in np.argsort(((vectors - query) ** 2).sum(axis=1))[:k]]
+
+
+def test_pq_with_rerank_matches_exact_search(saved_store):
+    folder, vectors = saved_store
+    flat_bytes = index_size(load(folder, 1).index)
+    result = quantize_local_index(str(folder), "pq", pq_m=8)
+    assert result["vectors"] == 2000 and result["index_bytes"] < flat_bytes / 4
+
+    reranked, plain = load(folder, 8), load(folder, 1)
+    assert reranked.reranking and not plain.reranking
+    rng = np.random.default_rng(5)
+    recall_reranked = recall_plain = 0
+    for query in vectors[rng.choice(2000, 20, replace=False)] + 0.05:
+        truth = set(exact_top(vectors, query, 5))
+        hits = reranked.similarity_search_with_score_by_vector(query.tolist(), k=5)
+        recall_reranked += len(truth & {doc.id for doc, _ in hits})
+        recall_plain += len(truth & {doc.id for doc, _ in plain.similarity_search_with_score_by_vector(query.tolist(), k=5)})
+        # Reranked scores are exact distances against the stored full vectors
+        best = hits[0][0].id
+        assert hits[0][1] == pytest.approx(float(((vectors[int(best)] - query) ** 2).sum()), rel=1e-2)
+    assert recall_reranked >= 90 and recall_reranked > recall_plain + 20
+
+
+def test_filtered_search_on_a_quantized_index(saved_store):
+    folder, vectors = saved_store
+    quantize_local_index(str(folder), "sq8")
+    store = load(folder, 4)
+    hits = store.similarity_search_by_vector(vectors[0].tolist(), k=5, filter={"source": "s3.pdf"})
+    assert len(hits) == 5 and {doc.metadata["source"] for doc in hits} == {"s3.pdf"}
+
+
+def test_back_to_exact_removes_the_raw_vectors(saved_store):
+    folder, _ = saved_store
+    quantize_local_index(str(folder), "sq8")
+    assert (folder / "raw_vectors.bin").exists()
+    quantize_local_index(str(folder), "none")
+    assert not (folder / "raw_vectors.bin").exists()
+    assert isinstance(load(folder, 4).index, faiss.IndexFlatL2)
@@ -0,0 +1,26 @@
+# tests/test_metrics.py
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.metrics import LLM_CALL_SECONDS, llm_stage_stats
+from src.models import get_stage_llm
+from src.prompt_cache import get_prompt_cache_tracker
+
+
+def test_model_calls_are_counted_once_and_shared_by_both_views():
+    tracker = get_prompt_cache_tracker()
+    before = tracker.snapshot()
+    calls_before = sum(sum(counts) for counts, _ in LLM_CALL_SECONDS.snapshot().values())
+
+    chain = (ChatPromptTemplate.from_template("{question}") | get_stage_llm("followups")).with_config(
+        metadata={"prompt": "TEST_PROMPT"})
+    for _ in range(3):
+        chain.invoke({"question": "What is the refund window?"})
+
+    after = tracker.snapshot()
+    assert sum(sum(counts) for counts, _ in LLM_CALL_SECONDS.snapshot().values()) - calls_before == 3
+    assert after["prompts"]["TEST_PROMPT"]["calls"] == 3
+    assert after["stages"] == llm_stage_stats()
+    followups = sum(m["calls"] for m in after["stages"]["followups"].values())
+    assert followups - sum(m["calls"] for m in before["stages"].get("followups", {}).values()) == 3
+    assert after["prompts"]["TEST_PROMPT"]["input_tokens"] > 0
+    assert after["recent_calls"][-1]["prompt"] == "TEST_PROMPT"
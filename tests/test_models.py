@@ -0,0 +1,45 @@
+# tests/test_models.py
+import pytest
+
+from src import models
+from src.metrics import llm_stage_stats
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Real routing (STUB_MODELS off) with fresh stage clients, restored afterwards."""
+    monkeypatch.setattr(models, "STUB_MODELS", False)
+    monkeypatch.setattr(models, "CHAT_MODEL", "gpt-4o")
+    monkeypatch.setattr(models, "AUX_CHAT_MODEL", "gpt-4o-mini")
+    monkeypatch.setattr(models, "FALLBACK_CHAT_MODEL", "gpt-4o-mini")
+    monkeypatch.setattr(models, "MODEL_ROUTES", {})
+    monkeypatch.setattr(models, "_models", {})
+    return monkeypatch
+
+
+def test_final_stages_use_the_chat_model_and_the_rest_the_aux_model(routed):
+    routed.setattr(models, "MODEL_ROUTES", {"summary": "local:llama3"})
+    assert models.stage_model("answer") == models.stage_model("response") == "gpt-4o"
+    assert models.stage_model("followups") == "gpt-4o-mini"
+    assert models.stage_model("summary") == "local:llama3"
+    with pytest.raises(ValueError, match="Unknown pipeline stage"):
+        models.stage_model("poetry")
+
+    table = models.routes()
+    assert table["answer"]["fallback"] == "gpt-4o-mini" and table["followups"]["fallback"] is None
+
+
+def test_a_failing_route_falls_back_and_is_recorded_per_stage(routed):
+    # Nothing listens on port 9, so the local route fails with a connection error
+    routed.setattr(models, "LOCAL_LLM_BASE_URL", "http://127.0.0.1:9/v1")
+    routed.setattr(models, "MODEL_ROUTES", {"faq": "local:llama3"})
+    routed.setattr(models, "FALLBACK_CHAT_MODEL", "fake:0")
+    routed.setattr(models, "STAGE_MAX_RETRIES", 0)
+
+    answer = models.get_stage_llm("faq").invoke("Write one FAQ about refunds")
+    assert answer.content
+    assert models.get_stage_llm("faq") is models.get_stage_llm("faq")
+
+    stats = llm_stage_stats()["faq"]
+    assert stats["llama3"]["errors"] >= 1
+    assert stats["fake"]["calls"] >= 1
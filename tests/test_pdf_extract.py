@@ -0,0 +1,48 @@
+# tests/test_pdf_extract.py
+import src.pdf_extract as pdf_extract
+from src.pdf_extract import extraction_pool, iter_pdf_page_batches, load_pdf
+
+
+def write_pdf(path, pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                   b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)), count),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(pages):
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text.encode()
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def test_parallel_extraction_keeps_page_order_and_the_pool_is_shut_down(tmp_path):
+    path = tmp_path / "manual.pdf"
+    write_pdf(path, [f"Page {i} of the manual" for i in range(5)])
+
+    with extraction_pool(2) as pool:
+        assert pool._mp_context.get_start_method() == "spawn"
+        batches = list(iter_pdf_page_batches(str(path), "manual.pdf", backend="pypdf", workers=2, pages_per_task=2))
+    assert pdf_extract._pool is None
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    pages = [doc for batch in batches for doc in batch]
+    assert [doc.metadata["page"] for doc in pages] == list(range(5))
+    assert [doc.page_content.strip() for doc in pages] == [f"Page {i} of the manual" for i in range(5)]
+    assert pages[0].metadata == {"source": "manual.pdf", "page": 0, "total_pages": 5}
+
+
+def test_serial_extraction_matches(tmp_path):
+    path = tmp_path / "manual.pdf"
+    write_pdf(path, ["Only page"])
+    assert [doc.page_content.strip() for doc in load_pdf(str(path), backend="pypdf", workers=1)] == ["Only page"]
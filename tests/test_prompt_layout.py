@@ -0,0 +1,66 @@
+# tests/test_prompt_layout.py
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from src import prompt
+from src.metrics import call_usage
+from src.prompt_registry import get_prompt_registry
+
+TEMPLATES = {name: get_prompt_registry().template(name) for name in prompt.__all__
+             if isinstance(getattr(prompt, name), ChatPromptTemplate)}
+# The user's question changes on every call, so it follows the documents and history
+QUESTION = {"input", "query"}
+DOCUMENTS = {"context", "documents", "summaries", "content", "base_response"}
+HISTORY = {"chat_history", "history_context"}
+
+
+def render(template, marker="<{}>"):
+    """Rendered text of every message, with each variable replaced by a marker naming it."""
+    values = {name: [HumanMessage(marker.format(name))] if name == "chat_history" else marker.format(name)
+              for name in template.input_variables}
+    return "\n".join(m.content for m in template.format_messages(**values))
+
+
+@pytest.mark.parametrize("name", sorted(TEMPLATES))
+def test_static_instructions_come_first(name):
+    template = TEMPLATES[name]
+    first = template.messages[0]
+    assert first.__class__.__name__ == "SystemMessagePromptTemplate"
+    assert first.input_variables == []
+
+
+@pytest.mark.parametrize("name", sorted(TEMPLATES))
+def test_question_comes_after_documents_and_history(name):
+    template = TEMPLATES[name]
+    text = render(template)
+    positions = {v: text.index(f"<{v}>") for v in template.input_variables}
+    questions = [positions[v] for v in QUESTION & positions.keys()]
+    history = [positions[v] for v in HISTORY & positions.keys()]
+    documents = [positions[v] for v in DOCUMENTS & positions.keys()]
+    if questions:
+        assert max(documents + history, default=-1) < min(questions)
+    if history and documents and name != "QUERY_CONTEXT_PROMPT":
+        assert max(documents) < min(history)
+
+
+def test_response_variant_shares_its_prefix_across_queries():
+    template = get_prompt_registry().response_template("inquiry", "concise")
+    a = template.format_messages(context="refunds take 5 days", history_context="", intent="inquiry",
+                                 query="How long do refunds take?")
+    b = template.format_messages(context="passwords reset by email", history_context="hi", intent="inquiry",
+                                 query="How do I reset my password?")
+    assert [m.content for m in a[:2]] == [m.content for m in b[:2]]
+
+
+def test_cached_tokens_are_read_from_either_usage_format():
+    message = AIMessage("ok", usage_metadata={"input_tokens": 1500, "output_tokens": 20, "total_tokens": 1520,
+                                              "input_token_details": {"cache_read": 1024}})
+    response = SimpleNamespace(generations=[[SimpleNamespace(message=message)]], llm_output=None)
+    assert call_usage(response) == {"input_tokens": 1500, "cached_tokens": 1024, "output_tokens": 20}
+
+    raw = SimpleNamespace(generations=[[SimpleNamespace(message=AIMessage("ok"))]], llm_output={"token_usage": {
+        "prompt_tokens": 1300, "completion_tokens": 9, "prompt_tokens_details": {"cached_tokens": 1280}}})
+    assert call_usage(raw) == {"input_tokens": 1300, "cached_tokens": 1280, "output_tokens": 9}
@@ -0,0 +1,30 @@
+# tests/test_prompts.py
+from pathlib import Path
+
+from src import prompt
+from src.prompt_registry import get_prompt_registry
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def test_every_template_is_used_somewhere():
+    code = "\n".join(path.read_text(encoding="utf-8") for path in SRC.glob("*.py") if path.name != "prompt.py")
+    templates = [name for name in prompt.__all__ if hasattr(getattr(prompt, name), "format_messages")]
+    assert [name for name in templates if name not in code] == []
+
+
+def test_response_variants_are_built_once():
+    registry = get_prompt_registry()
+    template = registry.response_template("complaint", "concise")
+    assert registry.response_template("complaint", "concise") is template
+    assert registry.response_template("unknown", "shouty") is registry.response_template("general", "professional")
+    messages = template.format_messages(context="", history_context="", intent="complaint", query="q")
+    assert prompt.INTENT_GUIDANCE["complaint"] in messages[1].content
+    assert prompt.RESPONSE_STYLES["concise"] in messages[1].content
+
+
+def test_templates_are_only_defined_in_the_prompt_module():
+    inline = [path.name for path in SRC.glob("*.py") if path.name != "prompt.py"
+              and ("ChatPromptTemplate.from_" in path.read_text(encoding="utf-8")
+                   or "PromptTemplate(" in path.read_text(encoding="utf-8"))]
+    assert inline == []
@@ -0,0 +1,108 @@
+# tests/test_retry.py
+import pytest
+
+from src.admission import Overloaded
+from src.enhanced_llm import EnhancedRAGChain, get_enhanced_rag_chain
+from src.retry import DeadlineExceeded, LatencyBudget, RequestCancelled, StageFailed, StageRunner, _observe
+
+
+def flaky(failures, error=ConnectionError("connection reset"), result="ok"):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return result
+
+    return func, calls
+
+
+def runner(seconds=10.0, attempts=3):
+    return StageRunner(LatencyBudget(seconds), attempts=attempts, base_delay=0.001)
+
+
+def test_transient_errors_are_retried():
+    func, calls = flaky(2)
+    stages = runner()
+    assert stages.run("answer", func) == "ok"
+    assert len(calls) == 3
+    assert stages.report()["retries"] == {"answer": 2}
+
+
+def test_permanent_errors_are_not_retried():
+    func, calls = flaky(1, error=ValueError("bad prompt"))
+    with pytest.raises(StageFailed):
+        runner().run("answer", func)
+    assert len(calls) == 1
+
+
+def test_overload_is_raised_without_retry():
+    func, calls = flaky(1, error=Overloaded("queue full", retry_after=1))
+    with pytest.raises(Overloaded):
+        runner().run("answer", func)
+    assert len(calls) == 1
+
+
+def test_failed_optional_stage_returns_default():
+    func, _ = flaky(5)
+    stages = runner()
+    assert stages.run("followups", func, optional=True, default=[]) == []
+    assert stages.report()["partial"]
+    assert "followups" in stages.report()["failed_stages"]
+
+
+def test_optional_stage_that_does_not_fit_is_skipped():
+    _observe("slow_summary", 5.0)
+    func, calls = flaky(0)
+    stages = runner(seconds=1.0)
+    assert stages.run("slow_summary", func, optional=True, default="skipped") == "skipped"
+    assert not calls
+    assert stages.report()["stages_skipped"] == ["slow_summary"]
+
+
+def test_required_stage_after_deadline_raises():
+    func, _ = flaky(0)
+    with pytest.raises(DeadlineExceeded):
+        runner(seconds=0).run("retrieve", func)
+
+
+def test_cancelled_budget_stops_before_the_next_stage():
+    stages = runner()
+    stages.budget.cancel()
+    with pytest.raises(RequestCancelled):
+        stages.run("retrieve", flaky(0)[0])
+
+
+def test_failed_answer_does_not_repeat_retrieval(indexed_namespace, monkeypatch):
+    retrievals = []
+    answers = []
+    retrieve, answer = EnhancedRAGChain._retrieve, EnhancedRAGChain._answer
+
+    def counting_retrieve(*args):
+        retrievals.append(1)
+        return retrieve(*args)
+
+    def failing_answer(*args):
+        answers.append(1)
+        if len(answers) == 1:
+            raise TimeoutError("answer timed out")
+        return answer(*args)
+
+    monkeypatch.setattr(EnhancedRAGChain, "_retrieve", staticmethod(counting_retrieve))
+    monkeypatch.setattr(EnhancedRAGChain, "_answer", staticmethod(failing_answer))
+    result = get_enhanced_rag_chain().enhanced_invoke(
+        "How long does a refund take?", "s1", namespace=indexed_namespace,
+        use_summarization=False, budget=LatencyBudget(30)
+    )
+
+    assert result["original_answer"]
+    assert result["context"]
+    assert (len(retrievals), len(answers)) == (1, 2)
+    assert result["metadata"]["retries"] == {"answer": 1}
+
+
+def test_openai_clients_cap_sdk_retries(monkeypatch):
+    from src import models
+    monkeypatch.setattr(models.config, "OPENAI_API_KEY", "sk-test")
+    assert models._chat_model("gpt-4o-mini", 0.0).max_retries == models.STAGE_MAX_RETRIES
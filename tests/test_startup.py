@@ -0,0 +1,70 @@
+# tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_needs_no_keys_and_builds_no_clients():
+    env = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "PINECONE_API_KEY")}
+    env.update({"STUB_MODELS": "false", "VECTOR_BACKEND": "pinecone"})
+    probe = (
+        "import json, sys, main, src.llm, src.prompt\n"
+        "print(json.dumps({'clients': sorted(m for m in ('langchain_openai', 'langchain_pinecone') if m in sys.modules),"
+        " 'shared': src.llm._shared is not None, 'prompts': sorted(src.prompt._prompts)}))"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == {"clients": [], "shared": False, "prompts": []}
+
+
+def test_validate_config_reports_missing_credentials(monkeypatch):
+    from src import config
+
+    monkeypatch.setattr(config, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(config, "STUB_MODELS", False)
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        config.validate_config()
+
+
+def test_warm_up_builds_each_step_and_times_it(namespace):
+    from src.startup import warm_up
+    from src.tenants import get_tenant_pool
+
+    timings = warm_up([None, namespace])
+    assert list(timings) == ["config", "tokenizers", "prompts", "enhanced_chain",
+                             "retrieval_chain:default", f"retrieval_chain:{namespace}"]
+    assert all(seconds >= 0 for seconds in timings.values())
+    assert namespace in get_tenant_pool().snapshot()["namespaces"]
+
+
+def test_dotenv_is_read_by_load_env_not_at_import(tmp_path, monkeypatch, caplog):
+    import importlib
+    import dotenv
+    from src import config, startup
+
+    env_file = tmp_path / ".env"
+    env_file.write_text("CHAT_MODEL=gpt-from-dotenv\nOPENAI_API_KEY=sk-dotenv\n", encoding="utf-8")
+    monkeypatch.setattr(dotenv, "find_dotenv", lambda *args, **kwargs: str(env_file))
+    for name in ("CHAT_MODEL", "OPENAI_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    try:
+        importlib.reload(config)
+        assert config.CHAT_MODEL != "gpt-from-dotenv" and not config.OPENAI_API_KEY
+
+        with caplog.at_level("WARNING", logger="src.startup"):
+            changed = startup.load_env()
+        assert {"CHAT_MODEL", "FALLBACK_CHAT_MODEL", "OPENAI_API_KEY"} <= set(changed)
+        assert (config.CHAT_MODEL, config.OPENAI_API_KEY) == ("gpt-from-dotenv", "sk-dotenv")
+        # the key is read when clients are built; the model name was already copied at import
+        assert "CHAT_MODEL" in caplog.text and "OPENAI_API_KEY" not in caplog.text
+        assert startup.load_env() == []
+    finally:
+        for name in ("CHAT_MODEL", "OPENAI_API_KEY"):
+            os.environ.pop(name, None)
+        monkeypatch.undo()
+        importlib.reload(config)
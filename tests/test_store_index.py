@@ -0,0 +1,147 @@
+# tests/test_store_index.py
+import json
+
+from langchain.schema import Document
+
+import store_index
+
+
+def fake_split(texts_by_file):
+    def split(path, filename):
+        if texts_by_file[filename] is None:
+            raise ValueError("file has not been decrypted")
+        return [
+            Document(page_content=text, metadata={"source": filename, "page": i})
+            for i, text in enumerate(texts_by_file[filename])
+        ], None
+    return split
+
+
+def texts(name: str, n: int):
+    return [f"{name} section {i} explains warranty claim number {i} for device model {i * 7}." for i in range(n)]
+
+
+def run(tmp_path, namespace, batch_size=2):
+    return store_index.run(str(tmp_path / "docs"), batch_size, 2, str(tmp_path / "checkpoint.json"), False, namespace)
+
+
+def write_pdfs(tmp_path, *names):
+    (tmp_path / "docs").mkdir(exist_ok=True)
+    for name in names:
+        (tmp_path / "docs" / name).write_bytes(name.encode())
+
+
+def test_unreadable_file_is_recorded_and_the_run_continues(tmp_path, monkeypatch, namespace):
+    write_pdfs(tmp_path, "bad.pdf", "good.pdf")
+    monkeypatch.setattr(store_index, "split_pdf", fake_split({"bad.pdf": None, "good.pdf": texts("good", 3)}))
+
+    stats = run(tmp_path, namespace)
+
+    assert stats["failed_files"] == 1
+    assert stats["chunks"] == 3
+    docs = json.loads((tmp_path / "checkpoint.json").read_text())["docs"]
+    by_file = {entry["file"]: entry for entry in docs.values()}
+    assert "decrypted" in by_file["bad.pdf"]["error"]
+    assert by_file["good.pdf"]["complete"]
+
+
+def test_document_without_chunks_is_marked_complete(tmp_path, monkeypatch, namespace):
+    write_pdfs(tmp_path, "empty.pdf")
+    monkeypatch.setattr(store_index, "split_pdf", fake_split({"empty.pdf": []}))
+
+    run(tmp_path, namespace)
+    stats = run(tmp_path, namespace)
+
+    assert stats["files"] == 0
+    assert stats["files_skipped"] == 1
+
+
+def test_resumed_run_only_repeats_failed_batches(tmp_path, monkeypatch, namespace):
+    write_pdfs(tmp_path, "manual.pdf")
+    monkeypatch.setattr(store_index, "split_pdf", fake_split({"manual.pdf": texts("manual", 6)}))
+    upsert = store_index.upsert_batch
+    calls = []
+
+    def flaky_upsert(chunks, ids, namespace=None):
+        calls.append(ids[0])
+        if ids[0].endswith(":2") and len(calls) <= 3:
+            raise ConnectionError("upsert timed out")
+        return upsert(chunks, ids, namespace)
+
+    monkeypatch.setattr(store_index, "upsert_batch", flaky_upsert)
+    first = run(tmp_path, namespace)
+    second = run(tmp_path, namespace)
+
+    assert (first["batches"], first["failed_batches"]) == (2, 1)
+    assert (second["batches"], second["batches_skipped"]) == (1, 2)
+    assert calls[3:] == [first_id for first_id in calls[:3] if first_id.endswith(":2")]
+
+
+def test_summaries_run_after_indexing_and_failed_ones_are_retried(tmp_path, monkeypatch, namespace):
+    from src import ingest
+    from src.pinecone_vectorstore import get_vectorstore
+
+    write_pdfs(tmp_path, "manual.pdf")
+    monkeypatch.setattr(store_index, "split_pdf", fake_split({"manual.pdf": texts("manual", 5)}))
+    monkeypatch.setattr(store_index, "INGEST_SUMMARIES", True)
+    attach = ingest.attach_summaries
+    calls = []
+
+    def flaky_summaries(chunks, filename):
+        calls.append(len(chunks))
+        if len(calls) == 1:
+            raise ConnectionError("model unavailable")
+        return attach(chunks, filename)
+
+    monkeypatch.setattr(ingest, "attach_summaries", flaky_summaries)
+    first = run(tmp_path, namespace)
+    second = run(tmp_path, namespace)
+    third = run(tmp_path, namespace)
+
+    assert (first["batches"], first["failed_summaries"]) == (3, 1)
+    assert (second["batches"], second["batches_skipped"], second["documents_summarized"]) == (0, 3, 1)
+    assert calls == [5, 5] and third["files_skipped"] == 1
+    stored = get_vectorstore(namespace).docstore._dict.values()
+    assert all(d.metadata["chunk_summary"] and d.metadata["doc_summary"] for d in stored)
+
+
+def test_interrupted_run_ends_with_the_same_alt_sources_as_a_clean_one(tmp_path, monkeypatch, namespace):
+    from src.ingest import drop_deduplicator
+    from src.pinecone_vectorstore import get_vectorstore, reload_vectorstore
+
+    shared = texts("shared", 1)
+    files = {"a.pdf": shared + texts("a", 2), "b.pdf": shared + texts("b", 2)}
+    write_pdfs(tmp_path, *files)
+    monkeypatch.setattr(store_index, "split_pdf", fake_split(files))
+
+    def alt_sources(ns):
+        return sorted((d.metadata["source"], d.metadata.get("alt_sources")) for d in
+                      get_vectorstore(ns).docstore._dict.values() if d.page_content == shared[0])
+
+    clean = f"{namespace}c"
+    store_index.run(str(tmp_path / "docs"), 2, 2, str(tmp_path / "clean.json"), False, clean)
+
+    merge = store_index.merge_alt_sources
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(store_index, "merge_alt_sources", interrupted)
+    try:
+        run(tmp_path, namespace)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(store_index, "merge_alt_sources", merge)
+    pending = json.loads((tmp_path / "checkpoint.json").read_text())["docs"]
+    assert "b.pdf" in [e["file"] for e in pending.values() if e["alt_sources"] and not e["alt_sources_synced"]]
+
+    # The next run is a new process: the index and the deduplicator come from disk
+    for ns in (namespace, clean):
+        reload_vectorstore(ns)
+        drop_deduplicator(ns)
+    resumed = run(tmp_path, namespace)
+    reload_vectorstore(namespace)
+
+    assert resumed["files_skipped"] == 2
+    assert alt_sources(namespace) == alt_sources(clean)
+    assert "b.pdf#page=0" in alt_sources(namespace)[0][1]
@@ -0,0 +1,103 @@
+# tests/test_summaries.py
+from langchain.schema import Document
+
+from src.generative_ai import GenerativeAIEnhancer
+from src.ingest import attach_summaries
+
+
+def chunks():
+    return [
+        Document(page_content=f"Section {i}: refunds take five business days.", metadata={"source": "policy.pdf"})
+        for i in range(3)
+    ]
+
+
+def test_attach_summaries_stores_chunk_and_document_summaries():
+    docs = chunks()
+    doc_summary = attach_summaries(docs, "policy.pdf")
+
+    assert doc_summary
+    for doc in docs:
+        assert doc.metadata["chunk_summary"]
+        assert doc.metadata["doc_summary"] == doc_summary
+
+
+def test_query_time_summary_is_assembled_without_a_model_call(monkeypatch):
+    docs = chunks()
+    attach_summaries(docs, "policy.pdf")
+    enhancer = GenerativeAIEnhancer()
+
+    def no_model(*args, **kwargs):
+        raise AssertionError("summary should be assembled from metadata")
+
+    monkeypatch.setattr(enhancer.prompts, "chain", no_model)
+    summary = enhancer.summarize_documents(docs, "refunds", raise_errors=True)
+    assert docs[0].metadata["doc_summary"] in summary
+    assert docs[0].metadata["chunk_summary"] in summary
+
+
+def test_legacy_chunks_do_not_send_the_query_to_the_model(monkeypatch):
+    summarized = chunks()
+    attach_summaries(summarized, "policy.pdf")
+    legacy = Document(page_content="Older text indexed before summaries existed.", metadata={"source": "old.pdf"})
+    enhancer = GenerativeAIEnhancer()
+    calls = []
+    chain = enhancer.prompts.chain
+
+    def record(name, llm):
+        calls.append(name)
+        return chain(name, llm)
+
+    monkeypatch.setattr(enhancer.prompts, "chain", record)
+    summary = enhancer.summarize_documents([legacy] + summarized, "refunds", raise_errors=True)
+    assert calls == [] and summarized[0].metadata["chunk_summary"] in summary
+
+    enhancer.summarize_documents([legacy], "refunds", raise_errors=True)
+    assert calls == ["QUERY_SUMMARY_PROMPT"]
+
+
+def test_ingest_returns_before_summaries_are_written_back(monkeypatch, namespace):
+    import threading
+
+    from src import ingest
+    from src.context import pack_context
+    from src.pinecone_vectorstore import get_vectorstore
+
+    children = [
+        Document(page_content=f"Refund rule {i}: refunds take {i + 2} business days after approval.",
+                 metadata={"source": "policy.pdf", "page": 0, "parent_index": i // 2})
+        for i in range(4)
+    ]
+    parents = [Document(page_content=" ".join(c.page_content for c in children[p * 2:p * 2 + 2]),
+                        metadata={"source": "policy.pdf", "page": 0, "parent_index": p}) for p in range(2)]
+    monkeypatch.setattr(ingest, "split_pdf", lambda path, filename: (children, parents))
+    monkeypatch.setattr(ingest, "INGEST_SUMMARIES", True)
+    release = threading.Event()
+    summarize_chunks = ingest._get_summarizer().summarize_chunks
+
+    def slow_summaries(batch):
+        release.wait(timeout=5)
+        return summarize_chunks(batch)
+
+    monkeypatch.setattr(ingest._get_summarizer(), "summarize_chunks", slow_summaries)
+
+    result = ingest.ingest_pdf_bytes(b"policy", "policy.pdf", namespace=namespace)
+    stored = list(get_vectorstore(namespace).docstore._dict.values())
+    assert result["summaries"] == "queued" and not any("chunk_summary" in d.metadata for d in stored)
+
+    release.set()
+    ingest.shutdown_summaries()
+    stored = list(get_vectorstore(namespace).docstore._dict.values())
+    assert all(d.metadata["chunk_summary"] and d.metadata["doc_summary"] for d in stored)
+
+    # Both children of a section hit, so it is expanded; the section carries its own summaries
+    packed = pack_context(sorted(stored, key=lambda d: d.metadata["chunk_index"]), namespace=namespace)
+    assert [d.metadata["parent_id"] for d in packed] == [f"{result['doc_id']}:p0", f"{result['doc_id']}:p1"]
+    assert all(d.metadata["chunk_summary"] and d.metadata["doc_summary"] for d in packed)
+    enhancer = GenerativeAIEnhancer()
+
+    def no_model(*args, **kwargs):
+        raise AssertionError("expanded sections should carry their summaries")
+
+    monkeypatch.setattr(enhancer.prompts, "chain", no_model)
+    assert packed[0].metadata["doc_summary"] in enhancer.summarize_documents(packed, "refunds", raise_errors=True)
@@ -0,0 +1,62 @@
+# tests/test_tenants.py
+import pytest
+from langchain.schema import Document
+
+import src.pinecone_vectorstore as pinecone_vectorstore
+from src.config import NAMESPACE
+from src.context import pack_context
+from src.ingest import reset_document
+from src.parent_store import get_parent_store
+from src.pinecone_vectorstore import resolve_namespace
+
+
+def parents(text: str):
+    return [Document(page_content=text, metadata={"page": 0})]
+
+
+def test_tenants_keep_separate_parents_for_the_same_document(namespace):
+    other = namespace + "b"
+    reset_document("manual", "manual.pdf", parents("Tenant A's manual."), namespace)
+    reset_document("manual", "manual.pdf", parents("Tenant B's manual."), other)
+
+    store = get_parent_store()
+    assert store.get_parents(["manual:p0"], namespace)["manual:p0"].page_content == "Tenant A's manual."
+    assert store.get_parents(["manual:p0"], other)["manual:p0"].page_content == "Tenant B's manual."
+
+    reset_document("manual", "manual.pdf", None, namespace)
+    assert store.get_parents(["manual:p0"], namespace) == {}
+    assert store.get_parents(["manual:p0"], other)["manual:p0"].page_content == "Tenant B's manual."
+
+
+def test_context_expands_parents_from_its_own_namespace(namespace):
+    other = namespace + "b"
+    reset_document("guide", "guide.pdf", parents("Tenant A's full section."), namespace)
+    reset_document("guide", "guide.pdf", parents("Tenant B's full section."), other)
+    children = [
+        Document(page_content=f"child {i}", metadata={"source": "guide.pdf", "page": 0,
+                                                      "start_index": i * 100, "parent_id": "guide:p0"})
+        for i in range(3)
+    ]
+
+    packed = pack_context(children, namespace=other)
+    assert [doc.page_content for doc in packed] == ["Tenant B's full section."]
+
+
+def test_unknown_namespaces_are_rejected_without_an_allowlist(monkeypatch):
+    monkeypatch.setattr(pinecone_vectorstore, "TENANT_NAMESPACES", [])
+    assert resolve_namespace(None) == NAMESPACE
+    assert resolve_namespace(NAMESPACE) == NAMESPACE
+    with pytest.raises(ValueError, match="Unknown namespace"):
+        resolve_namespace("acme")
+
+
+def test_allowlist_and_wildcard(monkeypatch):
+    monkeypatch.setattr(pinecone_vectorstore, "TENANT_NAMESPACES", ["acme"])
+    assert resolve_namespace("acme") == "acme"
+    with pytest.raises(ValueError, match="Unknown namespace"):
+        resolve_namespace("globex")
+
+    monkeypatch.setattr(pinecone_vectorstore, "TENANT_NAMESPACES", ["*"])
+    assert resolve_namespace("globex") == "globex"
+    with pytest.raises(ValueError, match="Invalid namespace"):
+        resolve_namespace("../etc")